@@ -0,0 +1,229 @@
+"""
+Async, rate-adaptive bulk downloader.
+
+Requests share one pooled aiohttp session. The number in flight is governed by an
+additive-increase/multiplicative-decrease (AIMD) limit: every successful response nudges
+the limit up, and a 429 or 5xx halves it. `Retry-After` headers pause new requests
+for the time the server asks, and failed requests are retried with jittered
+exponential backoff. Response bodies are handled, e.g. written to disk, from a worker
+thread so parsing and disk I/O never block the event loop.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Hashable, Iterable, List, Tuple
+
+import aiohttp
+from aiohttp import ClientSession
+from pipeline.instrumentation import http_request
+
+from extract.http_cache import HttpCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_LIMIT = 4
+DEFAULT_MAX_LIMIT = 32
+DEFAULT_MAX_RETRIES = 6
+# Base and cap of the exponential backoff between retries, in seconds.
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+REQUEST_TIMEOUT = 60
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AdaptiveLimiter:
+    """An AIMD concurrency limit shared by every request to one host.
+
+    The limit grows by `increase / limit` per success, i.e. by roughly `increase`
+    each time a full window of requests completes, and is multiplied by `decrease`
+    on throttling. Responses to requests already in flight when the limit was decreased
+    do not decrease it again, so a burst of 429s from one window of requests does not
+    collapse the limit to the minimum.
+    """
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL_LIMIT,
+        minimum: int = 1,
+        maximum: int = DEFAULT_MAX_LIMIT,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.paused_until = 0.0
+        # Requests that were in flight at the last decrease, and not yet released.
+        self._stale = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        delay = self.paused_until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self, throttled: bool = False, retry_after: float | None = None) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            stale = self._stale > 0
+            self._stale = max(0, self._stale - 1)
+            if throttled:
+                if not stale:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._stale = self.in_flight
+                    logger.info(f"Throttled, concurrency limit now {int(self.limit)}")
+                if retry_after:
+                    resume = asyncio.get_running_loop().time() + retry_after
+                    self.paused_until = max(self.paused_until, resume)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+
+@dataclass
+class DownloadStats:
+    downloaded: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0
+    bytes: int = 0
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a `Retry-After` header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (zero-based) retry attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+
+async def fetch(
+    url: str,
+    session: ClientSession,
+    limiter: AdaptiveLimiter,
+    stats: DownloadStats,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    cache: HttpCache | None = None,
+) -> bytes | None:
+    """Fetch `url`, retrying throttled, 5xx and failed requests.
+
+    A response already in `cache` is returned without a request; successful responses
+    are stored in it.
+
+    Returns:
+        The response body, or None if every attempt failed or the server returned a
+        non-retryable error.
+    """
+    if cache is not None:
+        body = await asyncio.to_thread(cache.get, url)
+        if body is not None:
+            return body
+
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        throttled, retry_after = False, None
+        try:
+            with http_request("aiohttp") as request:
+                async with session.get(url) as resp:
+                    request.status = resp.status
+                    if resp.status == 200:
+                        body = await resp.read()
+                    elif resp.status in RETRY_STATUSES:
+                        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            if resp.status == 200:
+                if cache is not None:
+                    await asyncio.to_thread(cache.put, url, body)
+                return body
+            if resp.status not in RETRY_STATUSES:
+                logger.error(f"Got status code {resp.status} for {url}")
+                return None
+            throttled = True
+            stats.throttled += 1
+            logger.debug(f"Got status code {resp.status} for {url}, attempt {attempt + 1}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Request for {url} failed: {e!r}")
+        finally:
+            await limiter.release(throttled=throttled, retry_after=retry_after)
+
+        if attempt < max_retries:
+            stats.retries += 1
+            await asyncio.sleep(max(backoff_delay(attempt), retry_after or 0.0))
+
+    logger.error(f"No successful response after {max_retries + 1} attempts for {url}")
+    return None
+
+
+async def download(
+    jobs: Iterable[Tuple[str, Hashable]],
+    handle: Callable[[Hashable, bytes], None],
+    limiter: AdaptiveLimiter | None = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    timeout: float = REQUEST_TIMEOUT,
+    cache: HttpCache | None = None,
+) -> DownloadStats:
+    """Download each `(url, key)` job and pass the body to `handle(key, body)`.
+
+    `handle` runs in a worker thread, so it may parse or write to disk without
+    blocking the event loop.
+
+    Args:
+        jobs: The URLs to fetch and a key identifying each to `handle`.
+        handle: Called with the key and body of every successful download.
+        limiter: The concurrency limit to use; a fresh AdaptiveLimiter by default.
+        max_retries: Retries per URL before it is counted as failed.
+        timeout: Total timeout per request, in seconds.
+        cache: Optional HttpCache consulted before, and filled after, each request.
+
+    Returns:
+        Counts of downloaded and failed files, retries and throttled responses.
+    """
+    limiter = limiter or AdaptiveLimiter()
+    stats = DownloadStats()
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    connector = aiohttp.TCPConnector(limit=limiter.maximum)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with ClientSession(connector=connector, timeout=client_timeout) as session:
+
+        async def worker() -> None:
+            while not queue.empty():
+                url, key = queue.get_nowait()
+                body = await fetch(url, session, limiter, stats, max_retries, cache)
+                if body is None:
+                    stats.failed += 1
+                    continue
+                await asyncio.to_thread(handle, key, body)
+                stats.downloaded += 1
+                stats.bytes += len(body)
+
+        workers: List[asyncio.Task] = [
+            asyncio.create_task(worker()) for _ in range(min(limiter.maximum, queue.qsize()))
+        ]
+        await asyncio.gather(*workers)
+
+    return stats
@@ -1,24 +1,46 @@
+import argparse
 import asyncio
+import json
 import logging
+import os
 import sys
 import time
-from typing import List
+from typing import Iterable, List
 
 import aiohttp
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
 from aiohttp import ClientSession
+from pipeline.instrumentation import span
 
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[logging.StreamHandler(sys.stdout)],
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+from extract.http_cache import HttpCache, requests_get, session_get
+from extract.sharding import (
+    SHARDS_DIR,
+    Shard,
+    parse_shard,
+    read_manifests,
+    start_shard,
+    write_manifest,
 )
 
 logger = logging.getLogger(__name__)
 
+INCIDENTS_URL = "https://incidents.avalanche.ca/public/incidents/?format=json"
+INCIDENT_DETAIL_URL = "https://incidents.avalanche.ca/public/incidents/{}/?format=json"
+RAW_INCIDENTS_PATH = "data/can_avs_raw.parquet"
+# Incident IDs already extracted and the listing count at the last run.
+MANIFEST_PATH = "data/can_avs_manifest.json"
+# Where `--shard` workers write their parts, and `--merge` reads them.
+INCIDENT_SHARDS_DIR = os.path.join(SHARDS_DIR, "incidents")
 
-def generate_incident_urls(url: str) -> list[str] | None:
+# Requests in flight against the incidents API at any one time.
+DEFAULT_CONCURRENCY = 16
+# Incidents per Parquet row group.
+DEFAULT_BATCH_SIZE = 500
+
+
+def generate_incident_urls(url: str, cache: HttpCache | None = None) -> list[str] | None:
     """Generates a List of URLs based on the expected format of the API endpoints and
     the number of events and events per page.
     This is ~15x faster than visiting each endpoint to find the next one.
@@ -28,11 +50,12 @@ def generate_incident_urls(url: str) -> list[str] | None:
     returns: List of urls
     """
     urls = [url]
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        logging.error(f"Got status code {resp.status_code}")
+    with span("listing"):
+        status, body = requests_get(url, cache)
+    if status != 200:
+        logging.error(f"Got status code {status}")
         raise
-    data = resp.json()
+    data = json.loads(body)
     event_count = data["count"]
     events_per_page = len(data["results"])
     num_pages = int(event_count / events_per_page) + 1
@@ -43,69 +66,532 @@ def generate_incident_urls(url: str) -> list[str] | None:
         return urls
 
 
-async def get_incident_id(url: str, session: ClientSession) -> List[str]:
+async def get_incident_id(
+    url: str, session: ClientSession, cache: HttpCache | None = None
+) -> List[str]:
     """Get the incident IDs from an API endpoint.
 
     Args:
         url: The API endpoint URL.
         session: An aiohttp ClientSession.
+        cache: Optional HttpCache to serve and store the response.
 
     Returns:
         A list of incident IDs.
     """
-    async with session.get(url) as resp:
-        logger.info(f"Got status code {resp.status}")
-        if resp.status != 200:
-            logging.error(f"Got status code {resp.status}")
-            return []
-        else:
-            data = await resp.json()
-            results = data.get("results")
-            ids = [dct["id"] for dct in results]
-            return ids
+    with span("listing"):
+        status, body = await session_get(session, url, cache)
+    if status != 200:
+        logging.error(f"Got status code {status}")
+        return []
+    else:
+        data = json.loads(body)
+        results = data.get("results")
+        ids = [dct["id"] for dct in results]
+        return ids
 
 
-async def get_incident_ids(urls: List[str]) -> List[str]:
+async def get_incident_ids(urls: List[str], cache: HttpCache | None = None) -> List[str]:
     """Given a list of urls, return the incident ids found at each URL.
 
     params: urls: List[str]
+    params: cache: Optional HttpCache
     returns: ids: List[str]
     """
     async with aiohttp.ClientSession() as session:
-        tasks = [get_incident_id(url, session) for url in urls]
+        tasks = [get_incident_id(url, session, cache) for url in urls]
         nested_list_ids = await asyncio.gather(*tasks)
         list_ids = [inc for incs in nested_list_ids for inc in incs]
     return list_ids
 
 
-# Lastly, build the full data source
-# TODO: Make async for retrieval.
-def generate_canadian_avalanche_data(incident_ids: List[str]) -> str:
-    df = pd.DataFrame()
+async def get_incident_detail(
+    inc: str,
+    session: ClientSession,
+    semaphore: asyncio.Semaphore,
+    cache: HttpCache | None = None,
+    detail_url: str = INCIDENT_DETAIL_URL,
+) -> dict | None:
+    """Get the full incident record for a single incident ID.
+
+    Args:
+        inc: The incident ID.
+        session: An aiohttp ClientSession.
+        semaphore: Bounds the number of requests in flight against the API.
+        cache: Optional HttpCache to serve and store the response.
+        detail_url: The detail endpoint, with a `{}` for the incident ID.
+
+    Returns:
+        The decoded JSON payload, or None if the request failed, timed out or did not
+        return JSON. A failed incident is logged and skipped rather than ending the crawl.
+    """
+    async with semaphore:
+        logger.debug(f"Getting data for {inc}")
+        try:
+            with span("detail"):
+                status, body = await session_get(session, detail_url.format(inc), cache)
+            if status != 200:
+                logger.error(f"Got status code {status} for incident {inc}")
+                return None
+            return json.loads(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Request for incident {inc} failed: {e!r}")
+            return None
+        except ValueError as e:
+            logger.error(f"Incident {inc} did not return JSON: {e}")
+            return None
+
+
+def records_to_table(records: List[dict]) -> pa.Table:
+    """Normalise a batch of incident payloads into an Arrow table.
+
+    Nested lists and dicts (e.g. `location_coords`) are kept as JSON strings so every
+    batch has flat, stable column types. Fields that are null throughout the batch keep
+    the null type, so a later batch with values decides their type.
+
+    params: records: List[dict]
+    returns: pa.Table
+    """
+    df = pd.json_normalize(records)
+    for col in df.select_dtypes(include="object").columns:
+        df[col] = df[col].map(lambda v: json.dumps(v) if isinstance(v, (list, dict)) else v)
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def widen_schema(schema: pa.Schema, other: pa.Schema) -> pa.Schema:
+    """`schema` with the fields of `other` it lacks appended, and types promoted to hold
+    both, e.g. null and double to double or int64 and double to double. A field whose
+    types cannot be promoted, e.g. string and double, becomes a string."""
+    conflicting = set()
+    for field in schema:
+        if field.name in other.names:
+            try:
+                pa.unify_schemas(
+                    [pa.schema([field]), pa.schema([other.field(field.name)])],
+                    promote_options="permissive",
+                )
+            except (pa.ArrowTypeError, pa.ArrowInvalid):
+                conflicting.add(field.name)
+
+    def as_strings(s: pa.Schema) -> pa.Schema:
+        fields = [f.with_type(pa.string()) if f.name in conflicting else f for f in s]
+        return pa.schema(fields, metadata=s.metadata)
+
+    return pa.unify_schemas([as_strings(schema), as_strings(other)], promote_options="permissive")
+
+
+def align_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """`table` with the columns of `schema`, in its order and types; columns the table
+    lacks are filled as null."""
+    columns = [
+        table.column(f.name).cast(f.type)
+        if f.name in table.column_names
+        else pa.nulls(table.num_rows, f.type)
+        for f in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def widen_parquet(path: str, schema: pa.Schema, widened_path: str) -> pq.ParquetWriter:
+    """Copy the row groups of the Parquet file at `path` into a new one at
+    `widened_path` with the wider `schema`, and remove `path`.
+
+    returns: The writer of the new file, left open for further row groups.
+    """
+    source = pq.ParquetFile(path)
+    writer = pq.ParquetWriter(widened_path, schema)
+    for i in range(source.num_row_groups):
+        writer.write_table(align_table(source.read_row_group(i), schema))
+    source.close()
+    os.remove(path)
+    return writer
+
+
+async def write_incident_batches(
+    records: asyncio.Queue, output_path: str, batch_size: int, schema: pa.Schema | None = None
+) -> int:
+    """Drain incident payloads from `records` and write them out as Parquet row groups.
+
+    A `None` on the queue marks the end of the stream. Only one batch is held in memory
+    at a time, so memory use does not grow with the number of incidents.
+
+    The output's schema is the union of every batch's fields, and of `schema` if given.
+    When a batch brings fields the file lacks, the row groups written so far are
+    rewritten with the wider schema, so no field is dropped. The file is written under a
+    temporary name and moved to `output_path` once complete.
+
+    returns: The number of records written.
+    """
+    writer = None
+    path = None
+    widenings = 0
+    batch = []
+    written = 0
+    try:
+        while True:
+            record = await records.get()
+            if record is not None:
+                batch.append(record)
+            if batch and (record is None or len(batch) >= batch_size):
+                with span("write", rows=len(batch)):
+                    table = await asyncio.to_thread(records_to_table, batch)
+                    wider = widen_schema(schema, table.schema) if schema else table.schema
+                    if writer is None:
+                        path = f"{output_path}.tmp"
+                        writer = pq.ParquetWriter(path, wider)
+                    elif not wider.equals(schema):
+                        logger.info(
+                            f"Widening {output_path} with the fields "
+                            f"{sorted(set(wider.names) - set(schema.names))}"
+                        )
+                        writer.close()
+                        widenings += 1
+                        widened_path = f"{output_path}.{widenings}.tmp"
+                        writer = await asyncio.to_thread(widen_parquet, path, wider, widened_path)
+                        path = widened_path
+                    schema = wider
+                    await asyncio.to_thread(writer.write_table, align_table(table, schema))
+                written += len(batch)
+                logger.info(f"Wrote {written} incidents to {output_path}")
+                batch = []
+            if record is None:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+    if path is not None:
+        os.replace(path, output_path)
+    return written
+
+
+async def generate_canadian_avalanche_data(
+    urls: List[str],
+    output_path: str = RAW_INCIDENTS_PATH,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    cache: HttpCache | None = None,
+    incident_ids: Iterable[str] = (),
+    schema: pa.Schema | None = None,
+    detail_url: str = INCIDENT_DETAIL_URL,
+    shard: Shard | None = None,
+    failed: set | None = None,
+) -> int:
+    """Build the full data source from the incident listing pages.
+
+    Listing pages are fetched concurrently and their incident IDs are handed straight to
+    a pool of detail fetchers, so detail requests start as soon as the first page
+    returns. At most `concurrency` requests are in flight at once. Records are written
+    to `output_path` in row groups of `batch_size`.
+
+    params: urls: List[str] of listing pages, as from `generate_incident_urls`.
+    params: cache: Optional HttpCache shared by the listing and detail requests.
+    params: incident_ids: Iterable[str] of IDs to fetch in addition to those listed.
+    params: schema: pa.Schema the output starts from, e.g. an existing raw file's; it is
+        widened with any fields the incidents bring.
+    params: detail_url: str of the detail endpoint, with a `{}` for the incident ID.
+    params: shard: Shard to fetch only the incidents of, or None for all of them.
+    params: failed: set that the IDs whose details could not be fetched are added to.
+    returns: The number of incidents written.
+    """
+    ids: asyncio.Queue = asyncio.Queue()
     for inc in incident_ids:
-        logger.info(f"Getting data for {inc}")
-        data = requests.get(
-            "https://incidents.avalanche.ca/public/incidents/{}/?format=json".format(inc)
-        ).json()
-        new_df = pd.json_normalize(data)
-        df = pd.concat([df, new_df])
-        # TODO: Return data, do not write out with same function. Testing consideration.
-    df.to_parquet("data/can_avs_raw.parquet", index=False)
+        if shard is None or shard.owns(inc):
+            ids.put_nowait(inc)
+    records: asyncio.Queue = asyncio.Queue(maxsize=2 * batch_size)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session, asyncio.TaskGroup() as tg:
+
+        async def list_page(url: str) -> None:
+            async with semaphore:
+                page_ids = await get_incident_id(url, session, cache)
+            for inc in page_ids:
+                if shard is None or shard.owns(inc):
+                    ids.put_nowait(inc)
+
+        async def fetch_details() -> None:
+            while (inc := await ids.get()) is not None:
+                data = await get_incident_detail(inc, session, semaphore, cache, detail_url)
+                if data is not None:
+                    await records.put(data)
+                elif failed is not None:
+                    failed.add(inc)
 
-    return "Data was saved."
+        writer = tg.create_task(write_incident_batches(records, output_path, batch_size, schema))
+        fetchers = [tg.create_task(fetch_details()) for _ in range(concurrency)]
 
+        await asyncio.gather(*(list_page(url) for url in urls))
+        for _ in fetchers:
+            ids.put_nowait(None)
+        await asyncio.gather(*fetchers)
+        await records.put(None)
+
+    return writer.result()
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Load the incremental-run manifest: the incident IDs written, the IDs whose
+    details could not be fetched and the last listing count."""
+    manifest = {"count": 0, "ids": [], "failed": []}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest.update(json.load(f))
+    return manifest
+
+
+def save_manifest(
+    count: int, ids: List[str], path: str = MANIFEST_PATH, failed: Iterable[str] = ()
+) -> None:
+    """Write the manifest atomically, so a crash never leaves it half written.
+
+    `failed` are listed incidents whose details could not be fetched; they are not
+    counted as seen, and the next incremental run fetches them again.
+    """
+    failed = sorted(set(failed) - set(ids))
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(
+            {"count": count, "ids": sorted(ids), "failed": failed, "updated": time.time()}, f
+        )
+    os.replace(tmp, path)
+    if failed:
+        logger.warning(f"{len(failed)} incidents could not be fetched and will be retried.")
+
+
+async def get_new_incident_ids(
+    url: str, known: set, last_count: int, session: ClientSession
+) -> tuple[List[str], int]:
+    """Walk the listing pages in order until one contains an already known incident.
+
+    The pages implied by the change in `count` since the last run are fetched
+    concurrently; further pages are then walked one at a time until a known ID turns up
+    or the listing ends. Listing pages bypass the HTTP cache so new incidents are seen.
+
+    returns: The new incident IDs, in listing order, and the current listing count.
+    """
+    status, body = await session_get(session, url)
+    if status != 200:
+        logging.error(f"Got status code {status}")
+        raise RuntimeError(f"Could not read the incident listing at {url}")
+    data = json.loads(body)
+    count = data["count"]
+    per_page = len(data["results"]) or 1
+    num_pages = int(count / per_page) + 1
+    pages = [[dct["id"] for dct in data["results"]]]
+
+    # Every new incident could have pushed known ones down by one slot.
+    expected = min(num_pages, (max(count - last_count, 0) // per_page) + 2)
+    pages.extend(
+        await asyncio.gather(
+            *(get_incident_id(f"{url}&page={i}", session) for i in range(2, expected + 1))
+        )
+    )
+    page = len(pages)
+    while not any(inc in known for inc in pages[-1]) and page < num_pages:
+        page += 1
+        pages.append(await get_incident_id(f"{url}&page={page}", session))
+
+    seen = set()
+    new_ids = []
+    for inc in (inc for page_ids in pages for inc in page_ids):
+        if inc not in known and inc not in seen:
+            seen.add(inc)
+            new_ids.append(inc)
+    logger.info(f"Listing count {count} (was {last_count}), walked {page} pages.")
+    return new_ids, count
+
+
+def append_parquet(path: str, part_path: str) -> None:
+    """Append the row groups of `part_path` to the Parquet file at `path`.
+
+    Parquet files cannot be extended in place, so the existing row groups are streamed
+    into a new file followed by the new ones, which then replaces `path`. The new file
+    has the fields of both.
+    """
+    existing = pq.ParquetFile(path)
+    part = pq.ParquetFile(part_path)
+    schema = widen_schema(existing.schema_arrow, part.schema_arrow)
+    tmp = f"{path}.tmp"
+    with pq.ParquetWriter(tmp, schema) as writer:
+        for source in (existing, part):
+            for i in range(source.num_row_groups):
+                writer.write_table(align_table(source.read_row_group(i), schema))
+    os.replace(tmp, path)
+    os.remove(part_path)
+
+
+async def update_canadian_avalanche_data(
+    output_path: str = RAW_INCIDENTS_PATH,
+    manifest_path: str = MANIFEST_PATH,
+    cache: HttpCache | None = None,
+    incidents_url: str = INCIDENTS_URL,
+    detail_url: str = INCIDENT_DETAIL_URL,
+) -> int:
+    """Fetch only incidents not seen by earlier runs and append them to `output_path`.
+
+    Incidents whose details failed in the last run are fetched again. Falls back to a
+    full crawl if there is no existing output or manifest.
+
+    returns: The number of incidents added.
+    """
+    manifest = load_manifest(manifest_path)
+    failed = set()
+    if not os.path.exists(output_path) or not manifest["ids"]:
+        logging.info("No manifest or existing output, running a full extraction.")
+        urls = await asyncio.to_thread(generate_incident_urls, incidents_url, cache)
+        written = await generate_canadian_avalanche_data(
+            urls, output_path, cache=cache, detail_url=detail_url, failed=failed
+        )
+        _, body = await asyncio.to_thread(requests_get, incidents_url, cache)
+        count = json.loads(body)["count"]
+    else:
+        async with aiohttp.ClientSession() as session:
+            new_ids, count = await get_new_incident_ids(
+                incidents_url, set(manifest["ids"]), manifest["count"], session
+            )
+        listed = set(new_ids)
+        retry = [inc for inc in manifest["failed"] if inc not in listed]
+        logging.info(f"Found {len(new_ids)} new incidents, retrying {len(retry)} failed.")
+        written = 0
+        if new_ids or retry:
+            part_path = f"{output_path}.part"
+            written = await generate_canadian_avalanche_data(
+                [],
+                part_path,
+                cache=cache,
+                incident_ids=new_ids + retry,
+                schema=pq.read_schema(output_path),
+                detail_url=detail_url,
+                failed=failed,
+            )
+            if written:
+                append_parquet(output_path, part_path)
+
+    ids = []
+    if os.path.exists(output_path):
+        ids = pq.read_table(output_path, columns=["id"]).column("id").to_pylist()
+    save_manifest(count, ids, manifest_path, failed)
+    return written
+
+
+async def extract_shard(
+    shard: Shard,
+    parts_dir: str = INCIDENT_SHARDS_DIR,
+    cache: HttpCache | None = None,
+    incidents_url: str = INCIDENTS_URL,
+    detail_url: str = INCIDENT_DETAIL_URL,
+) -> int:
+    """Fetch the incidents in `shard` into its directory under `parts_dir`.
+
+    Every worker walks all the listing pages, which are few, and fetches the details
+    of its own incidents only. See extract/sharding.py.
+
+    returns: The number of incidents written.
+    """
+    shard_dir = start_shard(parts_dir, shard)
+    part = "part-00000.parquet"
+    urls = await asyncio.to_thread(generate_incident_urls, incidents_url, cache)
+    failed = set()
+    written = await generate_canadian_avalanche_data(
+        urls,
+        os.path.join(shard_dir, part),
+        cache=cache,
+        detail_url=detail_url,
+        shard=shard,
+        failed=failed,
+    )
+    ids = []
+    if written:
+        ids = pq.read_table(os.path.join(shard_dir, part), columns=["id"])["id"].to_pylist()
+    _, body = await asyncio.to_thread(requests_get, incidents_url, cache)
+    write_manifest(
+        shard_dir,
+        shard,
+        "incidents",
+        [part] if written else [],
+        ids,
+        listing_count=json.loads(body)["count"],
+        failed=sorted(failed),
+    )
+    return written
+
+
+def merge_incident_shards(
+    parts_dir: str = INCIDENT_SHARDS_DIR,
+    output_path: str = RAW_INCIDENTS_PATH,
+    manifest_path: str = MANIFEST_PATH,
+    count: int | None = None,
+) -> int:
+    """Merge the shards written by `extract_shard` into `output_path`, sorted by ID.
+
+    The output does not depend on the number of shards or the order they finished in.
+    The incremental-run manifest is rewritten to match it.
+
+    params: count: int of shards expected; by default that in their manifests.
+    returns: The number of incidents merged.
+    raises: ValueError if a shard is missing or duplicated, see `read_manifests`.
+    """
+    manifests = read_manifests(parts_dir, "incidents", count)
+    tables = [pq.read_table(os.path.join(m["dir"], p)) for m in manifests for p in m["parts"]]
+    if not tables:
+        raise ValueError(f"The shards under {parts_dir} hold no incidents.")
+    schema = tables[0].schema
+    for t in tables[1:]:
+        schema = widen_schema(schema, t.schema)
+    table = pa.concat_tables([align_table(t, schema) for t in tables]).sort_by("id")
+    tmp = f"{output_path}.tmp"
+    pq.write_table(table, tmp, row_group_size=DEFAULT_BATCH_SIZE)
+    os.replace(tmp, output_path)
+    ids = table.column("id").to_pylist()
+    failed = [inc for m in manifests for inc in m.get("failed", [])]
+    save_manifest(max(m["listing_count"] for m in manifests), ids, manifest_path, failed)
+    logger.info(f"Merged {len(ids)} incidents from {len(manifests)} shards into {output_path}")
+    return len(ids)
+
+
+async def main(
+    incremental: bool = False,
+    shard: Shard | None = None,
+    parts_dir: str = INCIDENT_SHARDS_DIR,
+    incidents_url: str = INCIDENTS_URL,
+    detail_url: str = INCIDENT_DETAIL_URL,
+) -> None:
+    cache = HttpCache()
+    if shard is not None:
+        logging.info(f"Starting extract_shard {shard}")
+        written = await extract_shard(shard, parts_dir, cache, incidents_url, detail_url)
+        logging.info(f"Finished extract_shard {shard}, {written} incidents saved")
+        logging.info(cache.summary())
+        cache.close()
+        return
+
+    if incremental:
+        logging.info("Starting update_canadian_avalanche_data")
+        written = await update_canadian_avalanche_data(
+            cache=cache, incidents_url=incidents_url, detail_url=detail_url
+        )
+        logging.info(f"Finished update_canadian_avalanche_data, {written} incidents added")
+        logging.info(cache.summary())
+        cache.close()
+        return
 
-async def main() -> None:
     logging.info("Starting get_URLS")
-    urls = generate_incident_urls("https://incidents.avalanche.ca/public/incidents/?format=json")
+    urls = generate_incident_urls(incidents_url, cache)
     logging.info("Finished get_URLS")
-    logging.info("Starting get_incident_ids")
 
-    incident_ids = await get_incident_ids(urls)
-    logging.info("Finished get_incident_ids")
     logging.info("Starting generate_canadian_avalanche_data")
-    generate_canadian_avalanche_data(incident_ids)
-    logging.info("Finished generate_canadian_avalanche_data")
+    failed = set()
+    written = await generate_canadian_avalanche_data(
+        urls, cache=cache, detail_url=detail_url, failed=failed
+    )
+    logging.info(f"Finished generate_canadian_avalanche_data, {written} incidents saved")
+    ids = []
+    if written:
+        ids = pq.read_table(RAW_INCIDENTS_PATH, columns=["id"]).column("id").to_pylist()
+    save_manifest(json.loads(requests_get(incidents_url, cache)[1])["count"], ids, failed=failed)
+    logging.info(cache.summary())
+    cache.close()
     # logging.info("Retrieving weather stastions.")
     #
     # # Get the canadian weather station data
@@ -129,7 +615,52 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the Canadian avalanche incidents.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch incidents added since the last run and append them.",
+    )
+    mode.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="Only fetch the i-th of N hash partitions of the incidents, e.g. 0/4, "
+        "into --parts-dir.",
+    )
+    mode.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge the shards in --parts-dir into the raw incidents.",
+    )
+    parser.add_argument("--parts-dir", default=INCIDENT_SHARDS_DIR)
+    parser.add_argument("--shards", type=int, help="The number of shards --merge expects.")
+    parser.add_argument("--incidents-url", default=INCIDENTS_URL)
+    parser.add_argument(
+        "--detail-url", default=INCIDENT_DETAIL_URL, help="With a {} for the incident ID."
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[logging.StreamHandler(sys.stdout)],
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
     start = time.time()
-    asyncio.run(main())
+    with span("extract_data"):
+        if args.merge:
+            try:
+                merge_incident_shards(args.parts_dir, count=args.shards)
+            except ValueError as e:
+                sys.exit(str(e))
+        else:
+            asyncio.run(
+                main(
+                    args.incremental,
+                    args.shard,
+                    args.parts_dir,
+                    args.incidents_url,
+                    args.detail_url,
+                )
+            )
     time_taken = time.time() - start
     print("Time to taken for extract_data.py to run: {}s.".format(round(time_taken, 3)))
@@ -1,83 +1,260 @@
-import random
+import argparse
+import asyncio
+import os
+import sys
 import time
 
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pipeline.instrumentation import span
+from pipeline.schema import read_csv
 
-start = time.time()
+from extract.downloader import download
+from extract.http_cache import HTTP_CACHE_DIR, HttpCache
+from extract.negative_sampler import candidate_days, sample_negatives
+from extract.sharding import (
+    SHARDS_DIR,
+    Shard,
+    parse_shard,
+    read_manifests,
+    start_shard,
+    weather_key,
+    write_manifest,
+)
+from extract.weather_archive import (
+    ARCHIVE_SCHEMA,
+    append_station_year,
+    append_table,
+    has_station_year,
+    import_csv_dir,
+    station_year_parts,
+)
+from extract.weather_coverage import StationChoice, choose_stations, load_coverage
+from extract.weather_plan import WeatherPlan, plan_station_years
 
 url = """https://climate.weather.gc.ca/climate_data/bulk_data_e.html?format=csv&stationID={id}&Year={year}&Month={month}&Day={day}&timeframe=2&submit=%20Download+Data"""
+archive_dir = "data/weather_archive"
+dull_days_path = "data/dull_days.csv"
+nearest_stations_path = "data/nearest_stations.csv"
+# The stations chosen to serve each incident, as read by the transforms.
+weather_stations_path = "data/weather_stations.csv"
+weather_shards_dir = os.path.join(SHARDS_DIR, "weather")
 
-df = pd.read_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/data/nearest_stations.csv",
-    parse_dates=["ob_date"],
-)
 
+def download_station_years(
+    plan: WeatherPlan, url=url, root: str = archive_dir, shard: Shard | None = None
+) -> list:
+    """Fetch every planned station-year not already archived, appending it to `root`.
 
-def get_weather_daily(df: pd.DataFrame, url=url) -> str:
-    for i in range(len(df.index)):
-        time.sleep(0.1)
-        response = requests.get(
-            url.format(
-                id=df.iloc[i]["station_id"],
-                day=df.iloc[i]["ob_date"].day,
-                month=df.iloc[i]["ob_date"].month,
-                year=df.iloc[i]["ob_date"].year,
-            )
+    With a `shard`, only its station-years are fetched; those already in `archive_dir`
+    are skipped as well.
+
+    returns: The (station_id, year) fetched, including those with no rows to append.
+    """
+    jobs = [
+        (url.format(id=station_id, day=1, month=1, year=year), (station_id, year))
+        for station_id, year in plan.requests.itertuples(index=False)
+        if (shard is None or shard.owns(weather_key(station_id, year)))
+        and not has_station_year(root, station_id, year)
+        and not has_station_year(archive_dir, station_id, year)
+    ]
+    print(
+        f"{len(plan.rows)} rows planned as {len(plan.requests)} station-year requests "
+        f"({plan.requests_saved} saved), {len(plan.requests) - len(jobs)} already archived."
+    )
+    # Handlers run on several threads at once; list.append is atomic, `+=` is not.
+    appended = []
+    fetched = []
+
+    def archive(key, body: bytes) -> None:
+        with span("archive_append") as step:
+            step.rows = append_station_year(root, *key, body)
+        appended.append(step.rows)
+        fetched.append(key)
+
+    cache = HttpCache(HTTP_CACHE_DIR)
+    with span("download") as step:
+        stats = asyncio.run(download(jobs, archive, cache=cache))
+        step.rows = stats.downloaded
+    print(f"Downloaded {stats.downloaded} files, {stats.failed} failed, {stats.retries} retries.")
+    print(f"Appended {sum(appended)} daily rows to {root}.")
+    print(cache.summary())
+    cache.close()
+    return fetched
+
+
+def plan_choice(choice: StationChoice) -> WeatherPlan:
+    return plan_station_years(
+        pd.DataFrame(
+            {
+                "station_id": choice.rows["station_id"],
+                "date": pd.to_datetime(choice.rows["ob_date"]),
+            }
         )
-        response.raise_for_status()  # Raise an exception if the request failed
-        output_file = "/home/david/Documents/ARU/AvalancheProject/demo/data/daily_weather_avs/{}_{}_{}.csv".format(
-            str(df.iloc[i]["ob_date"].date()),
-            df.iloc[i]["station_name"],
-            df.iloc[i]["station_id"],
-        ).replace(" ", "_")
-        print(f"Writing to file {output_file}")
-        with open(output_file, "wb") as f:
-            f.write(response.content)
-    return "End of list."
+    )
 
 
-def get_weather_daily_randoms(df: pd.DataFrame, url=url) -> str:
-    for i in range(len(df.index)):
-        success = False
-        for _ in range(10):
-            try:
-                time.sleep(0.5)
-                day = random.choice(list(range(1, 29)))  # Choose from the winter/spring months
-                month = random.choice([1, 2, 3, 4, 11, 12])  # Choose from most of any month
-                year = df.iloc[i]["ob_date"].year
-                response = requests.get(
-                    url.format(id=df.iloc[i]["station_id"], day=day, month=month, year=year)
-                )
-                response.raise_for_status()  # Raise an exception if the request failed
-                success = True
-                break
-            except requests.exceptions.ConnectionError:
-                continue
-
-        if success:
-            output_file = "/home/david/Documents/ARU/AvalancheProject/demo/data/daily_weather_dulls/{}_{}_{}.csv".format(
-                f"{year}_{month}_{day}",
-                df.iloc[i]["station_name"],
-                df.iloc[i]["station_id"],
-            ).replace(" ", "_")
-            try:
-                with open(output_file, "wb") as f:
-                    f.write(response.content)
-            except Exception as e:
-                print(f"Error writing to file {output_file}: {e}")
-                continue
+def archive_shard(
+    df: pd.DataFrame, shard: Shard, parts_dir: str = weather_shards_dir, url=url
+) -> None:
+    """Archive the station-years of `df` in `shard` to its directory under `parts_dir`.
 
-        else:
-            print(f"No successful response after 10 attempts for line {i}")
-            continue
+    The shard's archive, `{shard_dir}/archive`, has the layout of the main one, and its
+    part files are the shard's parts. See extract/sharding.py.
+
+    The stations are chosen from the coverage index as it stands; the empty months a
+    worker finds are not recorded, nor its incidents moved to a further station. Run
+    the unsharded stage after merging to do both, fetching only what is missing.
+    """
+    shard_dir = start_shard(parts_dir, shard)
+    root = os.path.join(shard_dir, "archive")
+    choice = choose_stations(df, load_coverage())
+    print(choice.summary())
+    download_station_years(plan_choice(choice), url, root, shard)
+    parts = station_year_parts(root)
+    write_manifest(
+        shard_dir,
+        shard,
+        "weather",
+        [os.path.relpath(p, shard_dir) for paths in parts.values() for p in paths],
+        [weather_key(*key) for key in parts],
+    )
 
+
+def merge_weather_shards(
+    parts_dir: str = weather_shards_dir, root: str = archive_dir, count: int | None = None
+) -> int:
+    """Append the station-years of the shards written by `archive_shard` to `root`.
+
+    Station-years are appended in order, and rows already archived are dropped, so
+    merging is deterministic and can be repeated.
+
+    params: count: int of shards expected; by default that in their manifests.
+    returns: The number of daily rows appended.
+    raises: ValueError if a shard is missing or duplicated, see `read_manifests`.
+    """
+    manifests = read_manifests(parts_dir, "weather", count)
+    appended = 0
+    for m in manifests:
+        for (station_id, year), paths in sorted(
+            station_year_parts(os.path.join(m["dir"], "archive")).items()
+        ):
+            table = pa.concat_tables([pq.read_table(p, schema=ARCHIVE_SCHEMA) for p in paths])
+            appended += append_table(root, station_id, year, table)
+    print(f"Appended {appended} daily rows from {len(manifests)} shards to {root}.")
+    return appended
+
+
+def get_weather_daily(df: pd.DataFrame, url=url) -> str:
+    """Archive the daily weather for the incidents in `df`, the candidate stations.
+
+    Each incident is served by its nearest station with daily data for its date; see
+    extract/weather_coverage.py. The months fetched with no data are recorded, and the
+    incidents they left without data move on to their next station, until no choice
+    changes. The chosen stations are written to `weather_stations_path`; the
+    transforms read their days back from the archive, see extract/weather_archive.py.
+    """
+    index = load_coverage()
+    choice = choose_stations(df, index)
+    print(choice.summary())
+    while True:
+        plan = plan_choice(choice)
+        fetched = set(download_station_years(plan, url))
+        known = [
+            (station_id, year)
+            for station_id, year in plan.requests.itertuples(index=False)
+            if (station_id, year) in fetched or has_station_year(archive_dir, station_id, year)
+        ]
+        found = index.record_empty_months(archive_dir, known)
+        refined = choose_stations(df, index)
+        if found:
+            print(f"Found {found} empty station-months; {refined.summary()}")
+        if refined.rows.equals(choice.rows):
+            break
+        choice = refined
+    index.save()
+    choice.rows.to_csv(weather_stations_path, index=False)
     return "End of list."
 
 
-get_weather_daily(df)
+def get_weather_daily_randoms(df: pd.DataFrame, ratio: float = 1.0, seed: int = 0) -> str:
+    """Sample dull days from the station-years already archived for `df`.
+
+    No requests are made; see extract/negative_sampler.py. The sampled `station_id`,
+    `date` pairs are written to `dull_days_path` for the transforms to read from the
+    archive.
+    """
+    plan = plan_station_years(
+        pd.DataFrame({"station_id": df["station_id"], "date": df["ob_date"]})
+    )
+    candidates = candidate_days(archive_dir, plan.requests)
+    negatives = sample_negatives(candidates, df, ratio=ratio, seed=seed)
+    negatives.assign(date=negatives["date"].dt.strftime("%Y-%m-%d")).to_csv(
+        dull_days_path, index=False
+    )
+    print(f"Sampled {len(negatives)} dull days for {len(df)} avalanche rows.")
+    return "End of list."
+
+
+def main(
+    dull_days: bool = False,
+    shard: Shard | None = None,
+    parts_dir: str = weather_shards_dir,
+    url=url,
+) -> None:
+    df = read_csv(weather_stations_path if dull_days else nearest_stations_path)
+    if shard is not None:
+        archive_shard(df, shard, parts_dir, url)
+    elif dull_days:
+        get_weather_daily_randoms(df)
+    else:
+        get_weather_daily(df, url)
 
-# get_weather_daily_randoms(df)
 
-time_taken = time.time() - start
-print("Time to taken for extract_weather.py to run: {}s.".format(round(time_taken, 3)))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive the daily weather for the incidents.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--dull-days",
+        action="store_true",
+        help="Sample the dull days from the archive instead of downloading.",
+    )
+    mode.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="Only download the i-th of N hash partitions of the station-years, e.g. "
+        "0/4, into --parts-dir.",
+    )
+    mode.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge the shards in --parts-dir into the archive.",
+    )
+    mode.add_argument(
+        "--import-csv",
+        nargs="+",
+        metavar="DIR",
+        help="Import directories of per-day CSVs from before the archive, e.g. "
+        "daily_weather_avs/, into the archive.",
+    )
+    parser.add_argument("--parts-dir", default=weather_shards_dir)
+    parser.add_argument("--shards", type=int, help="The number of shards --merge expects.")
+    parser.add_argument("--url", default=url, help="The bulk-download URL template.")
+    args = parser.parse_args()
+    start = time.time()
+    with span("extract_weather"):
+        if args.import_csv:
+            for csv_dir in args.import_csv:
+                print(
+                    f"Imported {import_csv_dir(archive_dir, csv_dir)} daily rows from {csv_dir}."
+                )
+        elif args.merge:
+            try:
+                merge_weather_shards(args.parts_dir, count=args.shards)
+            except ValueError as e:
+                sys.exit(str(e))
+        else:
+            main(args.dull_days, args.shard, args.parts_dir, args.url)
+    time_taken = time.time() - start
+    print("Time to taken for extract_weather.py to run: {}s.".format(round(time_taken, 3)))
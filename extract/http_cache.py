@@ -0,0 +1,286 @@
+"""
+Content-addressed on-disk HTTP cache shared by the extractors.
+
+Responses are keyed on the normalised URL (lower-cased scheme and host, sorted query
+parameters). Bodies are zlib-compressed and stored under the SHA-256 of their content,
+so identical payloads are stored once. A small SQLite index maps keys to bodies and
+records expiry and last access.
+
+Expiry is decided per endpoint by `default_ttl`: historical weather years and incidents
+from past seasons never expire, while the current season, and the incident listing
+pages, do. When the stored size exceeds `max_bytes` the least recently used entries are
+evicted.
+
+Both the `requests` and `aiohttp` code paths go through `requests_get` and
+`session_get`, which return `(status, body)` and serve 200s from the cache. Requests
+that reach the network are recorded by `pipeline.instrumentation.http_request`.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from aiohttp import ClientSession
+from pipeline.instrumentation import http_request
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_DIR = "data/http_cache"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+# Avalanche seasons are taken to start on the first of October.
+SEASON_START_MONTH = 10
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of `url` used as the cache key."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+def current_season_start(today: date | None = None) -> date:
+    today = today or date.today()
+    year = today.year if today.month >= SEASON_START_MONTH else today.year - 1
+    return date(year, SEASON_START_MONTH, 1)
+
+
+def default_ttl(url: str, body: bytes) -> float | None:
+    """Seconds until a response for `url` expires, or None if it never does.
+
+    - Bulk weather downloads: years before the current season never expire, the
+      current season's years expire after a day.
+    - Incident details: incidents observed before the current season never expire,
+      current-season incidents expire after a day.
+    - Incident listing pages shift as incidents are added and expire after an hour.
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    season = current_season_start()
+
+    if "bulk_data" in parts.path:
+        year = int(query.get("Year") or 0)
+        return None if year < season.year else DAY
+
+    segments = [s for s in parts.path.split("/") if s]
+    if segments[-2:-1] == ["incidents"]:
+        try:
+            ob_date = date.fromisoformat(str(json.loads(body).get("ob_date"))[:10])
+        except (ValueError, AttributeError):
+            return DAY
+        return None if ob_date < season else DAY
+
+    if segments[-1:] == ["incidents"]:
+        return HOUR
+
+    return DAY
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+    evictions: int = 0
+
+
+class HttpCache:
+    """A size-bounded, content-addressed HTTP response cache on disk.
+
+    Args:
+        root: Directory for the index and the compressed bodies.
+        max_bytes: Upper bound on the compressed size of stored bodies.
+        ttl: Callable of `(url, body)` giving seconds to expiry, None for never, or 0
+            to not cache the response at all.
+    """
+
+    def __init__(
+        self,
+        root: str = HTTP_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: Callable[[str, bytes], float | None] = default_ttl,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.sqlite"), check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        self._total = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)"
+        ).fetchone()
+        return row[0]
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + ".z")
+
+    def _drop(self, key: str, digest: str, size: int) -> None:
+        """Remove an index entry, and its body if no other entry shares it."""
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._release(digest, size)
+
+    def _release(self, digest: str, size: int) -> None:
+        shared = self._db.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone()
+        if shared is None:
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+            self._total -= size
+
+    def get(self, url: str) -> bytes | None:
+        """The cached body for `url`, or None on a miss or an expired entry."""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, size, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[2] is not None and row[2] < now:
+                self._drop(key, row[0], row[1])
+                row = None
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+
+        try:
+            with open(self._object_path(row[0]), "rb") as f:
+                body = zlib.decompress(f.read())
+        except (FileNotFoundError, zlib.error):
+            with self._lock:
+                self._drop(key, row[0], row[1])
+                self.stats.misses += 1
+            return None
+
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(body)
+        return body
+
+    def put(self, url: str, body: bytes) -> None:
+        """Store a successful response body for `url`."""
+        ttl = self.ttl(url, body)
+        if ttl == 0:
+            return
+        key = normalize_url(url)
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        compressed = zlib.compress(body)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            old = self._db.execute(
+                "SELECT digest, size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            shared = self._db.execute(
+                "SELECT 1 FROM entries WHERE digest = ?", (digest,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, digest, len(compressed), expires_at, now),
+            )
+            if shared is None:
+                self._total += len(compressed)
+            if old is not None and old[0] != digest:
+                self._release(*old)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the store fits in `max_bytes`."""
+        if self._total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, digest, size FROM entries ORDER BY last_access"
+        ).fetchall()
+        for key, digest, size in rows:
+            if self._total <= self.max_bytes:
+                break
+            self._drop(key, digest, size)
+            self.stats.evictions += 1
+
+    def summary(self) -> str:
+        total = self.stats.hits + self.stats.misses
+        rate = self.stats.hits / total if total else 0.0
+        return (
+            f"HTTP cache: {self.stats.hits} hits, {self.stats.misses} misses ({rate:.0%}), "
+            f"{self.stats.bytes_saved / 1024**2:.1f} MiB saved, "
+            f"{self._total / 1024**2:.1f} MiB stored, {self.stats.evictions} evicted."
+        )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def requests_get(url: str, cache: HttpCache | None = None) -> tuple[int, bytes]:
+    """GET `url` with `requests`, serving and storing 200 responses through `cache`."""
+    if cache is not None:
+        body = cache.get(url)
+        if body is not None:
+            return 200, body
+    with http_request("requests") as request:
+        resp = requests.get(url)
+        request.status = resp.status_code
+    if resp.status_code == 200 and cache is not None:
+        cache.put(url, resp.content)
+    return resp.status_code, resp.content
+
+
+async def session_get(
+    session: ClientSession, url: str, cache: HttpCache | None = None
+) -> tuple[int, bytes]:
+    """GET `url` on an aiohttp session, serving and storing 200 responses through `cache`.
+
+    Cache reads and writes run in a worker thread so they do not block the event loop.
+    """
+    if cache is not None:
+        body = await asyncio.to_thread(cache.get, url)
+        if body is not None:
+            return 200, body
+    with http_request("aiohttp") as request:
+        async with session.get(url) as resp:
+            body = await resp.read()
+            status = request.status = resp.status
+    if status == 200 and cache is not None:
+        await asyncio.to_thread(cache.put, url, body)
+    return status, body
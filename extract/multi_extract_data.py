@@ -1,19 +1,19 @@
 import asyncio
+import json
 import logging
 import time
 from typing import List
 
 import aiohttp
 import pandas as pd
-import requests
 from aiohttp import ClientSession
 
-logging.basicConfig(level=logging.INFO)
+from extract.http_cache import HttpCache, requests_get, session_get
 
 logger = logging.getLogger(__name__)
 
 
-def get_urls(url: str) -> list[str] | None:
+def get_urls(url: str, cache: HttpCache | None = None) -> list[str] | None:
     """Generates a List of URLs based on the expected format of the API endpoints and
     the number of events and events per page.
     This is ~15x faster than visiting each endpoint to find the next one.
@@ -23,11 +23,11 @@ def get_urls(url: str) -> list[str] | None:
     returns: List of urls
     """
     urls = [url]
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        logging.error(f"Got status code {resp.status_code}")
+    status, body = requests_get(url, cache)
+    if status != 200:
+        logging.error(f"Got status code {status}")
         raise
-    data = resp.json()
+    data = json.loads(body)
     event_count = data["count"]
     events_per_page = len(data["results"])
     num_pages = int(event_count / events_per_page) + 1
@@ -38,31 +38,34 @@ def get_urls(url: str) -> list[str] | None:
         return urls
 
 
-async def get_incident_id(url: str, session: ClientSession) -> List[str]:
+async def get_incident_id(
+    url: str, session: ClientSession, cache: HttpCache | None = None
+) -> List[str]:
     """Get the incident IDs from an API endpoint.
 
     Args:
         url: The API endpoint URL.
         session: An aiohttp ClientSession.
+        cache: Optional HttpCache to serve and store the response.
 
     Returns:
         A list of incident IDs.
     """
-    async with session.get(url) as resp:
-        logger.info(f"Fetching incident IDs from {url}")
-        if resp.status != 200:
-            logging.error(f"Got status code {resp.status}")
-            return []
-        else:
-            data = await resp.json()
-            results = data.get("results")
-            ids = [dct["id"] for dct in results]
-            logger.info(f"Found {len(ids)} incident IDs")
-            return ids
+    logger.info(f"Fetching incident IDs from {url}")
+    status, body = await session_get(session, url, cache)
+    if status != 200:
+        logging.error(f"Got status code {status}")
+        return []
+    else:
+        data = json.loads(body)
+        results = data.get("results")
+        ids = [dct["id"] for dct in results]
+        logger.info(f"Found {len(ids)} incident IDs")
+        return ids
 
 
 # Next we need to visit each url and extract each id
-async def get_incident_ids(urls: List[str]) -> List[str]:
+async def get_incident_ids(urls: List[str], cache: HttpCache | None = None) -> List[str]:
     """Given a list of urls, return the incident iasyncio.run(ds found at each) URL.
 
     params: urls: List[str]
@@ -70,7 +73,7 @@ async def get_incident_ids(urls: List[str]) -> List[str]:
     """
     async with aiohttp.ClientSession() as session:
         list_ids = []
-        tasks = [get_incident_id(url, session) for url in urls]
+        tasks = [get_incident_id(url, session, cache) for url in urls]
         for done in asyncio.as_completed(tasks):
             try:
                 ids = await done
@@ -81,15 +84,19 @@ async def get_incident_ids(urls: List[str]) -> List[str]:
 
 
 def main() -> None:
+    cache = HttpCache()
     logging.info("Starting get_URLS")
-    urls = get_urls("https://incidents.avalanche.ca/public/incidents/?format=json")
+    urls = get_urls("https://incidents.avalanche.ca/public/incidents/?format=json", cache)
     logging.info("Finished get_URLS")
     logging.info("Starting get_incident_ids")
 
-    incident_ids = asyncio.run(get_incident_ids(urls))
+    incident_ids = asyncio.run(get_incident_ids(urls, cache))
+    logging.info(cache.summary())
+    cache.close()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     start = time.time()
     main()
     time_taken = time.time() - start
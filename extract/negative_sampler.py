@@ -0,0 +1,111 @@
+"""
+Local negative ("dull day") sampling.
+
+Rather than requesting a random day from the network for every incident, negatives are
+drawn from the daily weather already archived for the incidents' station-years. Sampling
+is vectorised and seeded, never picks a date on which an avalanche was recorded, and
+can be stratified by station and/or month so the negatives follow the positives'
+distribution.
+"""
+
+import logging
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+from pipeline.schema import to_pandas
+
+from extract.weather_archive import read_archive
+
+logger = logging.getLogger(__name__)
+
+# The winter/spring months dull days were drawn from by the network sampler.
+DEFAULT_MONTHS = (1, 2, 3, 4, 11, 12)
+
+
+def candidate_days(root: str, requests: pd.DataFrame) -> pd.DataFrame:
+    """Every archived day with a Max Temp reading for the requested station-years.
+
+    params: root: The weather archive directory.
+    params: requests: pd.DataFrame of `station_id`, `year` to read.
+    returns: pd.DataFrame of `station_id`, `date`.
+    """
+    table = read_archive(
+        root,
+        ["Max Temp (°C)"],
+        station_ids=requests["station_id"].unique(),
+        years=requests["year"].unique(),
+    )
+    daily = to_pandas(table).dropna()
+    # The station and year filters select their cross product; keep only the requested
+    # pairs, with `station_id` in the caller's dtype rather than the archive's string.
+    daily = daily.rename(columns={"station_id": "key"})
+    daily = daily.assign(year=pd.to_datetime(daily["date"]).dt.year).merge(
+        requests.assign(key=requests["station_id"].astype(str), year=requests["year"].astype(int)),
+        on=["key", "year"],
+    )
+    missing = len(requests) - len(daily[["station_id", "year"]].drop_duplicates())
+    if missing:
+        logger.warning(f"{missing} requested station-years have no archived days.")
+    return pd.DataFrame({"station_id": daily["station_id"], "date": pd.to_datetime(daily["date"])})
+
+
+def sample_negatives(
+    candidates: pd.DataFrame,
+    positives: pd.DataFrame,
+    ratio: float = 1.0,
+    stratify: Sequence[str] = ("station_id", "month"),
+    months: Iterable[int] | None = DEFAULT_MONTHS,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Draw `ratio` negatives per positive from `candidates`, without replacement.
+
+    Args:
+        candidates: `station_id`, `date` of every day available locally.
+        positives: `station_id`, `ob_date` of the avalanche incidents.
+        ratio: Target negative:positive ratio.
+        stratify: Any of "station_id" and "month". Each stratum gets `ratio` times its
+            positive count; with no strata the negatives are drawn uniformly.
+        months: Only draw from these months; None for any month.
+        seed: Seed for the random generator.
+
+    Returns:
+        The sampled `station_id`, `date`. Strata without enough candidates give as
+        many as they have, with a warning.
+    """
+    rng = np.random.default_rng(seed)
+    stratify = list(stratify)
+    avalanche_dates = pd.to_datetime(positives["ob_date"]).dt.normalize().unique()
+
+    candidates = candidates[~candidates["date"].dt.normalize().isin(avalanche_dates)]
+    if months is not None:
+        candidates = candidates[candidates["date"].dt.month.isin(list(months))]
+    candidates = candidates.assign(month=candidates["date"].dt.month)
+    positives = positives.assign(month=pd.to_datetime(positives["ob_date"]).dt.month)
+
+    if stratify:
+        expected = positives.groupby(stratify).size() * ratio
+    else:
+        expected = pd.Series([len(positives) * ratio], index=pd.Index([0], name="stratum"))
+        candidates = candidates.assign(stratum=0)
+        stratify = ["stratum"]
+    # Randomised rounding keeps the total at `ratio` times the positives on average.
+    quota = np.floor(expected) + (rng.random(len(expected)) < expected % 1)
+    quota = quota.astype(int).rename("quota")
+
+    # Shuffle, then keep the first `quota` rows of each stratum.
+    candidates = candidates.iloc[rng.permutation(len(candidates))]
+    rank = candidates.groupby(stratify).cumcount()
+    limit = candidates.join(quota, on=stratify)["quota"].fillna(0)
+    sampled = candidates[rank < limit]
+
+    available = candidates.groupby(stratify).size().reindex(quota.index, fill_value=0)
+    short = quota[available < quota]
+    if len(short):
+        logger.warning(
+            f"{len(short)} strata short of candidates; "
+            f"sampled {len(sampled)} of {quota.sum()} negatives."
+        )
+    return (
+        sampled[["station_id", "date"]].sort_values(["station_id", "date"]).reset_index(drop=True)
+    )
@@ -0,0 +1,185 @@
+"""
+Stable hash sharding of the extraction across worker processes or hosts.
+
+A worker run with `--shard i/N` takes the keys whose hash is `i` modulo `N`: incident
+IDs for extract_data.py, `station_id/year` for extract_weather.py. The hash is SHA-1 of
+the key, so every worker agrees on the partition whatever its host or
+`PYTHONHASHSEED`.
+
+Each worker writes its Parquet parts, and then a manifest listing them, to its own
+directory, `{parts_dir}/shard-<i>-of-<N>`. The manifest is written last, so a shard
+without one did not finish. Shard directories may be copied back from other hosts into
+`parts_dir` at any depth. `read_manifests` checks that the shards can be merged: every
+shard from 0 to N-1 is there exactly once and no other, its parts have the rows its
+manifest records, and no key is in two shards or in the wrong one.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable
+
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = "manifest.json"
+SHARDS_DIR = "data/shards"
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The `index`-th of `count` hash partitions."""
+
+    index: int
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index:04d}-of-{self.count:04d}"
+
+    def owns(self, key) -> bool:
+        return shard_of(key, self.count) == self.index
+
+
+def shard_of(key, count: int) -> int:
+    """The shard of `count` that `key` belongs to, by the SHA-1 of `str(key)`."""
+    digest = hashlib.sha1(str(key).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def parse_shard(value: str) -> Shard:
+    """Parse `i/N`, for argparse."""
+    try:
+        index, count = (int(v) for v in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a shard as i/N, got {value!r}.")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            f"Shard {value} is not in 0/{count} to {count - 1}/{count}."
+        )
+    return Shard(index, count)
+
+
+def weather_key(station_id, year: int) -> str:
+    return f"{station_id}/{int(year)}"
+
+
+def start_shard(parts_dir: str, shard: Shard) -> str:
+    """Create the shard's directory, removing the manifest of any earlier run.
+
+    returns: The shard's directory.
+    """
+    shard_dir = os.path.join(parts_dir, shard.name)
+    os.makedirs(shard_dir, exist_ok=True)
+    if os.path.exists(os.path.join(shard_dir, MANIFEST_NAME)):
+        os.remove(os.path.join(shard_dir, MANIFEST_NAME))
+    return shard_dir
+
+
+def write_manifest(
+    shard_dir: str, shard: Shard, kind: str, parts: list[str], keys: Iterable[str], **extra
+) -> dict:
+    """Record the shard as complete. `parts` are relative to `shard_dir`.
+
+    The manifest is written atomically, so it is either absent or complete.
+    """
+    rows = sum(pq.ParquetFile(os.path.join(shard_dir, p)).metadata.num_rows for p in parts)
+    manifest = {
+        "kind": kind,
+        "shard": shard.index,
+        "count": shard.count,
+        "parts": sorted(parts),
+        "rows": rows,
+        "keys": sorted({str(k) for k in keys}),
+        "completed": time.time(),
+        **extra,
+    }
+    tmp = os.path.join(shard_dir, f".{MANIFEST_NAME}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(shard_dir, MANIFEST_NAME))
+    return manifest
+
+
+def read_manifests(parts_dir: str, kind: str, count: int | None = None) -> list[dict]:
+    """The manifests of a complete set of `kind` shards under `parts_dir`, in shard order.
+
+    Each manifest gets a `dir` key, its shard's directory.
+
+    Args:
+        parts_dir: Searched recursively for manifests.
+        kind: The kind of shard to merge, "incidents" or "weather".
+        count: The number of shards expected; by default that in the manifests.
+
+    Raises:
+        ValueError: If the shards are incomplete, duplicated or overlap, listing every
+            problem found.
+    """
+    manifests = []
+    for root, _, files in os.walk(parts_dir):
+        if MANIFEST_NAME in files:
+            with open(os.path.join(root, MANIFEST_NAME)) as f:
+                manifests.append({**json.load(f), "dir": root})
+    if not manifests:
+        raise ValueError(f"No shard manifests under {parts_dir}.")
+
+    problems = []
+    other = sorted({m["dir"] for m in manifests if m["kind"] != kind})
+    if other:
+        problems.append(f"Not {kind} shards: {other}")
+    counts = sorted({m["count"] for m in manifests})
+    if len(counts) > 1:
+        problems.append(f"Shards of different runs, with shard counts {counts}.")
+    count = count or counts[-1]
+    if len(counts) == 1 and counts[0] != count:
+        problems.append(f"Shards of a run with {counts[0]} shards, not {count}.")
+    out_of_range = sorted({m["shard"] for m in manifests if not 0 <= m["shard"] < count})
+    if out_of_range:
+        problems.append(f"Shards {out_of_range} are out of range for {count} shards.")
+
+    by_index: dict[int, list[str]] = {}
+    for m in manifests:
+        by_index.setdefault(m["shard"], []).append(m["dir"])
+    missing = sorted(set(range(count)) - set(by_index))
+    if missing:
+        problems.append(f"Missing shards {missing} of {count}.")
+    for index, dirs in sorted(by_index.items()):
+        if len(dirs) > 1:
+            problems.append(f"Shard {index}/{count} is duplicated in {sorted(dirs)}.")
+
+    for m in manifests:
+        paths = [os.path.join(m["dir"], p) for p in m["parts"]]
+        absent = [p for p in paths if not os.path.exists(p)]
+        if absent:
+            problems.append(f"Parts of shard {m['shard']} are missing: {absent}")
+            continue
+        rows = sum(pq.ParquetFile(p).metadata.num_rows for p in paths)
+        if rows != m["rows"]:
+            problems.append(
+                f"Shard {m['shard']} has {rows} rows in its parts; its manifest says {m['rows']}."
+            )
+        misplaced = [k for k in m["keys"] if shard_of(k, m["count"]) != m["shard"]]
+        if misplaced:
+            problems.append(
+                f"Shard {m['shard']} holds {len(misplaced)} keys of other shards, "
+                f"e.g. {misplaced[:5]}."
+            )
+
+    if not any(len(dirs) > 1 for dirs in by_index.values()):
+        repeated = [
+            k for k, n in Counter(k for m in manifests for k in m["keys"]).items() if n > 1
+        ]
+        if repeated:
+            problems.append(
+                f"{len(repeated)} keys are in more than one shard, e.g. {repeated[:5]}."
+            )
+
+    if problems:
+        raise ValueError("Cannot merge the shards:\n  " + "\n  ".join(problems))
+    return sorted(manifests, key=lambda m: m["shard"])
@@ -0,0 +1,262 @@
+"""
+Append-only, partitioned Parquet archive of daily weather.
+
+Downloaded station-year CSVs are parsed once into typed rows and appended to
+`{root}/station_id=<id>/year=<year>/part-<uuid>.parquet`. Rows already archived for a
+(station_id, date) are dropped on append, so re-fetching a station-year is harmless.
+
+Directories of per-day CSVs from before the archive, `{date}_{station}_{id}.csv`, are
+imported with `import_csv_dir`. The files are parsed in parallel on a thread pool,
+reading only the archived columns with explicit types, and appended once per
+station-year.
+
+Readers open the archive as a hive-partitioned pyarrow dataset on a memory-mapped
+filesystem, reading only the requested columns. Station and year filters prune whole
+partitions, and date filters use the row-group statistics. The measures are stored as
+float64 and read as float32, see pipeline/schema.py.
+"""
+
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pipeline.schema import DATE, MEASURE, MEASURE_COLUMNS, to_pandas
+from pyarrow import fs
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = pa.schema(
+    [("date", pa.date32())] + [(col, pa.float64()) for col in MEASURE_COLUMNS]
+)
+PARTITION_SCHEMA = pa.schema([("station_id", pa.string()), ("year", pa.int32())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+DATASET_SCHEMA = pa.unify_schemas([ARCHIVE_SCHEMA, PARTITION_SCHEMA])
+
+# Legacy CSVs parsed and merged per thread-pool task by `import_csv_dir`.
+CSV_CHUNK_SIZE = 256
+
+_append_lock = threading.Lock()
+
+
+def partition_dir(root: str, station_id, year: int) -> str:
+    return os.path.join(root, f"station_id={station_id}", f"year={year}")
+
+
+def has_station_year(root: str, station_id, year: int) -> bool:
+    """Whether any rows for the station-year are already archived."""
+    path = partition_dir(root, station_id, year)
+    return os.path.isdir(path) and any(f.endswith(".parquet") for f in os.listdir(path))
+
+
+def parse_daily_csv(body: bytes | str) -> pa.Table:
+    """Parse a bulk-download daily CSV, given as its bytes or its path, into a table with
+    the archive schema."""
+    column_types = {"Date/Time": pa.date32()} | {col: pa.float64() for col in MEASURE_COLUMNS}
+    table = pv.read_csv(
+        io.BytesIO(body) if isinstance(body, bytes) else body,
+        read_options=pv.ReadOptions(use_threads=False),
+        convert_options=pv.ConvertOptions(
+            column_types=column_types,
+            include_columns=list(column_types),
+            include_missing_columns=True,
+        ),
+    )
+    return table.rename_columns(ARCHIVE_SCHEMA.names).cast(ARCHIVE_SCHEMA)
+
+
+def append_station_year(root: str, station_id, year: int, body: bytes) -> int:
+    """Append a downloaded station-year CSV to the archive.
+
+    Rows whose date is already archived for the station, or that fall outside `year`,
+    are dropped.
+
+    returns: The number of rows appended.
+    """
+    return append_table(root, station_id, year, parse_daily_csv(body))
+
+
+def append_table(root: str, station_id, year: int, table: pa.Table) -> int:
+    """Append rows with the archive schema to the station-year, as `append_station_year`.
+
+    returns: The number of rows appended.
+    """
+    # Filtering on a null mask drops the row, so unparseable dates go here too.
+    table = table.filter(pc.equal(pc.year(table["date"]), year))
+    path = partition_dir(root, station_id, year)
+    with _append_lock:
+        if has_station_year(root, station_id, year):
+            archived = pq.read_table(path, columns=["date"], schema=ARCHIVE_SCHEMA)["date"]
+            table = table.filter(
+                pc.invert(pc.is_in(table["date"], value_set=archived.combine_chunks()))
+            )
+        if table.num_rows == 0:
+            return 0
+        rows = table.to_pandas().drop_duplicates("date").sort_values("date")
+        table = pa.Table.from_pandas(rows, schema=ARCHIVE_SCHEMA, preserve_index=False)
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, f".part-{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(path, f"part-{uuid.uuid4().hex}.parquet"))
+    return table.num_rows
+
+
+def read_csv_dir(csv_dir: str, workers: int | None = None) -> pa.Table:
+    """Parse every legacy per-day CSV in `csv_dir` in parallel into one table.
+
+    The station is the last `_`-separated part of each file's name, as the files were
+    written by the per-day downloader.
+
+    returns: pa.Table of the archive schema with a `station_id` column.
+    """
+    files = sorted(f for f in os.listdir(csv_dir) if f.endswith(".csv"))
+    schema = ARCHIVE_SCHEMA.append(PARTITION_SCHEMA.field("station_id"))
+
+    def read_file(file: str) -> pa.Table:
+        table = parse_daily_csv(os.path.join(csv_dir, file))
+        station_id = file.removesuffix(".csv").rsplit("_", 1)[-1]
+        return table.append_column(
+            "station_id", pa.array([station_id] * table.num_rows, pa.string())
+        )
+
+    def read_chunk(chunk: list[str]) -> pa.Table:
+        # Per-file tables are tiny; merging them per chunk keeps their overhead bounded.
+        return pa.concat_tables([read_file(f) for f in chunk]).combine_chunks()
+
+    chunks = [files[i : i + CSV_CHUNK_SIZE] for i in range(0, len(files), CSV_CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return pa.concat_tables([schema.empty_table(), *pool.map(read_chunk, chunks)])
+
+
+def import_csv_dir(root: str, csv_dir: str, workers: int | None = None) -> int:
+    """Append the legacy per-day CSVs in `csv_dir` to the archive at `root`.
+
+    The files are read with `read_csv_dir` and appended once per station-year, so
+    importing a directory twice, or days already downloaded, is harmless.
+
+    returns: The number of rows appended.
+    """
+    df = read_csv_dir(csv_dir, workers).to_pandas()
+    df["year"] = pd.to_datetime(df["date"]).dt.year
+    appended = 0
+    for (station_id, year), rows in df.dropna(subset=["year"]).groupby(
+        ["station_id", "year"], sort=True
+    ):
+        table = pa.Table.from_pandas(
+            rows[ARCHIVE_SCHEMA.names], schema=ARCHIVE_SCHEMA, preserve_index=False
+        )
+        appended += append_table(root, station_id, int(year), table)
+    logger.info(f"Imported {appended} daily rows from {csv_dir} into {root}.")
+    return appended
+
+
+def open_archive(root: str) -> ds.Dataset:
+    """The archive as a memory-mapped, hive-partitioned pyarrow dataset.
+
+    Part files are written under a dot-prefixed temporary name and renamed when
+    complete, and the dataset ignores dot-prefixed files, so readers never see a
+    partial part.
+    """
+    return ds.dataset(
+        root,
+        schema=DATASET_SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_archive(
+    root: str,
+    columns: list[str] | None = None,
+    station_ids=None,
+    years=None,
+    start: date | None = None,
+    end: date | None = None,
+) -> pa.Table:
+    """Read archived rows, pruned to `columns` and filtered before decoding, with the
+    measures as float32.
+
+    Args:
+        root: The archive directory.
+        columns: Columns to read; `station_id` and `date` are always included.
+        station_ids: Only these stations, if given.
+        years: Only these years, if given.
+        start: Only dates on or after this, if given.
+        end: Only dates on or before this, if given.
+    """
+    columns = ["station_id", "date"] + [
+        c for c in columns or MEASURE_COLUMNS if c not in ("station_id", "date")
+    ]
+    if not os.path.isdir(root):
+        schema = pa.schema(
+            [
+                (c, MEASURE if c in MEASURE_COLUMNS else DATASET_SCHEMA.field(c).type)
+                for c in columns
+            ]
+        )
+        return schema.empty_table()
+    expr = ds.scalar(True)
+    if station_ids is not None:
+        expr &= ds.field("station_id").isin([str(s) for s in station_ids])
+    if years is not None:
+        expr &= ds.field("year").isin([int(y) for y in years])
+    if start is not None:
+        expr &= ds.field("date") >= pa.scalar(start, pa.date32())
+    if end is not None:
+        expr &= ds.field("date") <= pa.scalar(end, pa.date32())
+    # The measures are cast batch by batch as they are scanned.
+    projection = {
+        c: ds.field(c).cast(MEASURE) if c in MEASURE_COLUMNS else ds.field(c) for c in columns
+    }
+    return open_archive(root).to_table(columns=projection, filter=expr)
+
+
+def read_days(root: str, days: pd.DataFrame, columns: list[str] | None = None) -> pd.DataFrame:
+    """Archived rows for exactly the (station_id, date) pairs in `days`.
+
+    params: days: pd.DataFrame with `station_id` and `date` columns.
+    returns: pd.DataFrame of `station_id`, `date` and the requested columns.
+    """
+    days = days.assign(
+        station_id=days["station_id"].astype(str),
+        date=pd.to_datetime(days["date"]).dt.date,
+    )[["station_id", "date"]].drop_duplicates()
+    if days.empty:
+        return to_pandas(read_archive(root, columns)).iloc[0:0]
+    table = read_archive(
+        root,
+        columns,
+        station_ids=days["station_id"].unique(),
+        years={d.year for d in days["date"]},
+        start=min(days["date"]),
+        end=max(days["date"]),
+    )
+    days = days.astype({"station_id": "category", "date": DATE})
+    return to_pandas(table).merge(days, on=["station_id", "date"], how="inner")
+
+
+def station_year_parts(root: str) -> dict[tuple[str, int], list[str]]:
+    """The part files of each archived station-year, keyed on (station_id, year)."""
+    parts = {}
+    if not os.path.isdir(root):
+        return parts
+    for station_dir in sorted(os.listdir(root)):
+        if not station_dir.startswith("station_id="):
+            continue
+        for year_dir in sorted(os.listdir(os.path.join(root, station_dir))):
+            path = os.path.join(root, station_dir, year_dir)
+            files = sorted(f for f in os.listdir(path) if f.endswith(".parquet"))
+            if year_dir.startswith("year=") and files:
+                key = (station_dir.split("=", 1)[1], int(year_dir.split("=", 1)[1]))
+                parts[key] = [os.path.join(path, f) for f in files]
+    return parts
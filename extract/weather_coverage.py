@@ -0,0 +1,181 @@
+"""
+Station daily-coverage index, to prune weather downloads before they are issued.
+
+The station inventory's `dly_first_year`/`dly_last_year` give the years a station has
+daily data for, but many stations report nothing for long stretches inside them: their
+station-year downloads come back with no measures, and are downloaded, stored and
+parsed for nothing. Once a station-year has been fetched, each of its ended months
+without a single measure is recorded in a persisted cache of empty station-months.
+
+A station covers a day if the inventory gives it daily data that year and the month is
+not known to be empty. `choose_stations` serves each incident from its nearest covered
+station, falling back to the next nearest of its candidates (see
+`transform/nearest_station.py`, `-k`), and counts the requests it pruned.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date
+
+import pandas as pd
+from pipeline.schema import read_csv, to_pandas
+
+from extract.weather_archive import MEASURE_COLUMNS, read_archive
+
+logger = logging.getLogger(__name__)
+
+STATIONS_PATH = "data/station_inv.csv"
+EMPTY_MONTHS_PATH = "data/weather_empty_months.csv"
+
+# The columns of the selected stations, as consumed by the transforms.
+STATION_COLUMNS = ["ob_date", "station_name", "distance(km)", "station_id"]
+
+
+@dataclass
+class CoverageIndex:
+    """The years each station has daily data for, and its months known to be empty.
+
+    `years` is indexed by `station_id`, as a string, with `dly_first_year` and
+    `dly_last_year` columns. `empty` holds `(station_id, year, month)` tuples.
+    """
+
+    years: pd.DataFrame
+    empty: set
+
+    def in_years(self, station_ids: pd.Series, dates: pd.Series) -> pd.Series:
+        """Whether the inventory gives each station daily data in each date's year."""
+        station_ids = station_ids.astype(str)
+        years = pd.to_datetime(dates).dt.year
+        first = station_ids.map(self.years["dly_first_year"])
+        last = station_ids.map(self.years["dly_last_year"])
+        return (first <= years) & (years <= last)
+
+    def covers(self, station_ids: pd.Series, dates: pd.Series) -> pd.Series:
+        """Whether each station may have daily data on each date."""
+        dates = pd.to_datetime(dates)
+        months = pd.MultiIndex.from_arrays(
+            [station_ids.astype(str), dates.dt.year, dates.dt.month]
+        )
+        return self.in_years(station_ids, dates) & ~months.isin(self.empty)
+
+    def record_empty_months(self, root: str, station_years, today: date | None = None) -> int:
+        """Record the ended months of fetched station-years that have no measure archived.
+
+        params: root: The weather archive directory.
+        params: station_years: Iterable of (station_id, year) that were fetched.
+        returns: The number of months newly found empty.
+        """
+        station_years = {(str(s), int(y)) for s, y in station_years}
+        if not station_years:
+            return 0
+        table = read_archive(
+            root,
+            MEASURE_COLUMNS,
+            station_ids={s for s, _ in station_years},
+            years={y for _, y in station_years},
+        )
+        df = to_pandas(table)
+        df = df[df[MEASURE_COLUMNS].notna().any(axis=1)]
+        dates = pd.to_datetime(df["date"])
+        with_data = set(zip(df["station_id"], dates.dt.year, dates.dt.month))
+
+        today = today or date.today()
+        found = {
+            (station_id, year, month)
+            for station_id, year in station_years
+            for month in range(1, 13)
+            if (year, month) < (today.year, today.month)
+            and (station_id, year, month) not in with_data
+        }
+        new = found - self.empty
+        self.empty |= new
+        return len(new)
+
+    def save(self, path: str = EMPTY_MONTHS_PATH) -> None:
+        """Write the empty months atomically."""
+        df = pd.DataFrame(sorted(self.empty), columns=["station_id", "year", "month"])
+        tmp = f"{path}.tmp"
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+
+
+def load_coverage(
+    stations_path: str = STATIONS_PATH, empty_months_path: str = EMPTY_MONTHS_PATH
+) -> CoverageIndex:
+    """Build the index from the station inventory and the persisted empty months."""
+    years = read_csv(stations_path, ["station_id", "dly_first_year", "dly_last_year"])
+    years = years.dropna().drop_duplicates("station_id")
+    years = years.set_index(years["station_id"].astype(str))
+    empty = set()
+    if os.path.exists(empty_months_path):
+        df = pd.read_csv(empty_months_path, dtype={"station_id": str})
+        empty = set(zip(df["station_id"], df["year"], df["month"]))
+    logger.info(f"{len(years)} stations with daily data, {len(empty)} empty months known.")
+    return CoverageIndex(years=years, empty=empty)
+
+
+@dataclass
+class StationChoice:
+    """The stations serving each incident, and what choosing them pruned.
+
+    `rows` has `STATION_COLUMNS`, one row per serving station of each incident.
+    Requests are counted as unique (station_id, year).
+    """
+
+    rows: pd.DataFrame
+    nearest_requests: int
+    pruned_by_inventory: int
+    pruned_by_empty_months: int
+    fallback_requests: int
+    fallbacks: int
+    uncovered: int
+
+    def summary(self) -> str:
+        return (
+            f"{self.nearest_requests} station-year requests for the nearest stations: "
+            f"{self.pruned_by_inventory} pruned by the inventory's daily coverage, "
+            f"{self.pruned_by_empty_months} by the known empty months. "
+            f"{self.fallbacks} incidents fell back to a further station, adding "
+            f"{self.fallback_requests} requests; {self.uncovered} have no covered station."
+        )
+
+
+def choose_stations(candidates: pd.DataFrame, index: CoverageIndex) -> StationChoice:
+    """Serve each incident from its nearest candidate stations that cover its date.
+
+    params: candidates: pd.DataFrame of `STATION_COLUMNS`, with `incident` and `rank`
+        as written by transform/nearest_station.py. Without them each row is taken to
+        be its own incident's only candidate.
+    returns: StationChoice, keeping every covered station tied at the best rank.
+    """
+    if "rank" not in candidates:
+        candidates = candidates.assign(incident=candidates.index, rank=1)
+    dates = pd.to_datetime(candidates["ob_date"])
+    candidates = candidates.assign(
+        year=dates.dt.year,
+        in_years=index.in_years(candidates["station_id"], dates),
+        covered=index.covers(candidates["station_id"], dates),
+    )
+
+    best = candidates[candidates["covered"]].groupby("incident")["rank"].min()
+    chosen = candidates[
+        candidates["covered"] & candidates["rank"].eq(candidates["incident"].map(best))
+    ]
+    nearest = candidates[candidates["rank"] == 1]
+
+    def requests(df: pd.DataFrame) -> set:
+        return set(zip(df["station_id"].astype(str), df["year"]))
+
+    issued = requests(chosen)
+    pruned = requests(nearest) - issued
+    in_years = requests(nearest[nearest["in_years"]])
+    return StationChoice(
+        rows=chosen[STATION_COLUMNS].reset_index(drop=True),
+        nearest_requests=len(requests(nearest)),
+        pruned_by_inventory=len(pruned - in_years),
+        pruned_by_empty_months=len(pruned & in_years),
+        fallback_requests=len(issued - requests(nearest)),
+        fallbacks=int((best > 1).sum()),
+        uncovered=candidates["incident"].nunique() - len(best),
+    )
@@ -0,0 +1,47 @@
+"""
+Station-year request planning for the daily weather download.
+
+The bulk-download URL with `timeframe=2` returns a whole year of daily data for a
+station regardless of the Month/Day given, so every incident at the same station in
+the same year would download the same file. The plan collapses the incident rows to
+unique (station_id, year) requests; each station-year is fetched once into the weather
+archive (extract/weather_archive.py) and the days each row needs are read from there.
+"""
+
+import logging
+from dataclasses import dataclass
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WeatherPlan:
+    """The rows to be served and the unique station-year requests that cover them.
+
+    `rows` has `station_id`, `year` and `date` (as "%Y-%m-%d") columns. `requests` has
+    one row per unique `station_id`, `year`.
+    """
+
+    rows: pd.DataFrame
+    requests: pd.DataFrame
+
+    @property
+    def requests_saved(self) -> int:
+        return len(self.rows) - len(self.requests)
+
+
+def plan_station_years(rows: pd.DataFrame) -> WeatherPlan:
+    """Collapse per-row weather requests to unique (station_id, year) requests.
+
+    params: rows: pd.DataFrame with `station_id` and `date` (a Timestamp).
+    returns: WeatherPlan
+    """
+    rows = rows.assign(year=rows["date"].dt.year, date=rows["date"].dt.strftime("%Y-%m-%d"))
+    requests = rows[["station_id", "year"]].drop_duplicates().reset_index(drop=True)
+    logger.info(
+        f"{len(rows)} rows need {len(requests)} station-year requests, "
+        f"{len(rows) - len(requests)} saved."
+    )
+    return WeatherPlan(rows=rows, requests=requests)
@@ -0,0 +1,61 @@
+"""
+Run the pipeline, skipping the stages whose inputs and code have not changed.
+
+Run from the repository root:
+    python -m pipeline                  # everything
+    python -m pipeline train --jobs 4   # the model and what it depends on
+    python -m pipeline --force weather  # refetch the weather even if it looks current
+    python -m pipeline --dry-run        # which stages would run, and why
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from pipeline.runner import BLOCKED, FAILED, STATE_DIR, run_pipeline, timing_report
+from pipeline.stages import STAGES
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the extract, transform and load stages.")
+    parser.add_argument("targets", nargs="*", help="Stages to bring up to date; all by default.")
+    parser.add_argument(
+        "--force", nargs="+", default=[], metavar="STAGE", help="Always run these."
+    )
+    parser.add_argument("--force-all", action="store_true", help="Run every needed stage.")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages to run at the same time.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would run.")
+    parser.add_argument("--list", action="store_true", help="List the stages and exit.")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--metrics", metavar="DIR", help="Write each stage's metrics here.")
+    parser.add_argument("--metrics-format", choices=["jsonl", "prom"], default="jsonl")
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name:<20} {' '.join(stage.command()[2:])}")
+        return 0
+
+    force = {stage.name for stage in STAGES} if args.force_all else set(args.force)
+    results = run_pipeline(
+        STAGES,
+        args.targets,
+        force,
+        args.jobs,
+        args.dry_run,
+        args.state_dir,
+        args.metrics,
+        args.metrics_format,
+    )
+    print(timing_report(results))
+    return 1 if any(r.status in (FAILED, BLOCKED) for r in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    code = main()
+    time_taken = time.time() - start
+    print("Time to taken for pipeline to run: {}s.".format(round(time_taken, 3)))
+    sys.exit(code)
@@ -0,0 +1,301 @@
+"""
+Low-overhead timing spans, HTTP metrics and stage totals for the pipeline.
+
+- `span(name)` times a block. Spans nest: a span opened inside another, including in
+  an asyncio task or `asyncio.to_thread` call started inside it, is recorded under
+  "outer/inner". Set `rows` on the span to get rows per second.
+- `http_request(client)` times one HTTP request. It records a latency histogram and
+  counts by status, and tracks the requests in flight.
+- The process's wall time and peak RSS are recorded when the metrics are written.
+
+Spans and requests are aggregated in memory, so a span costs two clock reads and a
+locked dictionary update whatever its rate. Nothing is logged per request.
+
+If the `AVA_METRICS` environment variable names a file, the metrics are written there
+when the process exits. A `.prom` file gets the Prometheus text format; the file is
+replaced, for a node-exporter textfile collector. Any other file gets one JSON line
+per metric, appended. `AVA_STAGE` names the stage in the output, and defaults to the
+script name. `python -m pipeline --metrics` sets both for each stage.
+"""
+
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+METRICS_ENV = "AVA_METRICS"
+STAGE_ENV = "AVA_STAGE"
+
+# Upper bounds of the HTTP latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+_current_path: contextvars.ContextVar[str] = contextvars.ContextVar("span_path", default="")
+
+
+@dataclass
+class Span:
+    """A timed block; set `rows` to the rows it processed."""
+
+    path: str
+    rows: int | None = None
+
+
+@dataclass
+class SpanStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+
+
+@dataclass
+class HttpStats:
+    buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    seconds: float = 0.0
+    statuses: dict[str, int] = field(default_factory=dict)
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    @property
+    def requests(self) -> int:
+        return sum(self.buckets)
+
+
+class Registry:
+    """The metrics recorded by this process."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: dict[str, SpanStats] = {}
+        self.http: dict[str, HttpStats] = {}
+        self._lock = threading.Lock()
+
+    def record_span(self, path: str, seconds: float, rows: int | None) -> None:
+        with self._lock:
+            stats = self.spans.setdefault(path, SpanStats())
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += rows or 0
+
+    def start_request(self, client: str) -> None:
+        with self._lock:
+            stats = self.http.setdefault(client, HttpStats())
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+    def end_request(self, client: str, seconds: float, status: str) -> None:
+        with self._lock:
+            stats = self.http[client]
+            stats.in_flight -= 1
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.seconds += seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def age(self) -> float:
+        """Seconds since the process started, or since the registry was created where
+        the start time is not available."""
+        try:
+            with open("/proc/self/stat") as f:
+                started = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+            return uptime - started / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return time.perf_counter() - self.started
+
+    def records(self) -> list[dict]:
+        """Every metric as a flat dict, for JSON lines."""
+        stage = stage_name()
+        with self._lock:
+            records = [
+                {
+                    "type": "span",
+                    "stage": stage,
+                    "span": path,
+                    "calls": s.calls,
+                    "seconds": round(s.seconds, 6),
+                    "max_seconds": round(s.max_seconds, 6),
+                    "rows": s.rows,
+                    "rows_per_s": round(s.rows / s.seconds, 1) if s.rows and s.seconds else None,
+                }
+                for path, s in self.spans.items()
+            ]
+            records += [
+                {
+                    "type": "http",
+                    "stage": stage,
+                    "client": client,
+                    "requests": s.requests,
+                    "seconds": round(s.seconds, 6),
+                    "buckets": dict(zip(map(str, LATENCY_BUCKETS), s.buckets)),
+                    "statuses": dict(s.statuses),
+                    "in_flight": s.in_flight,
+                    "max_in_flight": s.max_in_flight,
+                }
+                for client, s in self.http.items()
+            ]
+        records.append(
+            {
+                "type": "process",
+                "stage": stage,
+                "seconds": round(self.age(), 6),
+                "peak_rss_mib": round(peak_rss_bytes() / 1024**2, 1),
+            }
+        )
+        return records
+
+    def prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        stage = _label(stage_name())
+        lines = []
+
+        def family(name: str, kind: str, help: str) -> None:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+
+        with self._lock:
+            spans = list(self.spans.items())
+            http = list(self.http.items())
+
+        family("ava_span_seconds_total", "counter", "Time spent in each span.")
+        for path, s in spans:
+            lines.append(
+                f'ava_span_seconds_total{{stage="{stage}",span="{_label(path)}"}} {s.seconds}'
+            )
+        family("ava_span_calls_total", "counter", "Times each span was entered.")
+        for path, s in spans:
+            lines.append(
+                f'ava_span_calls_total{{stage="{stage}",span="{_label(path)}"}} {s.calls}'
+            )
+        family("ava_span_rows_total", "counter", "Rows processed in each span.")
+        for path, s in spans:
+            lines.append(f'ava_span_rows_total{{stage="{stage}",span="{_label(path)}"}} {s.rows}')
+
+        family("ava_http_request_duration_seconds", "histogram", "HTTP request latency.")
+        for client, s in http:
+            labels = f'stage="{stage}",client="{_label(client)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, s.buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else str(bound)
+                lines.append(
+                    f'ava_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(f"ava_http_request_duration_seconds_sum{{{labels}}} {s.seconds}")
+            lines.append(f"ava_http_request_duration_seconds_count{{{labels}}} {s.requests}")
+        family("ava_http_requests_total", "counter", "HTTP requests by response status.")
+        for client, s in http:
+            for status, count in sorted(s.statuses.items()):
+                lines.append(
+                    f'ava_http_requests_total{{stage="{stage}",client="{_label(client)}",'
+                    f'status="{_label(status)}"}} {count}'
+                )
+        family("ava_http_in_flight_max", "gauge", "Most HTTP requests in flight at once.")
+        for client, s in http:
+            lines.append(
+                f'ava_http_in_flight_max{{stage="{stage}",client="{_label(client)}"}} {s.max_in_flight}'
+            )
+
+        family("ava_process_seconds", "gauge", "Wall time of the stage process.")
+        lines.append(f'ava_process_seconds{{stage="{stage}"}} {self.age()}')
+        family("ava_process_peak_rss_bytes", "gauge", "Peak resident set size of the stage.")
+        lines.append(f'ava_process_peak_rss_bytes{{stage="{stage}"}} {peak_rss_bytes()}')
+        return "\n".join(lines) + "\n"
+
+
+_registry: Registry | None = None
+_registry_lock = threading.Lock()
+
+
+def registry() -> Registry:
+    """This process's registry, created on first use.
+
+    Creating it registers the exit hook that writes the metrics if `AVA_METRICS` is set,
+    so importing this module has no effect until something is recorded.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = Registry()
+                if os.environ.get(METRICS_ENV):
+                    atexit.register(write_metrics, os.environ[METRICS_ENV])
+    return _registry
+
+
+def stage_name() -> str:
+    return os.environ.get(STAGE_ENV) or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+
+def peak_rss_bytes() -> int:
+    """This process's peak RSS; VmHWM where available, as `ru_maxrss` is inherited."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@contextmanager
+def span(name: str, rows: int | None = None) -> Iterator[Span]:
+    """Time the block as `name`, nested under any span it runs in."""
+    parent = _current_path.get()
+    current = Span(f"{parent}/{name}" if parent else name, rows)
+    token = _current_path.set(current.path)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        seconds = time.perf_counter() - start
+        _current_path.reset(token)
+        registry().record_span(current.path, seconds, current.rows)
+
+
+class _Request:
+    status: str = "error"
+
+
+@contextmanager
+def http_request(client: str) -> Iterator[_Request]:
+    """Time one request made with `client`; set `status` on the yielded object.
+
+    Requests that raise are counted with the status "error".
+    """
+    metrics = registry()
+    request = _Request()
+    metrics.start_request(client)
+    start = time.perf_counter()
+    try:
+        yield request
+    finally:
+        metrics.end_request(client, time.perf_counter() - start, str(request.status))
+
+
+def write_metrics(path: str) -> None:
+    """Write the metrics to `path`: Prometheus text for `.prom`, else JSON lines."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".prom"):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(registry().prometheus())
+        os.replace(tmp, path)
+        return
+    now = time.time()
+    with open(path, "a") as f:
+        for record in registry().records():
+            f.write(json.dumps({"time": now, **record}) + "\n")
@@ -0,0 +1,368 @@
+"""
+Content-hash cached runner for the pipeline stages.
+
+Each `Stage` declares the files and directories it reads and writes, and runs as
+`python -m <module> <args>` from the repository root. A stage depends on the stages
+that write its inputs, so the declarations form a DAG; stages whose dependencies are
+done are run side by side, up to `jobs` at a time.
+
+Before running a stage its key is computed: the SHA-256 of its command, of every input
+and of the source of its module and of every repository module it imports. If the key
+matches the one recorded after its last successful run, and its outputs are unchanged
+since then, the stage is skipped. Stages without inputs, such as the extractors that
+read from the network, are therefore only rerun when their code changes or when forced.
+
+File digests are memoized by (size, mtime) in the state file, so unchanged inputs are
+not re-read on every run. The state is saved after every stage, atomically, so an
+interrupted run keeps what finished. Each stage's output goes to its own log file.
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from pipeline.instrumentation import METRICS_ENV, STAGE_ENV
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = ".pipeline"
+STATE_FILE = "state.json"
+LOG_DIR = "logs"
+
+# Stage outcomes in the timing report.
+RAN = "ran"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+@dataclass
+class Stage:
+    """A step of the pipeline, run as `python -m module *args`.
+
+    `inputs` and `outputs` are paths relative to the repository root, files or
+    directories.
+    """
+
+    name: str
+    module: str
+    args: list[str] = field(default_factory=list)
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+
+    def command(self) -> list[str]:
+        return [sys.executable, "-m", self.module, *self.args]
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str
+    seconds: float = 0.0
+    started: float = 0.0
+    reason: str = ""
+
+
+def dependencies(stages: list[Stage]) -> dict[str, set[str]]:
+    """The names of the stages each stage depends on, by the outputs it reads.
+
+    Raises:
+        ValueError: If two stages write the same output, or the stages form a cycle.
+    """
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in writers:
+                raise ValueError(
+                    f"{output} is written by both {writers[output]} and {stage.name}."
+                )
+            writers[output] = stage.name
+
+    deps = {
+        stage.name: {writers[i] for i in stage.inputs if i in writers} - {stage.name}
+        for stage in stages
+    }
+    order = topological_order(deps)
+    if len(order) != len(deps):
+        raise ValueError(f"The stages form a cycle: {sorted(set(deps) - set(order))}")
+    return deps
+
+
+def topological_order(deps: dict[str, set[str]]) -> list[str]:
+    done, order = set(), []
+    ready = [name for name, d in deps.items() if not d]
+    while ready:
+        name = ready.pop(0)
+        done.add(name)
+        order.append(name)
+        ready += [n for n, d in deps.items() if n not in done and n not in ready and d <= done]
+    return order
+
+
+def upstream(deps: dict[str, set[str]], targets: list[str]) -> set[str]:
+    """`targets` and every stage they depend on, directly or not."""
+    needed, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in deps:
+            raise KeyError(f"Unknown stage {name!r}; the stages are {sorted(deps)}.")
+        if name not in needed:
+            needed.add(name)
+            todo += deps[name]
+    return needed
+
+
+def module_path(module: str, root: str) -> str | None:
+    """The source file of a repository module, or None if it is not in the repository."""
+    base = os.path.join(root, *module.split("."))
+    for path in (
+        f"{base}.py",
+        os.path.join(base, "__init__.py"),
+        os.path.join(base, "__main__.py"),
+    ):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def code_files(module: str, root: str = ".") -> list[str]:
+    """The source files of `module` and of the repository modules it imports, transitively."""
+    seen, todo = set(), [module]
+    while todo:
+        path = module_path(todo.pop(), root)
+        if path is None or path in seen:
+            continue
+        seen.add(path)
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module)
+                todo += [f"{node.module}.{alias.name}" for alias in node.names]
+    return sorted(seen)
+
+
+class Hasher:
+    """SHA-256 of files and directories, memoized by path, size and mtime."""
+
+    def __init__(self, memo: dict | None = None) -> None:
+        self.memo = memo or {}
+        self._lock = threading.Lock()
+
+    def file(self, path: str) -> str:
+        info = os.stat(path)
+        stamp = [info.st_size, info.st_mtime_ns]
+        with self._lock:
+            cached = self.memo.get(path)
+        if cached and cached[:2] == stamp:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self.memo[path] = [*stamp, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path: str) -> str:
+        """The digest of a file, or of a directory's file names and contents.
+
+        Hidden files, such as in-progress writes, are left out. Missing paths hash to
+        "missing".
+        """
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return "missing"
+        digest = hashlib.sha256()
+        for dirpath, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for file in sorted(f for f in files if not f.startswith(".")):
+                full = os.path.join(dirpath, file)
+                digest.update(f"{os.path.relpath(full, path)}\0{self.file(full)}\0".encode())
+        return digest.hexdigest()
+
+    def prune(self) -> None:
+        """Forget the digests of files that no longer exist."""
+        with self._lock:
+            self.memo = {p: v for p, v in self.memo.items() if os.path.exists(p)}
+
+
+def stage_key(stage: Stage, hasher: Hasher, root: str = ".") -> str:
+    """The cache key of `stage`: its command, inputs and code."""
+    digest = hashlib.sha256(json.dumps([stage.module, stage.args]).encode())
+    for path in stage.inputs:
+        digest.update(f"input {path} {hasher.path(path)}\n".encode())
+    for path in code_files(stage.module, root):
+        digest.update(f"code {os.path.relpath(path, root)} {hasher.file(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def load_state(state_dir: str = STATE_DIR) -> dict:
+    path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"stages": {}, "hashes": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state: dict, state_dir: str = STATE_DIR) -> None:
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, STATE_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def up_to_date(stage: Stage, key: str, record: dict | None, hasher: Hasher) -> str | None:
+    """Why `stage` has to run, or None if its last run is still valid."""
+    if record is None:
+        return "never run"
+    if record["key"] != key:
+        return "inputs or code changed"
+    for path in stage.outputs:
+        if hasher.path(path) != record["outputs"].get(path):
+            return f"{path} changed" if os.path.exists(path) else f"{path} missing"
+    return None
+
+
+def run_stage(stage: Stage, log_dir: str, metrics_path: str | None = None) -> int:
+    """Run `stage`, writing its output to its log file; returns its exit code.
+
+    If `metrics_path` is given the stage writes its instrumentation there, see
+    `pipeline.instrumentation`.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    env = os.environ.copy()
+    if metrics_path:
+        env.update({METRICS_ENV: metrics_path, STAGE_ENV: stage.name})
+    with open(os.path.join(log_dir, f"{stage.name}.log"), "w") as log:
+        return subprocess.run(
+            stage.command(), stdout=log, stderr=subprocess.STDOUT, env=env
+        ).returncode
+
+
+def run_pipeline(
+    stages: list[Stage],
+    targets: list[str] | None = None,
+    force: set[str] | None = None,
+    jobs: int = 2,
+    dry_run: bool = False,
+    state_dir: str = STATE_DIR,
+    metrics_dir: str | None = None,
+    metrics_format: str = "jsonl",
+) -> list[StageResult]:
+    """Run the stages needed for `targets`, skipping those whose key is unchanged.
+
+    Args:
+        stages: The stage declarations.
+        targets: Stage names to bring up to date, with their dependencies; all by default.
+        force: Stage names to run even if they are up to date.
+        jobs: Stages run at the same time.
+        dry_run: Report which stages would run without running them.
+        state_dir: Where the keys, digests and logs are kept.
+        metrics_dir: Where each stage writes its metrics, as `<stage>.<metrics_format>`,
+            "jsonl" or "prom"; none are written by default.
+
+    Returns the result of each stage, in the order they finished.
+    """
+    deps = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    needed = upstream(deps, targets) if targets else set(by_name)
+    force = force or set()
+    pending = {name: deps[name] & needed for name in topological_order(deps) if name in needed}
+
+    state = load_state(state_dir)
+    hasher = Hasher(state["hashes"])
+    results: dict[str, StageResult] = {}
+    finished: list[StageResult] = []
+    ran: set[str] = set()
+    start = time.perf_counter()
+
+    def check_and_run(stage: Stage, upstream_ran: bool) -> tuple[StageResult, str]:
+        key = stage_key(stage, hasher)
+        reason = (
+            "forced"
+            if stage.name in force
+            else "upstream ran in dry run"
+            if dry_run and upstream_ran
+            else up_to_date(stage, key, state["stages"].get(stage.name), hasher)
+        )
+        begun = time.perf_counter()
+        if reason is None:
+            return StageResult(stage.name, SKIPPED, 0.0, begun - start), key
+        if dry_run:
+            return StageResult(stage.name, RAN, 0.0, begun - start, reason), key
+        logger.info(f"Running {stage.name} ({reason}).")
+        metrics = metrics_dir and os.path.join(metrics_dir, f"{stage.name}.{metrics_format}")
+        code = run_stage(stage, os.path.join(state_dir, LOG_DIR), metrics)
+        seconds = time.perf_counter() - begun
+        status = RAN if code == 0 else FAILED
+        if code != 0:
+            reason = f"exit code {code}, see {os.path.join(state_dir, LOG_DIR, stage.name)}.log"
+        return StageResult(stage.name, status, seconds, begun - start, reason), key
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n, d in pending.items() if d <= set(results)]:
+                del pending[name]
+                failed = [d for d in deps[name] & needed if results[d].status in (FAILED, BLOCKED)]
+                if failed:
+                    result = StageResult(
+                        name, BLOCKED, reason=f"{', '.join(sorted(failed))} failed"
+                    )
+                    results[name] = result
+                    finished.append(result)
+                    continue
+                future = pool.submit(check_and_run, by_name[name], bool(deps[name] & ran))
+                running[future] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, key = future.result()
+                results[name] = result
+                finished.append(result)
+                if result.status == RAN:
+                    ran.add(name)
+                if result.status == RAN and not dry_run:
+                    stage = by_name[name]
+                    state["stages"][name] = {
+                        "key": key,
+                        "outputs": {path: hasher.path(path) for path in stage.outputs},
+                        "seconds": result.seconds,
+                    }
+                    hasher.prune()
+                    state["hashes"] = hasher.memo
+                    save_state(state, state_dir)
+                logger.info(f"{name}: {result.status} {result.reason}".rstrip())
+
+    if not dry_run:
+        state["hashes"] = hasher.memo
+        save_state(state, state_dir)
+    return finished
+
+
+def timing_report(results: list[StageResult]) -> str:
+    """A table of each stage's outcome, start offset and run time."""
+    lines = [f"{'stage':<20} {'status':<8} {'start s':>8} {'time s':>8}  reason"]
+    for r in sorted(results, key=lambda r: r.started):
+        lines.append(f"{r.name:<20} {r.status:<8} {r.started:>8.2f} {r.seconds:>8.2f}  {r.reason}")
+    total = sum(r.seconds for r in results)
+    wall = max((r.started + r.seconds for r in results), default=0.0)
+    lines.append(f"Stage time {total:.2f}s in {wall:.2f}s of wall time.")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+"""
+Compact column types shared by the extract and transform stages.
+
+Files are converted as they are read, in Arrow, so a default-typed frame is never
+built and then cast:
+- weather measures are float32. They are recorded to a tenth of a unit, well within
+  float32's seven significant digits. The archive stores them as float64, and they are
+  cast as the archive is scanned.
+- dates are date32, four bytes, as `pd.ArrowDtype(pa.date32())`.
+- strings repeated across rows, such as station IDs and names, provinces and
+  coordinate types, are categoricals.
+
+Columns not named in `COLUMN_TYPES` keep the types pandas or Arrow infer.
+`frame_memory` measures a frame, deep; see scripts/report_memory.py.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# The daily weather measures used by the later stages.
+MEASURE_COLUMNS = [
+    "Max Temp (°C)",
+    "Min Temp (°C)",
+    "Mean Temp (°C)",
+    "Heat Deg Days (°C)",
+    "Cool Deg Days (°C)",
+    "Total Rain (mm)",
+    "Total Snow (cm)",
+    "Total Precip (mm)",
+    "Snow on Grnd (cm)",
+]
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+MEASURE = pa.float32()
+DATE = pd.ArrowDtype(pa.date32())
+
+# Arrow types of the columns shared across the stages' files.
+COLUMN_TYPES = {
+    "ob_date": pa.date32(),
+    "date": pa.date32(),
+    "station_id": CATEGORY,
+    "station_name": CATEGORY,
+    "province": CATEGORY,
+    "location_coords_type": CATEGORY,
+    "distance(km)": pa.float32(),
+    "incident": pa.int32(),
+    "rank": pa.int8(),
+} | {column: MEASURE for column in MEASURE_COLUMNS}
+
+
+def compact(table: pa.Table) -> pa.Table:
+    """Cast the columns of `table` named in `COLUMN_TYPES` to their types."""
+    for i, field in enumerate(table.schema):
+        to = COLUMN_TYPES.get(field.name)
+        if to is None or field.type == to:
+            continue
+        column = table.column(i)
+        if to == CATEGORY:
+            column = column.cast(pa.string()).dictionary_encode()
+        else:
+            column = column.cast(to)
+        table = table.set_column(i, field.name, column)
+    return table
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """`table` as a frame of compact types: dictionaries become categoricals, and
+    dates `DATE`."""
+    return compact(table).to_pandas(types_mapper={pa.date32(): DATE}.get)
+
+
+def read_csv(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read `columns`, or every column, of a CSV, parsing straight to compact types."""
+    table = pv.read_csv(
+        path,
+        convert_options=pv.ConvertOptions(
+            column_types=COLUMN_TYPES,
+            include_columns=columns or [],
+            strings_can_be_null=True,
+        ),
+    )
+    return to_pandas(table)
+
+
+def read_parquet(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read `columns`, or every column, of a Parquet file as compact types."""
+    return to_pandas(pq.read_table(path, columns=columns))
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """The bytes `df` holds, including the strings and objects it points to."""
+    return int(df.memory_usage(deep=True).sum())
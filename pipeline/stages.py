@@ -0,0 +1,99 @@
+"""
+The extract, transform and load stages, with the paths each reads and writes.
+
+`data/station_inv.csv`, the station inventory, and `misc/canada_poly`, the provincial
+boundaries, are not written by any stage; they are inputs to the pipeline.
+"""
+
+from pipeline.runner import Stage
+
+STAGES = [
+    Stage(
+        "incidents",
+        "extract.extract_data",
+        outputs=["data/can_avs_raw.parquet", "data/can_avs_manifest.json"],
+    ),
+    Stage(
+        "coordinates",
+        "transform.transform_ava_coords",
+        inputs=["data/can_avs_raw.parquet", "misc/canada_poly"],
+        outputs=["data/can_avs_lat_long_date.csv"],
+    ),
+    Stage(
+        "nearest_stations",
+        "transform.nearest_station",
+        inputs=["data/can_avs_lat_long_date.csv", "data/station_inv.csv"],
+        outputs=["data/nearest_stations.csv"],
+    ),
+    Stage(
+        "weather",
+        "extract.extract_weather",
+        inputs=["data/nearest_stations.csv", "data/station_inv.csv"],
+        outputs=[
+            "data/weather_archive",
+            "data/weather_stations.csv",
+            "data/weather_empty_months.csv",
+        ],
+    ),
+    Stage(
+        "dull_days",
+        "extract.extract_weather",
+        args=["--dull-days"],
+        inputs=["data/weather_stations.csv", "data/weather_archive"],
+        outputs=["data/dull_days.csv"],
+    ),
+    Stage(
+        "features",
+        "transform.feature_store",
+        inputs=["data/weather_archive"],
+        outputs=["data/weather_features.parquet"],
+    ),
+    Stage(
+        "avs_weather",
+        "transform.transformWeather",
+        args=["--only", "avs"],
+        inputs=[
+            "data/weather_archive",
+            "data/weather_stations.csv",
+            "data/weather_features.parquet",
+        ],
+        outputs=["data/avs_weather.csv"],
+    ),
+    Stage(
+        "dull_weather",
+        "transform.transformWeather",
+        args=["--only", "dulls"],
+        inputs=[
+            "data/weather_archive",
+            "data/weather_stations.csv",
+            "data/dull_days.csv",
+            "data/weather_features.parquet",
+        ],
+        outputs=["data/dull_weather.csv"],
+    ),
+    Stage(
+        "load",
+        "transform.transformFinalData",
+        inputs=["data/avs_weather.csv", "data/dull_weather.csv"],
+        outputs=[
+            "load/full_cleaned.csv",
+            "load/balanced_cleaned.csv",
+            "load/full_cleaned.features.npy",
+            "load/full_cleaned.labels.npy",
+            "load/full_cleaned.schema.json",
+            "load/balanced_cleaned.features.npy",
+            "load/balanced_cleaned.labels.npy",
+            "load/balanced_cleaned.schema.json",
+        ],
+    ),
+    Stage(
+        "train",
+        "predict.train",
+        inputs=[
+            "load/balanced_cleaned.features.npy",
+            "load/balanced_cleaned.labels.npy",
+            "load/balanced_cleaned.schema.json",
+        ],
+        outputs=["models/baseline.pkl"],
+    ),
+]
@@ -0,0 +1,92 @@
+"""
+Batch scoring with the model saved by `predict.train`.
+
+`score` runs the classifier over a feature matrix in fixed-size batches, writing the
+avalanche probabilities into one preallocated vector, so millions of station-days can
+be scored in a call with memory bounded by the batch size. Matrices from
+`transform.training_matrix` are memory-mapped, and are paged in batch by batch.
+
+Run from the repository root:
+    python -m predict.score --dataset load/full_cleaned --output load/full_cleaned.scores.npy
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.instrumentation import span
+from predict.train import MODEL_PATH
+from transform.training_matrix import load_training_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_ROWS = 1 << 18
+
+
+def load_model(path: str = MODEL_PATH) -> dict:
+    """The saved model bundle: `model`, its feature `columns` and its `params`."""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def score(model, X: np.ndarray, batch_rows: int = DEFAULT_BATCH_ROWS) -> np.ndarray:
+    """The avalanche probability of every row of `X`, scored `batch_rows` at a time."""
+    positive = list(model.classes_).index(1)
+    out = np.empty(len(X))
+    for start in range(0, len(X), batch_rows):
+        batch = np.asarray(X[start : start + batch_rows], dtype=np.float64)
+        out[start : start + len(batch)] = model.predict_proba(batch)[:, positive]
+    return out
+
+
+def score_frame(
+    bundle: dict, df: pd.DataFrame, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> np.ndarray:
+    """Score a DataFrame with the bundle's feature columns, in the bundle's order.
+
+    Raises:
+        KeyError: If `df` lacks any of the model's feature columns.
+    """
+    missing = [c for c in bundle["columns"] if c not in df.columns]
+    if missing:
+        raise KeyError(f"Missing feature columns: {missing}")
+    X = df[bundle["columns"]].to_numpy(np.float64, na_value=np.nan)
+    return score(bundle["model"], X, batch_rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score a training matrix with the saved model.")
+    parser.add_argument("--dataset", required=True, help="Training matrix path prefix.")
+    parser.add_argument("--output", required=True, help="Where to save the scores, as .npy.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    bundle = load_model(args.model)
+    matrix = load_training_matrix(args.dataset)
+    if matrix.columns != bundle["columns"]:
+        raise ValueError(f"{args.dataset} does not have the columns the model was trained on.")
+
+    start = time.perf_counter()
+    with span("score", rows=len(matrix.X)):
+        scores = score(bundle["model"], matrix.X, args.batch_rows)
+    seconds = time.perf_counter() - start
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    np.save(args.output, scores)
+    logger.info(
+        f"Scored {len(scores)} rows in {seconds:.2f}s ({len(scores) / seconds:,.0f} rows/s)."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    with span("score"):
+        main()
+    time_taken = time.time() - start
+    print("Time to taken for score.py to run: {}s.".format(round(time_taken, 3)))
@@ -0,0 +1,44 @@
+"""
+Sharing numpy arrays with worker processes without pickling them.
+
+`share` describes an array by where its bytes live. Memory-mapped arrays, such as those
+returned by `transform.training_matrix.load_training_matrix`, are described by their
+file and offset, and workers map the same file, sharing its page cache. Other arrays
+are copied once into a named shared-memory block. `attach` turns a description back
+into an array in the worker; only the short description is ever pickled.
+"""
+
+from contextlib import ExitStack
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Shared-memory blocks attached by this process, kept open while their arrays are used.
+_attached: list[shared_memory.SharedMemory] = []
+
+
+def share(array: np.ndarray, stack: ExitStack) -> tuple:
+    """Describe `array` for `attach`, copying it to shared memory if it is not mapped.
+
+    Shared-memory blocks are released when `stack` closes.
+    """
+    if isinstance(array, np.memmap) and array.filename and array.flags["C_CONTIGUOUS"]:
+        return ("mmap", array.filename, array.offset, array.shape, array.dtype.str)
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    stack.callback(block.unlink)
+    stack.callback(block.close)
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return ("shm", block.name, 0, array.shape, array.dtype.str)
+
+
+def attach(description: tuple) -> np.ndarray:
+    """The read-only array described by `share`."""
+    kind, name, offset, shape, dtype = description
+    if kind == "mmap":
+        return np.memmap(name, dtype=dtype, mode="r", offset=offset, shape=shape)
+    block = shared_memory.SharedMemory(name=name, track=False)
+    _attached.append(block)
+    array = np.ndarray(shape, dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,136 @@
+"""
+Benchmark `parse_coordinates` in `transform.transform_ava_coords` against the
+multi-pass normalisation it replaced, on a synthetic raw incident file.
+
+The file holds `--rows` incidents from `incident_frame`, written as Parquet with the
+`location_coords` strings of the incidents API, and both versions start by reading it.
+The previous version could not run as written: `split_coordinates` unpacked the
+frame's column labels rather than its columns, and its chained `.loc` writes of the UTM
+results were lost under copy-on-write. The legacy timing below is of that version with
+those two fixes and nothing else, so the results can also be checked to agree.
+
+The Canada join that follows is unchanged and needs the boundary files, so it is not
+timed.
+
+Run from the repository root:
+    python -m scripts.bench_coordinates --rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from pipeline.schema import read_parquet
+from scripts.stand_in_servers import incident_frame
+from transform.transform_ava_coords import COLUMNS, parse_coordinates
+from transform.utm import get_transformer, utm_to_latlon
+
+
+def write_raw_incidents(path: str, rows: int, seed: int = 0) -> None:
+    """Write `rows` synthetic raw incidents to `path`."""
+    raw = incident_frame(rows, seed)
+    raw["location_coords"] = (
+        "[" + raw["coord_0"].astype(str) + ", " + raw["coord_1"].astype(str) + "]"
+    )
+    raw[COLUMNS].to_parquet(path)
+
+
+def legacy_split_coordinates(series: pd.Series) -> tuple:
+    coordinates = series.str.strip("[]").str.split(", ", expand=True)
+    return coordinates[0], coordinates[1]
+
+
+def legacy_parse_utm(df: pd.DataFrame) -> tuple:
+    coords = df["location_coords_type"].str.strip("(assumed)").str.split(expand=True)
+    zone, datum = coords[1], coords[2]
+    eastings, northings = legacy_split_coordinates(df["location_coords"])
+    zone = zone.str.extract(r"^(\d+)", expand=False).values
+    return utm_to_latlon(zone, datum.values, eastings.values, northings.values)
+
+
+def legacy_normalise(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous normalisation, up to the Canada join: one mask and split per type,
+    then the swap and sign passes over the whole frame.
+    """
+    new_df = df[COLUMNS].copy()
+    new_df["location_coords"] = new_df["location_coords"].astype(str)
+    types = new_df["location_coords_type"].astype(str)
+    lat_lng_idx = types == "Lat/lng"
+    lat_lng_dd_idx = types == "Lat/Long Decimal Degrees"
+    lat_lon_idx = types == "LatLon"
+    utm_idx = types.str.startswith("UTM")
+
+    new_df["latitude"] = np.nan
+    new_df["longitude"] = np.nan
+    for idx in (lat_lng_idx, lat_lng_dd_idx):
+        latitude, longitude = legacy_split_coordinates(new_df["location_coords"][idx])
+        new_df.loc[idx, "latitude"] = pd.to_numeric(latitude, errors="coerce")
+        new_df.loc[idx, "longitude"] = pd.to_numeric(longitude, errors="coerce")
+    longitude, latitude = legacy_split_coordinates(new_df["location_coords"][lat_lon_idx])
+    new_df.loc[lat_lon_idx, "latitude"] = pd.to_numeric(latitude, errors="coerce")
+    new_df.loc[lat_lon_idx, "longitude"] = pd.to_numeric(longitude, errors="coerce")
+
+    lats, longs = legacy_parse_utm(new_df[utm_idx])
+    new_df.loc[utm_idx, "latitude"] = lats
+    new_df.loc[utm_idx, "longitude"] = longs
+
+    new_df["latitude"] = abs(new_df["latitude"].astype(float))
+    idx = new_df["latitude"] > 90
+    new_df.loc[idx, ["latitude", "longitude"]] = new_df.loc[idx, ["longitude", "latitude"]].values
+    new_df["longitude"] = -1 * abs(new_df["longitude"].astype(float))
+    new_df["latitude"] = abs(new_df["latitude"].astype(float))
+    return new_df
+
+
+def normalise(df: pd.DataFrame) -> pd.DataFrame:
+    """`normalise_coordinates` up to the Canada join."""
+    new_df = df[COLUMNS].copy()
+    new_df["location_coords"] = new_df["location_coords"].astype(str)
+    new_df["latitude"], new_df["longitude"] = parse_coordinates(
+        new_df["location_coords"], new_df["location_coords_type"]
+    )
+    return new_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Keep the best of this many runs.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    with tempfile.TemporaryDirectory() as work:
+        path = os.path.join(work, "raw.parquet")
+        write_raw_incidents(path, args.rows, args.seed)
+
+        timings, results = {}, {}
+        for name, run in (("legacy", legacy_normalise), ("single pass", normalise)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                get_transformer.cache_clear()
+                start = time.perf_counter()
+                results[name] = run(read_parquet(path, COLUMNS))
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+
+    legacy, single = results["legacy"], results["single pass"]
+    for column in ("latitude", "longitude"):
+        np.testing.assert_allclose(single[column], legacy[column], equal_nan=True)
+    pairs = len(single[["location_coords", "location_coords_type"]].drop_duplicates())
+
+    print(f"rows: {args.rows:,} ({pairs:,} unique coords and types)")
+    for name, seconds in timings.items():
+        print(f"{name + ':':<13} {seconds:10.2f}s ({args.rows / seconds:,.0f} rows/s)")
+    print(f"speed-up:     {timings['legacy'] / timings['single pass']:10.1f}x")
+    print(f"parsed:       {single['latitude'].notna().sum():,} rows, identical to legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark building and querying `transform.feature_store` on synthetic daily weather.
+
+Building is compared against pandas' grouped `rolling`, and store lookups against
+re-scanning each station's daily rows per incident, the work of computing antecedent
+conditions on demand. The re-scan is timed on a sample of incidents and extrapolated.
+
+Run from the repository root:
+    python -m scripts.bench_feature_store --stations 100 1000 --years 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from transform.feature_store import (
+    FEATURE_COLUMNS,
+    ROLLING,
+    SOURCE_COLUMNS,
+    WINDOWS,
+    FeatureStore,
+    build_features,
+)
+
+
+def synthetic_daily(stations: int, years: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns `years` of daily rows for each of `stations` stations, with 10% of days
+    missing and 20% of readings null.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(f"{2025 - years}-01-01", periods=365 * years, freq="D")
+    station_id = np.repeat(np.arange(stations).astype(str), len(days))
+    date = np.tile(days.to_numpy(), stations)
+    kept = rng.random(len(date)) >= 0.1
+    daily = pd.DataFrame({"station_id": station_id[kept], "date": date[kept]})
+    for column in SOURCE_COLUMNS:
+        values = rng.normal(0, 10, kept.sum()).round(1)
+        values[rng.random(kept.sum()) < 0.2] = np.nan
+        daily[column] = values
+    return daily
+
+
+def pandas_rolling(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    The grouped-rolling equivalent of `build_features`, without the derived columns.
+    """
+    frames = []
+    for _, group in daily.groupby("station_id", sort=True):
+        group = group.set_index("date").asfreq("D")
+        for w in WINDOWS:
+            for column, how in ROLLING:
+                group[f"{column} {w}d {how}"] = getattr(
+                    group[column].rolling(w, min_periods=1), how
+                )()
+        frames.append(group)
+    return pd.concat(frames)
+
+
+def rescan(daily: pd.DataFrame, station_id: str, date: pd.Timestamp) -> dict:
+    """
+    Features for one incident by filtering the station's daily rows for each window.
+    """
+    rows = daily[daily["station_id"] == station_id]
+    features = {}
+    for w in WINDOWS:
+        window = rows[(rows["date"] > date - pd.Timedelta(days=w)) & (rows["date"] <= date)]
+        for column, how in ROLLING:
+            features[f"{column} {w}d {how}"] = getattr(window[column], how)()
+    return features
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, nargs="+", default=[100, 1_000])
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--incidents", type=int, default=100_000)
+    parser.add_argument("--rescan-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        f"{'stations':>8} {'days':>11} {'build s':>8} {'rolling s':>10} "
+        f"{'lookup s':>9} {'lookups/s':>11} {'rescan s (est)':>15}"
+    )
+    for n in args.stations:
+        daily = synthetic_daily(n, args.years)
+        features, build_s = timed(build_features, daily)
+        _, rolling_s = timed(pandas_rolling, daily)
+        store = FeatureStore.from_features(features)
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(daily), args.incidents)
+        station_ids = daily["station_id"].to_numpy()[picks]
+        dates = daily["date"].to_numpy()[picks]
+        _, lookup_s = timed(store.lookup, station_ids, dates, FEATURE_COLUMNS)
+
+        sample = range(min(args.rescan_sample, args.incidents))
+        start = time.perf_counter()
+        for i in sample:
+            rescan(daily, station_ids[i], pd.Timestamp(dates[i]))
+        rescan_s = (time.perf_counter() - start) / len(sample) * args.incidents
+
+        print(
+            f"{n:>8,} {len(features):>11,} {build_s:>8.2f} {rolling_s:>10.2f} "
+            f"{lookup_s:>9.3f} {args.incidents / lookup_s:>11,.0f} {rescan_s:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
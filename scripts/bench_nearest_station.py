@@ -0,0 +1,111 @@
+"""
+Scaling benchmark for `transform.nearest_station` on synthetic station inventories.
+
+The BallTree path is compared against a brute-force haversine cross join, the same
+O(incidents x stations) work the `nearest_weather_station` view does, timed on a
+sample of incidents and extrapolated.
+
+Run from the repository root:
+    python -m scripts.bench_nearest_station --stations 10000 50000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from transform.nearest_station import EARTH_RADIUS_KM, nearest_stations
+
+
+def synthetic_stations(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns a station inventory of `n` stations scattered over western Canada, with
+    roughly 5% sharing coordinates with another station under a new name.
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(48.0, 60.0, n).round(2)
+    lon = rng.uniform(-139.0, -110.0, n).round(2)
+    renamed = rng.random(n) < 0.05
+    lat[renamed] = np.roll(lat, 1)[renamed]
+    lon[renamed] = np.roll(lon, 1)[renamed]
+    first = rng.integers(1900, 2015, n)
+    last = np.minimum(first + rng.integers(1, 80, n), 2025)
+    return pd.DataFrame(
+        {
+            "station_name": [f"STATION {i}" for i in range(n)],
+            "station_id": np.arange(n).astype(str),
+            "latitude_dd": lat,
+            "longitude_dd": lon,
+            "first_year": first,
+            "last_year": last,
+            "dly_first_year": first,
+            "dly_last_year": last,
+        }
+    )
+
+
+def synthetic_incidents(n: int, seed: int = 1) -> pd.DataFrame:
+    """
+    Returns `n` incidents over the same area between 1990 and 2024.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("1990-01-01") + pd.to_timedelta(rng.integers(0, 35 * 365, n), unit="D")
+    return pd.DataFrame(
+        {
+            "ob_date": dates.strftime("%Y-%m-%d"),
+            "latitude": rng.uniform(48.5, 59.5, n),
+            "longitude": rng.uniform(-138.0, -111.0, n),
+        }
+    )
+
+
+def brute_force_nearest(incidents: pd.DataFrame, stations: pd.DataFrame) -> np.ndarray:
+    """
+    Distance in km to the nearest active station for each incident, by cross join.
+    """
+    years = pd.to_datetime(incidents["ob_date"]).dt.year.to_numpy()
+    lat1 = np.radians(incidents["latitude"].to_numpy())[:, None]
+    lon1 = np.radians(incidents["longitude"].to_numpy())[:, None]
+    lat2 = np.radians(stations["latitude_dd"].to_numpy())[None, :]
+    lon2 = np.radians(stations["longitude_dd"].to_numpy())[None, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    active = (stations["dly_first_year"].to_numpy()[None, :] <= years[:, None]) & (
+        stations["dly_last_year"].to_numpy()[None, :] >= years[:, None]
+    )
+    return np.where(active, dist, np.inf).min(axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--incidents", type=int, default=20_000)
+    parser.add_argument("--brute-force-incidents", type=int, default=500)
+    args = parser.parse_args()
+
+    incidents = synthetic_incidents(args.incidents)
+    sample = incidents.iloc[: args.brute_force_incidents]
+
+    print(f"{'stations':>10} {'balltree (s)':>13} {'cross join (s)':>15} {'speed-up':>9}")
+    for n in args.stations:
+        stations = synthetic_stations(n)
+
+        start = time.perf_counter()
+        result = nearest_stations(incidents, stations)
+        tree_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = brute_force_nearest(sample, stations)
+        brute_time = (time.perf_counter() - start) * len(incidents) / len(sample)
+
+        got = result.groupby("incident")["distance(km)"].min().reindex(sample.index)
+        np.testing.assert_allclose(got.to_numpy(), expected, atol=1e-3)
+        print(f"{n:>10,} {tree_time:>13.2f} {brute_time:>15.2f} {brute_time / tree_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
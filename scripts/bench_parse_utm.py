@@ -0,0 +1,108 @@
+"""
+Benchmark the UTM path of the coordinate transform against the original per-row
+`pyproj.transform` loop from `parse_utm`.
+
+The synthetic points go through `parse_coordinates` end to end, as UTM
+`location_coords` strings with their `location_coords_type`, so the parsing of the
+coordinates, zones and datums is checked along with the grouped conversion in
+`transform.utm`. The legacy loop builds two projections per row and takes hours on 1M
+rows, so it is timed on a sample of `--legacy-rows` and extrapolated.
+
+Run from the repository root:
+    python -m scripts.bench_parse_utm --rows 1000000
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyproj
+
+from transform.transform_ava_coords import parse_coordinates
+from transform.utm import get_transformer
+
+# Zones covering the Canadian avalanche terrain, in eastings/northings that fall inside.
+ZONES = ["8", "9", "10", "11", "12"]
+DATUMS = ["NAD83", "NAD27", "WGS84", "Unknown"]
+
+
+def synthetic_utm(rows: int, seed: int = 0) -> tuple:
+    """
+    Returns zone, datum, easting and northing arrays for `rows` synthetic UTM points.
+    """
+    rng = np.random.default_rng(seed)
+    zone = rng.choice(ZONES, size=rows)
+    datum = rng.choice(DATUMS, size=rows, p=[0.6, 0.2, 0.15, 0.05])
+    eastings = rng.uniform(300_000, 700_000, size=rows)
+    northings = rng.uniform(5_400_000, 6_600_000, size=rows)
+    return zone, datum, eastings, northings
+
+
+def utm_strings(zone, datum, eastings, northings, seed: int = 0) -> tuple:
+    """
+    Returns the points as the incidents API gives them: `location_coords` strings and
+    `location_coords_type` such as "UTM 11U NAD83", a tenth marked "(assumed)".
+    """
+    rng = np.random.default_rng(seed)
+    coords = "[" + pd.Series(eastings).astype(str) + ", " + pd.Series(northings).astype(str) + "]"
+    types = "UTM " + pd.Series(zone) + "U " + pd.Series(datum)
+    assumed = rng.random(len(types)) < 0.1
+    types[assumed] = types[assumed] + " (assumed)"
+    return coords, types
+
+
+def legacy_utm_to_latlon(zone, datum, eastings, northings) -> tuple:
+    """
+    The original row-by-row loop from `parse_utm`.
+    """
+    lats, longs = [], []
+    for i in range(len(zone)):
+        if datum[i] == "Unknown":
+            lats.append(np.nan)
+            longs.append(np.nan)
+        else:
+            utm_proj = pyproj.Proj(proj="utm", zone=zone[i], datum=datum[i])
+            wgs84_proj = pyproj.Proj(proj="latlong", datum="WGS84")
+            long, lat = pyproj.transform(utm_proj, wgs84_proj, eastings[i], northings[i])
+            lats.append(lat)
+            longs.append(long)
+    return lats, longs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    zone, datum, eastings, northings = synthetic_utm(args.rows, args.seed)
+
+    n = min(args.legacy_rows, args.rows)
+    start = time.perf_counter()
+    legacy_lats, legacy_longs = legacy_utm_to_latlon(
+        zone[:n], datum[:n], eastings[:n], northings[:n]
+    )
+    legacy_per_row = (time.perf_counter() - start) / n
+
+    coords, types = utm_strings(zone, datum, eastings, northings, args.seed)
+    get_transformer.cache_clear()
+    start = time.perf_counter()
+    lats, longs = parse_coordinates(coords, types)
+    grouped = time.perf_counter() - start
+
+    np.testing.assert_allclose(lats[:n], legacy_lats, equal_nan=True)
+    np.testing.assert_allclose(longs[:n], legacy_longs, equal_nan=True)
+
+    legacy_total = legacy_per_row * args.rows
+    print(f"rows: {args.rows:,}")
+    print(f"legacy loop:  {legacy_total:10.2f}s (extrapolated from {n:,} rows)")
+    print(f"grouped:      {grouped:10.2f}s ({args.rows / grouped:,.0f} rows/s)")
+    print(f"speed-up:     {legacy_total / grouped:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
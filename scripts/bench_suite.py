@@ -0,0 +1,385 @@
+"""
+Benchmark every pipeline stage on deterministic synthetic data at several scales.
+
+At each scale the inputs of a stage are generated first, and then the stage runs in a
+fresh subprocess. That subprocess records the stage's wall time, its rows per second
+and its peak RSS. The extract stages download from the local stand-ins in
+`scripts.stand_in_servers`: the incidents API and the weather bulk download. The
+stand-ins run in this process, so serving them costs the stage nothing but latency.
+The station inventory and incidents for the nearest-station stage come from
+`scripts.bench_nearest_station`.
+The coordinates stage classifies the incidents against a stand-in provincial boundary,
+as the boundary shapefile is not in the repository, and fails if any incident is lost.
+
+Scale 1 is `BASE_SIZES`. Scale 10 and scale 100 multiply every size.
+
+The results are compared with a baseline JSON file; a stage is flagged as a regression
+when it is slower or uses more memory than its baseline by more than the tolerances,
+and the run then exits with status 1. `--save` writes the results as the new baseline.
+Baselines are machine-specific; compare runs from the same machine.
+
+Run from the repository root:
+    python -m scripts.bench_suite --scales 1 10 --save
+    python -m scripts.bench_suite --scales 1 10 --stages coordinates aggregate
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from extract.weather_archive import MEASURE_COLUMNS, append_station_year
+from scripts.bench_nearest_station import synthetic_incidents, synthetic_stations
+from scripts.bench_training_matrix import peak_rss_mib
+from scripts.stand_in_servers import (
+    incident_frame,
+    incidents_app,
+    serve,
+    weather_app,
+    weather_csv,
+)
+from transform.feature_store import FEATURE_COLUMNS
+
+BASELINE_PATH = "scripts/bench_baseline.json"
+BASELINE_VERSION = 1
+
+# Rows of the main input of each stage at scale 1.
+BASE_SIZES = {
+    "incidents": 200,  # incidents listed and fetched
+    "weather": 20,  # station-years downloaded
+    "coordinates": 10_000,  # raw incidents
+    "nearest_stations": 10_000,  # incidents, against STATIONS stations
+    "aggregate": 20,  # archived station-years, and 100 listed days per station-year
+    "features": 20,  # archived station-years
+    "load": 2_000,  # avalanche days, with 10 dull days for each
+}
+STAGES = list(BASE_SIZES)
+STATIONS = 8_000
+DAYS_PER_STATION_YEAR = 100
+DULL_PER_AVALANCHE = 10
+
+# Stand-in server latency in seconds; the weather server never throttles.
+LATENCY = 0.005
+WEATHER_URL = "{base}/climate_data/bulk_data_e.html?format=csv&stationID={id}&Year={year}&Month=1&Day=1&timeframe=2&submit=%20Download+Data"
+
+
+def station_years(n: int) -> list[tuple[str, int]]:
+    """`n` (station_id, year) pairs, five years per station."""
+    return [(str(1000 + i // 5), 2000 + i % 5) for i in range(n)]
+
+
+def write_archive(root: str, n: int) -> None:
+    """Archive `n` station-years of `weather_csv` days under `root`."""
+    for station_id, year in station_years(n):
+        append_station_year(root, station_id, year, weather_csv(station_id, year).encode())
+
+
+def write_boundaries(work: str) -> None:
+    """Write a stand-in provincial boundary cache under `work`, so the coordinates stage
+    runs without the boundary shapefile. It covers the area of `incident_frame`."""
+    import shapely
+
+    from transform.canada_index import CANADA_INDEX_CACHE, save_canada_index
+
+    geoms = np.array([shapely.box(-125.0, 48.0, -110.0, 55.0)])
+    save_canada_index(geoms, np.array(["B.C."]), os.path.join(work, CANADA_INDEX_CACHE), 0.0)
+
+
+def prepare(stage: str, rows: int, work: str) -> None:
+    """Write the inputs of `stage` at `rows` into `work`; the stand-ins need none."""
+    os.makedirs(work, exist_ok=True)
+    if stage == "coordinates":
+        raw = incident_frame(rows)
+        raw["location_coords"] = (
+            "[" + raw["coord_0"].astype(str) + ", " + raw["coord_1"].astype(str) + "]"
+        )
+        raw[["ob_date", "location_coords", "location_coords_type"]].to_parquet(
+            os.path.join(work, "raw.parquet")
+        )
+        write_boundaries(work)
+    elif stage == "nearest_stations":
+        synthetic_incidents(rows).to_csv(os.path.join(work, "incidents.csv"), index=False)
+        synthetic_stations(STATIONS).to_csv(os.path.join(work, "stations.csv"), index=False)
+    elif stage in ("aggregate", "features"):
+        write_archive(os.path.join(work, "archive"), rows)
+        rng = random.Random(0)
+        days = [
+            (station_id, f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            for station_id, year in station_years(rows)
+            for _ in range(DAYS_PER_STATION_YEAR)
+        ]
+        pd.DataFrame(days, columns=["station_id", "date"]).to_csv(
+            os.path.join(work, "days.csv"), index=False
+        )
+    elif stage == "load":
+        rng = np.random.default_rng(0)
+        columns = MEASURE_COLUMNS + FEATURE_COLUMNS
+        os.makedirs(os.path.join(work, "data"), exist_ok=True)
+        os.makedirs(os.path.join(work, "load"), exist_ok=True)
+        for name, n in (("avs_weather", rows), ("dull_weather", rows * DULL_PER_AVALANCHE)):
+            df = pd.DataFrame(rng.normal(0, 10, (n, len(columns))).round(1), columns=columns)
+            df.to_csv(os.path.join(work, "data", f"{name}.csv"), index=False)
+
+
+def run_stage(stage: str, rows: int, work: str, base: str | None) -> int:
+    """Run `stage` on the inputs `prepare` wrote; returns the rows it processed."""
+    if stage == "incidents":
+        from extract.extract_data import generate_canadian_avalanche_data, generate_incident_urls
+
+        async def extract() -> int:
+            urls = await asyncio.to_thread(
+                generate_incident_urls, f"{base}/public/incidents/?format=json"
+            )
+            return await generate_canadian_avalanche_data(
+                urls,
+                os.path.join(work, "raw.parquet"),
+                detail_url=f"{base}/public/incidents/{{}}/?format=json",
+            )
+
+        return asyncio.run(extract())
+
+    if stage == "weather":
+        from extract.downloader import download
+
+        appended = []
+        root = os.path.join(work, "archive")
+        jobs = [
+            (WEATHER_URL.format(base=base, id=station_id, year=year), (station_id, year))
+            for station_id, year in station_years(rows)
+        ]
+        asyncio.run(
+            download(
+                jobs, lambda key, body: appended.append(append_station_year(root, *key, body))
+            )
+        )
+        return sum(appended)
+
+    if stage == "coordinates":
+        from transform.transform_ava_coords import COLUMNS, normalise_coordinates
+
+        # The boundary cache is read relative to the working directory.
+        os.chdir(work)
+        raw = pd.read_parquet("raw.parquet", columns=COLUMNS)
+        coords = normalise_coordinates(raw)
+        if len(coords) < len(raw):
+            raise RuntimeError(f"{len(raw) - len(coords)} of {len(raw)} incidents were lost.")
+        coords.to_csv("coords.csv", index=False)
+        return len(raw)
+
+    if stage == "nearest_stations":
+        from transform.nearest_station import VIEW_COLUMNS, nearest_stations
+
+        incidents = pd.read_csv(os.path.join(work, "incidents.csv"))
+        stations = pd.read_csv(os.path.join(work, "stations.csv"), dtype={"station_id": str})
+        result = nearest_stations(incidents, stations)
+        result[VIEW_COLUMNS].to_csv(os.path.join(work, "nearest.csv"), index=False)
+        return len(incidents)
+
+    if stage == "aggregate":
+        from transform.weather_aggregate import aggregate_means, refresh_aggregates
+
+        with tempfile.TemporaryDirectory(dir=work) as state_dir:
+            state = refresh_aggregates(
+                state_dir, os.path.join(work, "archive"), os.path.join(work, "days.csv")
+            )
+            aggregate_means(state).to_csv(os.path.join(work, "means.csv"))
+        return len(state.folded)
+
+    if stage == "features":
+        from extract.weather_archive import read_archive
+        from pipeline.schema import to_pandas
+        from transform.feature_store import SOURCE_COLUMNS, build_features, write_feature_store
+
+        daily = to_pandas(read_archive(os.path.join(work, "archive"), SOURCE_COLUMNS))
+        write_feature_store(build_features(daily), os.path.join(work, "features.parquet"))
+        return len(daily)
+
+    if stage == "load":
+        from transform import transformFinalData
+
+        # The load stage reads and writes paths relative to the working directory.
+        os.chdir(work)
+        transformFinalData.in_memory()
+        return rows * (1 + DULL_PER_AVALANCHE)
+
+    raise ValueError(f"Unknown stage {stage!r}.")
+
+
+@contextmanager
+def serving(stage: str, rows: int):
+    """Serve the stand-in `stage` downloads from on a background event loop, yielding
+    its base URL, or None if the stage downloads nothing."""
+    if stage == "incidents":
+        app = incidents_app(incident_frame(rows), latency=LATENCY)
+    elif stage == "weather":
+        app = weather_app(latency=LATENCY, capacity=1_000_000)
+    else:
+        yield None
+        return
+
+    loop = asyncio.new_event_loop()
+    ready: concurrent.futures.Future = concurrent.futures.Future()
+    stop = asyncio.Event()
+
+    async def hold() -> None:
+        async with serve(app) as base:
+            ready.set_result(base)
+            await stop.wait()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(hold(),), daemon=True)
+    thread.start()
+    try:
+        yield ready.result(timeout=30)
+    finally:
+        loop.call_soon_threadsafe(stop.set)
+        thread.join()
+        loop.close()
+
+
+def measure(stage: str, rows: int, work: str, base: str | None) -> dict:
+    """Run `stage` in a fresh interpreter; its result, or its `error` if it failed."""
+    command = [sys.executable, "-m", "scripts.bench_suite", "--run", stage, str(rows), work]
+    out = subprocess.run(command + ([base] if base else []), capture_output=True, text=True)
+    if out.returncode != 0:
+        lines = out.stderr.strip().splitlines() or [f"exit code {out.returncode}"]
+        return {"error": lines[-1]}
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float):
+    """Flag each result against its baseline: "failed", "regression", "improved", "ok"
+    or "new"."""
+    flags = {}
+    for key, result in results.items():
+        base = baseline.get(key)
+        if "error" in result:
+            flags[key] = "failed"
+        elif base is None:
+            flags[key] = "new"
+        elif result["seconds"] > base["seconds"] * (1 + time_tolerance) or result[
+            "peak_rss_mib"
+        ] > base["peak_rss_mib"] * (1 + memory_tolerance):
+            flags[key] = "regression"
+        elif result["seconds"] < base["seconds"] / (1 + time_tolerance):
+            flags[key] = "improved"
+        else:
+            flags[key] = "ok"
+    return flags
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path} is not a version {BASELINE_VERSION} baseline.")
+    return baseline["results"]
+
+
+def save_baseline(results: dict, path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(
+            {
+                "version": BASELINE_VERSION,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "machine": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp, path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per stage; the fastest counts."
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Save the results as the baseline.")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.15)
+    parser.add_argument("--workdir", help="Keep the generated data here instead of a temp dir.")
+    parser.add_argument("--run", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        stage, rows, work, *base = args.run
+        start = time.perf_counter()
+        processed = run_stage(stage, int(rows), work, base[0] if base else None)
+        seconds = time.perf_counter() - start
+        print(json.dumps({"seconds": seconds, "rows": processed, "peak_rss_mib": peak_rss_mib()}))
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.workdir or tmp
+        for scale in args.scales:
+            for stage in args.stages:
+                key, rows = f"{stage}@{scale}x", BASE_SIZES[stage] * scale
+                runs = []
+                for i in range(args.repeat):
+                    work = os.path.join(root, f"{stage}-{scale}x-{i}")
+                    prepare(stage, rows, work)
+                    with serving(stage, rows) as base:
+                        runs.append(measure(stage, rows, work, base))
+                failed = [r for r in runs if "error" in r]
+                if failed:
+                    results[key] = failed[0]
+                    print(f"{key:<24} failed: {failed[0]['error']}", flush=True)
+                    continue
+                best = min(runs, key=lambda r: r["seconds"])
+                results[key] = result = {
+                    "seconds": round(best["seconds"], 4),
+                    "rows": best["rows"],
+                    "rows_per_s": round(best["rows"] / best["seconds"], 1),
+                    "peak_rss_mib": round(max(r["peak_rss_mib"] for r in runs), 1),
+                }
+                print(
+                    f"{key:<24} {result['seconds']:>9.3f}s {result['rows_per_s']:>14,.0f} rows/s "
+                    f"{result['peak_rss_mib']:>9.1f} MiB",
+                    flush=True,
+                )
+
+    flags = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    nan = float("nan")
+    print(f"\n{'stage':<24} {'seconds':>9} {'baseline':>9} {'MiB':>8} {'baseline':>9}  flag")
+    for key, result in results.items():
+        base = baseline.get(key, {})
+        print(
+            f"{key:<24} {result.get('seconds', nan):>9.3f} {base.get('seconds', nan):>9.3f} "
+            f"{result.get('peak_rss_mib', nan):>8.1f} {base.get('peak_rss_mib', nan):>9.1f}  "
+            f"{flags[key]}"
+        )
+
+    if args.save:
+        passed = {key: result for key, result in results.items() if "error" not in result}
+        save_baseline({**baseline, **passed}, args.baseline)
+        print(f"Saved {len(passed)} results to {args.baseline}.")
+    return 1 if {"failed", "regression"} & set(flags.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
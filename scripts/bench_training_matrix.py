@@ -0,0 +1,132 @@
+"""
+Benchmark loading the training data from the load-stage CSV and from the memory-mapped
+matrix written by `transform.training_matrix`.
+
+The current `load/full_cleaned.csv` is repeated `--scale` times with a little noise.
+Each load runs in a fresh subprocess, so import and allocation state is not shared.
+Cold loads first evict the files from the page cache with `posix_fadvise`; warm loads
+follow a load of the same files. "first pass" also reads every value once, which is
+when a memory-mapped matrix is actually paged in.
+
+Run from the repository root:
+    python -m scripts.bench_training_matrix --scale 100
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from transform.training_matrix import (
+    LABEL_COLUMN,
+    load_training_matrix,
+    matrix_paths,
+    write_training_matrix,
+)
+
+SOURCE = "load/full_cleaned.csv"
+
+
+def write_scaled(prefix: str, scale: int) -> int:
+    """
+    Writes `prefix`.csv and its training matrix at `scale` times the source rows.
+    """
+    source = pd.read_csv(SOURCE)
+    rng = np.random.default_rng(0)
+    df = pd.concat([source] * scale, ignore_index=True)
+    features = df.columns.drop(LABEL_COLUMN)
+    df[features] += rng.normal(0, 0.01, (len(df), len(features)))
+    df.to_csv(f"{prefix}.csv", index=False)
+    write_training_matrix(df, prefix)
+    return len(df)
+
+
+def evict(paths: list[str]) -> None:
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def peak_rss_mib() -> float:
+    """
+    This process's peak RSS. Unlike `ru_maxrss`, VmHWM is not inherited from the
+    benchmark process that forked it.
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(method: str, prefix: str) -> None:
+    start = time.perf_counter()
+    if method == "csv":
+        df = pd.read_csv(f"{prefix}.csv")
+        X, y = df.drop(columns=LABEL_COLUMN).to_numpy(), df[LABEL_COLUMN].to_numpy()
+    else:
+        matrix = load_training_matrix(prefix)
+        X, y = matrix.X, matrix.y
+    opened = time.perf_counter() - start
+    X.sum(axis=0), y.sum()
+    first_pass = time.perf_counter() - start
+    print(json.dumps({"open": opened, "first_pass": first_pass, "peak_rss_mib": peak_rss_mib()}))
+
+
+def measure(method: str, prefix: str, cold: bool) -> dict:
+    if cold:
+        evict([f"{prefix}.csv", *matrix_paths(prefix)[:2]])
+    out = subprocess.run(
+        [sys.executable, "-m", "scripts.bench_training_matrix", "--run", method, prefix],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--run", nargs=2, metavar=("METHOD", "PREFIX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        prefix = os.path.join(root, "full_cleaned")
+        rows = write_scaled(prefix, args.scale)
+        sizes = {
+            "csv": os.path.getsize(f"{prefix}.csv"),
+            "npy": sum(os.path.getsize(p) for p in matrix_paths(prefix)[:2]),
+        }
+        print(
+            f"{rows:,} rows; CSV {sizes['csv'] / 1024**2:.1f} MiB, npy {sizes['npy'] / 1024**2:.1f} MiB"
+        )
+        print(
+            f"{'method':>6} {'cache':>5} {'open s':>8} {'first pass s':>13} {'peak RSS MiB':>13}"
+        )
+        for method in ("csv", "npy"):
+            for cache, cold in (("cold", True), ("warm", False)):
+                result = measure(method, prefix, cold)
+                print(
+                    f"{method:>6} {cache:>5} {result['open']:>8.3f} "
+                    f"{result['first_pass']:>13.3f} {result['peak_rss_mib']:>13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Run the async weather downloader against the local stand-in server, with injected
+latency, throttling and 5xx errors, and compare against the old serial loop.
+
+Run from the repository root:
+    python -m scripts.bench_weather_download --requests 500 --capacity 8 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from extract.downloader import AdaptiveLimiter, download
+from extract.weather_archive import append_station_year
+from scripts.stand_in_servers import serve, weather_app
+
+URL = "{base}/climate_data/bulk_data_e.html?format=csv&stationID={id}&Year={year}&Month=1&Day=1&timeframe=2&submit=%20Download+Data"
+
+# The fixed sleep between requests in the old get_weather_daily loop.
+LEGACY_SLEEP = 0.1
+
+
+async def run(args: argparse.Namespace) -> None:
+    app = weather_app(args.latency, args.capacity, args.error_rate)
+    async with serve(app) as base:
+        with tempfile.TemporaryDirectory() as out:
+            root = os.path.join(out, "archive")
+            jobs = [
+                (URL.format(base=base, id=i, year=2000 + i % 20), (str(i), 2000 + i % 20))
+                for i in range(args.requests)
+            ]
+            limiter = AdaptiveLimiter(maximum=args.max_limit)
+            start = time.perf_counter()
+            # Each download is archived as extract_weather.py does.
+            stats = await download(
+                jobs, lambda key, body: append_station_year(root, *key, body), limiter
+            )
+            elapsed = time.perf_counter() - start
+
+    legacy = args.requests * (args.latency + LEGACY_SLEEP)
+    print(f"downloaded {stats.downloaded}/{args.requests}, failed {stats.failed}")
+    print(
+        f"retries {stats.retries}, throttled {stats.throttled}, final limit {int(limiter.limit)}"
+    )
+    print(f"server: {app['stats']}")
+    print(f"async:  {elapsed:8.2f}s ({stats.downloaded / elapsed:,.1f} files/s)")
+    print(f"serial: {legacy:8.2f}s (estimated, {args.latency}s latency + {LEGACY_SLEEP}s sleep)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=8, help="Server concurrency before 429s.")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--max-limit", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
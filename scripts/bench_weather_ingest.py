@@ -0,0 +1,105 @@
+"""
+Benchmark reading a directory of per-day weather CSVs with
+`extract.weather_archive.read_csv_dir`, and importing it with `import_csv_dir`, against
+the original `single_dataframe` loop of transformWeather.py, on synthetic files.
+
+Each measurement runs in a fresh subprocess so its peak RSS is its own. The legacy loop
+is quadratic in the number of files and is skipped above `--legacy-max`.
+
+Run from the repository root:
+    python -m scripts.bench_weather_ingest --files 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from extract.weather_archive import import_csv_dir, read_csv_dir
+from scripts.stand_in_servers import weather_csv
+
+
+def write_synthetic_files(root: str, n: int, rows: int, stations: int) -> None:
+    """
+    Writes `n` daily weather CSVs of `rows` days each, in the bulk-download layout,
+    spread over `stations` stations.
+    """
+    template = weather_csv("0", 2001).splitlines()
+    header, days = template[0], template[1:]
+    for i in range(n):
+        start = i % (len(days) - rows)
+        with open(os.path.join(root, f"{i}_STATION_{i % stations}.csv"), "w") as f:
+            f.write("\n".join([header, *days[start : start + rows]]) + "\n")
+
+
+def legacy_single_dataframe(root_path: str) -> pd.DataFrame:
+    """
+    The original loop from transformWeather.single_dataframe.
+    """
+    results = pd.DataFrame()
+    for file in os.listdir(root_path):
+        results = pd.concat([results, pd.read_csv(root_path + "/" + file)], ignore_index=True)
+    return results.reset_index().drop(columns="index")
+
+
+def measure(method: str, root: str) -> dict:
+    """
+    Runs one reader in a subprocess and returns its wall time, rows and peak RSS.
+    """
+    out = subprocess.run(
+        [sys.executable, "-m", "scripts.bench_weather_ingest", "--run", method, root],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def run(method: str, root: str) -> None:
+    start = time.perf_counter()
+    if method == "legacy":
+        rows = len(legacy_single_dataframe(root))
+    elif method == "parallel":
+        rows = read_csv_dir(root).num_rows
+    else:
+        with tempfile.TemporaryDirectory() as archive:
+            rows = import_csv_dir(archive, root)
+    elapsed = time.perf_counter() - start
+    peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "rows": rows, "peak_rss_mib": peak_mib}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--rows", type=int, default=1, help="Days per file.")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--legacy-max", type=int, default=10_000)
+    parser.add_argument("--run", nargs=2, metavar=("METHOD", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(*args.run)
+        return
+
+    print(f"{'files':>8} {'method':>8} {'seconds':>9} {'files/s':>10} {'peak RSS MiB':>13}")
+    for n in args.files:
+        with tempfile.TemporaryDirectory() as root:
+            write_synthetic_files(root, n, args.rows, args.stations)
+            methods = ["parallel", "import"] + (["legacy"] if n <= args.legacy_max else [])
+            for method in methods:
+                result = measure(method, root)
+                print(
+                    f"{n:>8,} {method:>8} {result['seconds']:>9.2f} "
+                    f"{n / result['seconds']:>10,.0f} {result['peak_rss_mib']:>13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Check that the pipeline modules import quickly and without their heavy dependencies.
+
+Each module is imported in a fresh interpreter with `-X importtime`, `--repeat` times,
+and the fastest cumulative import time is compared with its budget in `BUDGETS_MS`.
+The check fails if any module is over budget, or if importing it, or running its CLI
+with `--help`, imports one of `DEFERRED`. Those are only to be imported by the
+functions that use them.
+
+The budgets leave about twice the headroom of a slow single-core machine; `--scale`
+multiplies them, e.g. for a slower CI runner. tests/test_import_time.py runs the same
+checks under pytest, scaled by the `IMPORT_TIME_SCALE` environment variable.
+
+Run from the repository root:
+    python -m scripts.check_import_time
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Cumulative import time budgets, in milliseconds.
+BUDGETS_MS = {
+    "extract.extract_data": 2000,
+    "extract.extract_weather": 2000,
+    "transform.transform_ava_coords": 1100,
+    "transform.nearest_station": 1100,
+    "transform.transformWeather": 1200,
+    "transform.transformFinalData": 1200,
+    "transform.feature_store": 1300,
+    "transform.weather_aggregate": 1300,
+    "predict.train": 1300,
+    "predict.score": 1300,
+    "pipeline.runner": 200,
+}
+
+# Modules run as scripts; their `--help` is checked as well.
+CLIS = [
+    "extract.extract_weather",
+    "transform.transform_ava_coords",
+    "transform.nearest_station",
+    "transform.transformWeather",
+    "transform.transformFinalData",
+    "transform.feature_store",
+    "predict.train",
+    "predict.score",
+    "pipeline",
+]
+
+# Heavy dependencies that no module may import at the top level.
+DEFERRED = {"geopandas", "geopy", "pyproj", "shapely", "sklearn", "threadpoolctl"}
+
+
+def import_times(args: list[str]) -> dict[str, int]:
+    """The cumulative import time in microseconds of every module `python args` imports."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        check=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("| imported package"):
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def check_module(module: str, repeat: int = 5, scale: float = 1.0) -> tuple[float, list[str]]:
+    """Import `module` `repeat` times.
+
+    returns: Its fastest import time in milliseconds, and the failures found.
+    """
+    runs = [import_times(["-c", f"import {module}"]) for _ in range(repeat)]
+    ms = min(run[module] for run in runs) / 1000
+    budget = BUDGETS_MS[module] * scale
+    failures = []
+    if ms > budget:
+        failures.append(f"{module} took {ms:.0f}ms to import, over its {budget:.0f}ms budget.")
+    eager = sorted(DEFERRED & {name.split(".")[0] for name in runs[0]})
+    if eager:
+        failures.append(f"Importing {module} imports {', '.join(eager)}.")
+    return ms, failures
+
+
+def check_cli(module: str) -> list[str]:
+    """The failures found running `python -m module --help`."""
+    eager = sorted(DEFERRED & {n.split(".")[0] for n in import_times(["-m", module, "--help"])})
+    if eager:
+        return [f"`python -m {module} --help` imports {', '.join(eager)}."]
+    return []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the budgets.")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<32} {'import ms':>10} {'budget ms':>10}")
+    for module, budget in BUDGETS_MS.items():
+        ms, found = check_module(module, args.repeat, args.scale)
+        print(f"{module:<32} {ms:>10.1f} {budget * args.scale:>10.0f}")
+        failures.extend(found)
+    for module in CLIS:
+        failures.extend(check_cli(module))
+
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Check the sharded extraction end to end against the local stand-in APIs.
+
+For the incidents and then the weather, an unsharded run is compared with `--workers`
+worker processes run at once, each with its own `--shard i/N`, followed by `--merge`.
+The merged output must equal the unsharded run's, whatever the number of workers, and
+merging the weather shards again must append nothing. The shard assignment and the
+checks the merge makes are tested in tests/test_extract/test_sharding.py.
+
+The workers run the stage modules as the pipeline does, with the stand-in URLs and in
+a scratch working directory. The stand-ins are served from this process; see
+`scripts.stand_in_servers`.
+
+Run from the repository root:
+    python -m scripts.check_sharding --workers 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from extract.extract_weather import merge_weather_shards
+from extract.weather_archive import read_archive
+from extract.weather_coverage import STATION_COLUMNS
+from scripts.bench_suite import WEATHER_URL, serving, station_years
+
+
+def run_workers(module: str, args: list[str], work: str, workers: int) -> list[str]:
+    """Run `workers` shards of `module` at once in `work`, then merge them.
+
+    returns: The failures, as messages.
+    """
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    logs = [open(os.path.join(work, f"worker-{i}.log"), "w") for i in range(workers)]
+    commands = [
+        [sys.executable, "-m", module, "--shard", f"{i}/{workers}", *args] for i in range(workers)
+    ]
+    processes = [
+        subprocess.Popen(c, cwd=work, env=env, stdout=log, stderr=subprocess.STDOUT)
+        for c, log in zip(commands, logs)
+    ]
+    failures = []
+    for command, process, log in zip(commands, processes, logs):
+        code = process.wait()
+        log.close()
+        if code != 0:
+            with open(log.name) as f:
+                tail = f.read().strip().splitlines()[-1:]
+            failures.append(f"{' '.join(command[2:])} failed: {' '.join(tail)}")
+    if not failures:
+        merge = [sys.executable, "-m", module, "--merge", "--shards", str(workers)]
+        out = subprocess.run(merge + args, cwd=work, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            failures.append(f"{module} --merge failed: {out.stderr.strip()}")
+    return failures
+
+
+def run_reference(module: str, args: list[str], work: str) -> list[str]:
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    out = subprocess.run(
+        [sys.executable, "-m", module, *args], cwd=work, env=env, capture_output=True, text=True
+    )
+    return [] if out.returncode == 0 else [f"{module} failed: {out.stderr.strip()}"]
+
+
+def check_incidents(work: str, rows: int, workers: int) -> list[str]:
+    reference, sharded = os.path.join(work, "reference"), os.path.join(work, "sharded")
+    for d in (reference, sharded):
+        os.makedirs(os.path.join(d, "data"))
+    raw = os.path.join("data", "can_avs_raw.parquet")
+    with serving("incidents", rows) as base:
+        args = [
+            "--incidents-url",
+            f"{base}/public/incidents/?format=json",
+            "--detail-url",
+            f"{base}/public/incidents/{{}}/?format=json",
+        ]
+        start = time.time()
+        failures = run_reference("extract.extract_data", args, reference)
+        print(f"incidents: unsharded run took {time.time() - start:.1f}s")
+        start = time.time()
+        failures += run_workers("extract.extract_data", args, sharded, workers)
+        print(f"incidents: {workers} workers and the merge took {time.time() - start:.1f}s")
+    if failures:
+        return failures
+
+    expected = pq.read_table(os.path.join(reference, raw)).to_pandas()
+    merged = pq.read_table(os.path.join(sharded, raw)).to_pandas()
+    expected = expected.sort_values("id").reset_index(drop=True)[sorted(expected.columns)]
+    if expected.empty or not expected.equals(merged[sorted(merged.columns)]):
+        failures.append("The merged incidents differ from the unsharded run's.")
+    return failures
+
+
+def check_weather(work: str, rows: int, workers: int) -> list[str]:
+    reference, sharded = os.path.join(work, "reference"), os.path.join(work, "sharded")
+    days = pd.DataFrame(
+        [
+            (f"{year}-02-01", f"STATION {station_id}", 1.0, station_id)
+            for station_id, year in station_years(rows)
+        ],
+        columns=STATION_COLUMNS,
+    )
+    stations = pd.DataFrame({"station_id": days["station_id"].unique()})
+    stations = stations.assign(dly_first_year=1900, dly_last_year=2100)
+    for d in (reference, sharded):
+        os.makedirs(os.path.join(d, "data"))
+        days.to_csv(os.path.join(d, "data", "nearest_stations.csv"), index=False)
+        stations.to_csv(os.path.join(d, "data", "station_inv.csv"), index=False)
+    with serving("weather", rows) as base:
+        args = ["--url", WEATHER_URL.format(base=base, id="{id}", year="{year}")]
+        start = time.time()
+        failures = run_reference("extract.extract_weather", args, reference)
+        print(f"weather: unsharded run took {time.time() - start:.1f}s")
+        start = time.time()
+        failures += run_workers("extract.extract_weather", args, sharded, workers)
+        print(f"weather: {workers} workers and the merge took {time.time() - start:.1f}s")
+    if failures:
+        return failures
+
+    def archive(root: str) -> pd.DataFrame:
+        df = read_archive(os.path.join(root, "data", "weather_archive")).to_pandas()
+        return df.sort_values(["station_id", "date"]).reset_index(drop=True)
+
+    expected = archive(reference)
+    if expected.empty or not expected.equals(archive(sharded)):
+        failures.append("The merged weather archive differs from the unsharded run's.")
+    parts_dir = os.path.join(sharded, "data", "shards", "weather")
+    if merge_weather_shards(parts_dir, os.path.join(sharded, "data", "weather_archive")):
+        failures.append("Merging the weather shards twice appended rows.")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--incidents", type=int, default=500, help="Incidents served.")
+    parser.add_argument("--station-years", type=int, default=40, help="Station-years served.")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work:
+        os.makedirs(os.path.join(work, "incidents"))
+        os.makedirs(os.path.join(work, "weather"))
+        failures += check_incidents(os.path.join(work, "incidents"), args.incidents, args.workers)
+        failures += check_weather(os.path.join(work, "weather"), args.station_years, args.workers)
+
+    for failure in failures:
+        print(failure)
+    print("FAILED" if failures else "OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
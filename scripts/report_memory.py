@@ -0,0 +1,239 @@
+"""
+Report the memory of the frames each stage reads, with and without the compact types.
+
+A synthetic full history is written first: a weather archive with every day of
+`--years` years for `--stations` stations, `--incidents` raw incidents with their
+candidate stations, and a station inventory. Every frame a stage reads is then read
+twice. "before" reads it with the default types, as the stages did before
+pipeline/schema.py. "after" reads it as the stages now do. Each frame's deep memory is
+reported, with the totals per stage and overall.
+
+The run fails unless the overall reduction is at least `--min-ratio`.
+
+Run from the repository root:
+    python -m scripts.report_memory
+    python -m scripts.report_memory --stations 500 --years 35
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from extract.weather_archive import ARCHIVE_SCHEMA, PARTITIONING, read_archive, read_days
+from pipeline.schema import MEASURE_COLUMNS, frame_memory, read_csv, read_parquet, to_pandas
+from scripts.bench_nearest_station import synthetic_stations
+from scripts.stand_in_servers import incident_frame
+from transform.feature_store import SOURCE_COLUMNS
+from transform.transform_ava_coords import COLUMNS as RAW_COLUMNS
+
+INVENTORY_STATIONS = 8_000
+CANDIDATES = 3
+FIRST_YEAR = 1990
+
+
+def write_history(work: str, stations: int, years: int, incidents: int) -> None:
+    """Write the synthetic full history into `work`."""
+    rng = np.random.default_rng(0)
+    days = pd.date_range(f"{FIRST_YEAR}-01-01", f"{FIRST_YEAR + years - 1}-12-31")
+    station_ids = np.repeat(np.arange(stations).astype(str), len(days))
+    dates = np.tile(days.to_numpy("datetime64[D]"), stations)
+    values = rng.normal(0, 10, (len(dates), len(MEASURE_COLUMNS))).round(1)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    years_of = dates.astype("datetime64[Y]").astype(int) + 1970
+    table = pa.table(
+        {"date": pa.array(dates, pa.date32())}
+        | {c: values[:, i] for i, c in enumerate(MEASURE_COLUMNS)}
+        | {"station_id": station_ids, "year": pa.array(years_of, pa.int32())}
+    )
+    ds.write_dataset(
+        table,
+        os.path.join(work, "archive"),
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template="part-{i}.parquet",
+        max_partitions=stations * years,
+    )
+
+    raw = incident_frame(incidents)
+    raw["location_coords"] = (
+        "[" + raw["coord_0"].astype(str) + ", " + raw["coord_1"].astype(str) + "]"
+    )
+    raw[RAW_COLUMNS].to_parquet(os.path.join(work, "raw.parquet"))
+    pd.DataFrame(
+        {"ob_date": raw["ob_date"], "latitude": raw["coord_0"], "longitude": raw["coord_1"]}
+    ).to_csv(os.path.join(work, "incidents.csv"), index=False)
+
+    inventory = synthetic_stations(INVENTORY_STATIONS)
+    inventory["province"] = rng.choice(["BC", "AB", "YT", "NT"], len(inventory))
+    inventory["climate_id"] = [f"1{i:06d}" for i in range(len(inventory))]
+    inventory.to_csv(os.path.join(work, "station_inv.csv"), index=False)
+
+    # The incidents' candidate stations, nearest first, from the archived stations.
+    station = rng.integers(0, stations, (incidents, CANDIDATES))
+    candidates = pd.DataFrame(
+        {
+            "ob_date": np.repeat(raw["ob_date"].to_numpy(), CANDIDATES),
+            "station_name": [f"STATION {s}" for s in station.ravel()],
+            "distance(km)": rng.uniform(0, 60, station.size).round(3),
+            "station_id": station.ravel().astype(str),
+            "incident": np.repeat(np.arange(incidents), CANDIDATES),
+            "rank": np.tile(np.arange(1, CANDIDATES + 1), incidents),
+        }
+    )
+    candidates.to_csv(os.path.join(work, "nearest_stations.csv"), index=False)
+    candidates[candidates["rank"] == 1].drop(columns=["incident", "rank"]).to_csv(
+        os.path.join(work, "weather_stations.csv"), index=False
+    )
+
+
+def read_default_archive(root: str, columns: list[str], **filters) -> pd.DataFrame:
+    """The archive read as it was before the compact types, with the measures as
+    archived."""
+    table = read_archive(root, columns, **filters)
+    return table.cast(
+        pa.schema(
+            [
+                ARCHIVE_SCHEMA.field(c) if c in MEASURE_COLUMNS else f
+                for c, f in zip(table.column_names, table.schema)
+            ]
+        )
+    ).to_pandas()
+
+
+def read_default_days(root: str, days: pd.DataFrame) -> pd.DataFrame:
+    """`read_days` as it was before the compact types."""
+    days = days.assign(
+        station_id=days["station_id"].astype(str), date=pd.to_datetime(days["date"]).dt.date
+    )[["station_id", "date"]].drop_duplicates()
+    archive = read_default_archive(
+        root,
+        MEASURE_COLUMNS,
+        station_ids=days["station_id"].unique(),
+        years={d.year for d in days["date"]},
+    )
+    return archive.merge(days, on=["station_id", "date"], how="inner")
+
+
+def frames(work: str) -> dict:
+    """{stage: {frame: (read before, read after)}}"""
+
+    def path(name: str) -> str:
+        return os.path.join(work, name)
+
+    archive = path("archive")
+    coverage = ["station_id", "dly_first_year", "dly_last_year"]
+    listed = pd.read_csv(path("weather_stations.csv"), usecols=["ob_date", "station_id"])
+    listed = listed.rename(columns={"ob_date": "date"})
+    return {
+        "coordinates": {
+            "raw incidents": (
+                lambda: pd.read_parquet(path("raw.parquet"), columns=RAW_COLUMNS),
+                lambda: read_parquet(path("raw.parquet"), RAW_COLUMNS),
+            ),
+        },
+        "nearest_stations": {
+            "incidents": (
+                lambda: pd.read_csv(path("incidents.csv")),
+                lambda: read_csv(path("incidents.csv")),
+            ),
+            "station inventory": (
+                lambda: pd.read_csv(
+                    path("station_inv.csv"), dtype={"station_id": str, "climate_id": str}
+                ),
+                lambda: read_csv(path("station_inv.csv")),
+            ),
+        },
+        "weather": {
+            "candidate stations": (
+                lambda: pd.read_csv(path("nearest_stations.csv"), parse_dates=["ob_date"]),
+                lambda: read_csv(path("nearest_stations.csv")),
+            ),
+            "coverage": (
+                lambda: pd.read_csv(
+                    path("station_inv.csv"), usecols=coverage, dtype={"station_id": str}
+                ),
+                lambda: read_csv(path("station_inv.csv"), coverage),
+            ),
+        },
+        "dull_days": {
+            "archived days": (
+                lambda: read_default_archive(archive, ["Max Temp (°C)"]),
+                lambda: to_pandas(read_archive(archive, ["Max Temp (°C)"])),
+            ),
+        },
+        "features": {
+            "archive": (
+                lambda: read_default_archive(archive, SOURCE_COLUMNS),
+                lambda: to_pandas(read_archive(archive, SOURCE_COLUMNS)),
+            ),
+        },
+        "avs_weather": {
+            "listed days": (
+                lambda: read_default_days(archive, listed),
+                lambda: read_days(archive, listed, MEASURE_COLUMNS),
+            ),
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=200, help="Archived stations.")
+    parser.add_argument("--years", type=int, default=30, help="Archived years per station.")
+    parser.add_argument("--incidents", type=int, default=50_000)
+    parser.add_argument("--min-ratio", type=float, default=3.0)
+    args = parser.parse_args()
+
+    mib = 1024**2
+    totals = {"before": 0, "after": 0}
+    print(
+        f"{'stage':<18} {'frame':<20} {'rows':>10} {'before MiB':>11} {'after MiB':>10} {'ratio':>6}"
+    )
+    with tempfile.TemporaryDirectory() as work:
+        start = time.time()
+        write_history(work, args.stations, args.years, args.incidents)
+        written = time.time() - start
+        for stage, readers in frames(work).items():
+            stage_totals = {"before": 0, "after": 0}
+            for frame, (before, after) in readers.items():
+                old, new = before(), after()
+                if len(old) != len(new):
+                    print(f"{stage}: {frame} read {len(old)} rows before and {len(new)} after.")
+                    return 1
+                rows = len(new)
+                sizes = {"before": frame_memory(old), "after": frame_memory(new)}
+                del old, new
+                for key in sizes:
+                    stage_totals[key] += sizes[key]
+                    totals[key] += sizes[key]
+                print(
+                    f"{stage:<18} {frame:<20} {rows:>10} {sizes['before'] / mib:>11.1f} "
+                    f"{sizes['after'] / mib:>10.1f} {sizes['before'] / sizes['after']:>6.1f}"
+                )
+            print(
+                f"{stage:<18} {'(stage)':<20} {'':>10} {stage_totals['before'] / mib:>11.1f} "
+                f"{stage_totals['after'] / mib:>10.1f} "
+                f"{stage_totals['before'] / stage_totals['after']:>6.1f}"
+            )
+
+    ratio = totals["before"] / totals["after"]
+    print(
+        f"{'total':<18} {'':<20} {'':>10} {totals['before'] / mib:>11.1f} "
+        f"{totals['after'] / mib:>10.1f} {ratio:>6.1f}"
+    )
+    print(f"Wrote the synthetic history in {written:.1f}s; pandas {pd.__version__}.")
+    if ratio < args.min_ratio:
+        print(f"The reduction, {ratio:.1f}x, is less than {args.min_ratio}x.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
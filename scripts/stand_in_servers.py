@@ -0,0 +1,189 @@
+"""
+Local aiohttp stand-ins for the upstream APIs, for benchmarks and manual testing.
+
+The weather stand-in serves the climate.weather.gc.ca bulk-download endpoint with
+configurable latency, a server-side concurrency capacity above which it answers 429
+with `Retry-After`, and a random 5xx error rate.
+
+The incidents stand-in serves the incidents.avalanche.ca listing pages and incident
+details for a deterministic set of synthetic incidents from `incident_frame`.
+"""
+
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import AsyncIterator
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+WEATHER_HEADER = (
+    '"Longitude (x)","Latitude (y)","Station Name","Climate ID","Date/Time","Year","Month",'
+    '"Day","Data Quality","Max Temp (°C)","Max Temp Flag","Min Temp (°C)","Min Temp Flag",'
+    '"Mean Temp (°C)","Mean Temp Flag","Heat Deg Days (°C)","Heat Deg Days Flag",'
+    '"Cool Deg Days (°C)","Cool Deg Days Flag","Total Rain (mm)","Total Rain Flag",'
+    '"Total Snow (cm)","Total Snow Flag","Total Precip (mm)","Total Precip Flag",'
+    '"Snow on Grnd (cm)","Snow on Grnd Flag","Dir of Max Gust (10s deg)",'
+    '"Dir of Max Gust Flag","Spd of Max Gust (km/h)","Spd of Max Gust Flag"'
+)
+
+
+def weather_csv(station_id: str, year: int) -> str:
+    """
+    A deterministic daily CSV for a whole station-year, in the bulk-download layout.
+    """
+    rng = random.Random(f"{station_id}-{year}")
+    lines = [WEATHER_HEADER]
+    day = date(year, 1, 1)
+    while day.year == year:
+        tmax = round(rng.uniform(-20, 15), 1)
+        tmin = round(tmax - rng.uniform(0, 12), 1)
+        snow = round(max(0.0, rng.gauss(2, 5)), 1)
+        lines.append(
+            f'"-117.00","50.00","STATION {station_id}","{station_id}",'
+            f'"{day.isoformat()}","{year}","{day.month:02d}","{day.day:02d}","",'
+            f'"{tmax}","","{tmin}","","{round((tmax + tmin) / 2, 1)}","",'
+            f'"{round(max(0, 18 - (tmax + tmin) / 2), 1)}","","0.0","","0.0","",'
+            f'"{snow}","","{snow}","","{rng.randint(0, 300)}","","","","",""'
+        )
+        day += timedelta(days=1)
+    return "\n".join(lines) + "\n"
+
+
+def weather_app(
+    latency: float = 0.05, capacity: int = 16, error_rate: float = 0.0, retry_after: int = 1
+) -> web.Application:
+    """
+    Builds the weather stand-in. Request counts are kept in `app["stats"]`.
+    """
+    app = web.Application()
+    app["stats"] = {"requests": 0, "throttled": 0, "errors": 0, "max_in_flight": 0}
+    in_flight = 0
+
+    async def bulk_data(request: web.Request) -> web.Response:
+        nonlocal in_flight
+        stats = request.app["stats"]
+        stats["requests"] += 1
+        if in_flight >= capacity:
+            stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(retry_after)})
+        in_flight += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], in_flight)
+        try:
+            await asyncio.sleep(latency)
+            if random.random() < error_rate:
+                stats["errors"] += 1
+                return web.Response(status=503)
+            body = weather_csv(request.query["stationID"], int(request.query["Year"]))
+            return web.Response(text=body, content_type="text/csv")
+        finally:
+            in_flight -= 1
+
+    app.router.add_get("/climate_data/bulk_data_e.html", bulk_data)
+    return app
+
+
+# The `location_coords_type` values of the incidents API, and their share of incidents.
+COORDINATE_TYPES = {
+    "Lat/lng": 0.5,
+    "Lat/Long Decimal Degrees": 0.2,
+    "LatLon": 0.15,
+    "UTM": 0.15,
+}
+UTM_TYPES = ["UTM 11U NAD83", "UTM 11U NAD27", "UTM 11U WGS84", "UTM 11U NAD83 (assumed)"]
+
+
+def incident_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    `n` deterministic incidents in the Rockies and Columbias between 1990 and 2024, as
+    `id`, `ob_date`, `location_coords_type` and the two values of `location_coords` in
+    the order that type gives them. Incidents are spread over n / 5 sites, as the
+    same slide paths recur in the real data.
+    """
+    rng = np.random.default_rng(seed)
+    sites = max(1, n // 5)
+    site_lat = rng.uniform(49.2, 51.8, sites).round(5)
+    site_lon = rng.uniform(-119.5, -114.5, sites).round(5)
+    site_type = rng.choice(list(COORDINATE_TYPES), sites, p=list(COORDINATE_TYPES.values()))
+    site_utm = rng.choice(UTM_TYPES, sites)
+    site = rng.integers(0, sites, n)
+
+    kind = site_type[site]
+    first, second = site_lat[site], site_lon[site]
+    lat_lon = kind == "LatLon"
+    first, second = np.where(lat_lon, second, first), np.where(lat_lon, first, second)
+    utm = kind == "UTM"
+    # Zone 11 eastings and northings spanning roughly the same area.
+    first = np.where(utm, ((second + 117) * 71_000 + 500_000).round(), first)
+    second = np.where(utm, (site_lat[site] * 111_000).round(), second)
+    kind = np.where(utm, site_utm[site], kind)
+
+    dates = pd.Timestamp("1990-01-01") + pd.to_timedelta(rng.integers(0, 35 * 365, n), unit="D")
+    return pd.DataFrame(
+        {
+            "id": [f"{i:08x}-0000-4000-8000-{i:012x}" for i in range(n)],
+            "ob_date": dates.strftime("%Y-%m-%d"),
+            "location_coords_type": kind,
+            "coord_0": first,
+            "coord_1": second,
+        }
+    )
+
+
+def incidents_app(
+    incidents: pd.DataFrame, per_page: int = 50, latency: float = 0.0
+) -> web.Application:
+    """
+    Builds the incidents stand-in over an `incident_frame`. Request counts are kept in
+    `app["stats"]`.
+    """
+    app = web.Application()
+    app["stats"] = {"listings": 0, "details": 0}
+    rows = {row["id"]: row for row in incidents.to_dict("records")}
+    ids = incidents["id"].tolist()
+
+    async def listing(request: web.Request) -> web.Response:
+        request.app["stats"]["listings"] += 1
+        await asyncio.sleep(latency)
+        page = int(request.query.get("page", 1))
+        results = [{"id": inc} for inc in ids[(page - 1) * per_page : page * per_page]]
+        return web.json_response({"count": len(ids), "results": results})
+
+    async def detail(request: web.Request) -> web.Response:
+        request.app["stats"]["details"] += 1
+        await asyncio.sleep(latency)
+        row = rows.get(request.match_info["id"])
+        if row is None:
+            return web.Response(status=404)
+        record = {
+            "id": row["id"],
+            "ob_date": row["ob_date"],
+            "location_coords": [row["coord_0"], row["coord_1"]],
+            "location_coords_type": row["location_coords_type"],
+            "location_desc": f"Site near {row['coord_0']}",
+            "num_involved": 1,
+        }
+        return web.Response(text=json.dumps(record), content_type="application/json")
+
+    app.router.add_get("/public/incidents/", listing)
+    app.router.add_get("/public/incidents/{id}/", detail)
+    return app
+
+
+@asynccontextmanager
+async def serve(app: web.Application, port: int = 0) -> AsyncIterator[str]:
+    """
+    Serves `app` on localhost for the duration of the context, yielding its base URL.
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
@@ -2,6 +2,11 @@
 -- this query calculates the distance between each one and returns the 
 -- closest weather station to each event. Note: some stations changed
 -- their name over time and so have multiple entries, equidistant.
+-- `python -m transform.nearest_station -k 1 --coverage any` finds the same stations
+-- in-process, without PostGIS, adding `incident` and `rank` columns. Its defaults,
+-- `-k 3 --coverage daily`, instead write three ranked candidates with daily data.
+-- The view keeps the minimum distance per ob_date, the Python path per incident, so
+-- the two also differ on dates with more than one incident.
 
 
 -- Write output to csv directly
@@ -4,7 +4,8 @@ CREATE TABLE public.av_sites (
     location_coords character varying(100),
     location_coords_type character varying(100),
     latitude numeric(20,14),
-    longitude numeric(20,14)
+    longitude numeric(20,14),
+    province character varying(50)
 );
 
 
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from extract import downloader
+from extract.downloader import AdaptiveLimiter, DownloadStats, download, fetch
+from scripts.stand_in_servers import serve, weather_app
+
+URL = "{base}/climate_data/bulk_data_e.html?format=csv&stationID={id}&Year=2000"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Record the backoff attempts instead of sleeping for them."""
+    attempts = []
+
+    def backoff_delay(attempt: int) -> float:
+        attempts.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(downloader, "backoff_delay", backoff_delay)
+    return attempts
+
+
+async def fetch_all(app, ids, limiter: AdaptiveLimiter, max_retries: int = 3):
+    stats = DownloadStats()
+    async with serve(app) as base, aiohttp.ClientSession() as session:
+        bodies = await asyncio.gather(
+            *(
+                fetch(URL.format(base=base, id=i), session, limiter, stats, max_retries)
+                for i in ids
+            )
+        )
+    return bodies, stats
+
+
+def test_429_waits_for_retry_after():
+    app = weather_app(latency=0.2, capacity=1, retry_after=1)
+    limiter = AdaptiveLimiter(initial=2)
+    start = time.perf_counter()
+    bodies, stats = asyncio.run(fetch_all(app, ["1", "2"], limiter))
+    elapsed = time.perf_counter() - start
+
+    assert all(body is not None for body in bodies)
+    assert stats.throttled == app["stats"]["throttled"] == 1
+    assert stats.retries == 1
+    # The throttled request is retried only after the server's Retry-After.
+    assert elapsed >= 1.0
+
+
+def test_5xx_is_retried_with_backoff_then_given_up(no_backoff):
+    app = weather_app(latency=0.0, error_rate=1.0)
+    bodies, stats = asyncio.run(fetch_all(app, ["1"], AdaptiveLimiter(), max_retries=3))
+
+    assert bodies == [None]
+    assert app["stats"]["requests"] == 4
+    assert stats.retries == 3
+    assert no_backoff == [0, 1, 2]
+
+
+def test_backoff_delay_is_capped_exponential():
+    for attempt in range(12):
+        bound = min(downloader.BACKOFF_CAP, downloader.BACKOFF_BASE * 2**attempt)
+        assert all(0 <= downloader.backoff_delay(attempt) <= bound for _ in range(100))
+
+
+def test_parse_retry_after():
+    assert downloader.parse_retry_after("3") == 3.0
+    assert downloader.parse_retry_after(None) is None
+    assert downloader.parse_retry_after("soon") is None
+    assert downloader.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_window_grows_limit_by_about_one():
+    async def run() -> float:
+        limiter = AdaptiveLimiter(initial=4)
+        for _ in range(4):
+            await limiter.acquire()
+        for _ in range(4):
+            await limiter.release()
+        return limiter.limit
+
+    assert 4.9 < asyncio.run(run()) < 5.0
+
+
+def test_one_decrease_per_window_of_429s():
+    async def run() -> tuple[float, float]:
+        limiter = AdaptiveLimiter(initial=8)
+        for _ in range(8):
+            await limiter.acquire()
+        for _ in range(8):
+            await limiter.release(throttled=True)
+        first = limiter.limit
+        # A request sent after the decrease that is throttled decreases it again.
+        await limiter.acquire()
+        await limiter.release(throttled=True)
+        return first, limiter.limit
+
+    assert asyncio.run(run()) == (4, 2)
+
+
+def test_download_grows_concurrency_on_success():
+    app = weather_app(latency=0.01, capacity=1_000)
+    limiter = AdaptiveLimiter(initial=2, maximum=16)
+
+    async def run() -> DownloadStats:
+        async with serve(app) as base:
+            jobs = [(URL.format(base=base, id=i), i) for i in range(200)]
+            return await download(jobs, lambda key, body: None, limiter)
+
+    stats = asyncio.run(run())
+    assert stats.downloaded == 200
+    assert stats.throttled == 0
+    assert limiter.limit > 8
+    assert app["stats"]["max_in_flight"] > 2
@@ -0,0 +1,115 @@
+import asyncio
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from aiohttp import web
+
+from extract.extract_data import (
+    append_parquet,
+    load_manifest,
+    update_canadian_avalanche_data,
+    write_incident_batches,
+)
+from scripts.stand_in_servers import incident_frame, incidents_app, serve
+
+
+def failing(app: web.Application, ids: set) -> web.Application:
+    """`app`, answering 500 to the detail requests of `ids`."""
+
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        if request.match_info.get("id") in ids:
+            return web.Response(status=500)
+        return await handler(request)
+
+    app.middlewares.append(middleware)
+    return app
+
+
+def update(incidents, down: set, work: str) -> int:
+    """Run an incremental update against the stand-in, with the details of `down`
+    failing."""
+
+    async def run() -> int:
+        async with serve(failing(incidents_app(incidents), down)) as base:
+            return await update_canadian_avalanche_data(
+                os.path.join(work, "raw.parquet"),
+                os.path.join(work, "manifest.json"),
+                incidents_url=f"{base}/public/incidents/?format=json",
+                detail_url=f"{base}/public/incidents/{{}}/?format=json",
+            )
+
+    return asyncio.run(run())
+
+
+def test_failed_details_are_retried_by_the_next_run(tmp_path):
+    incidents = incident_frame(60)
+    down = set(incidents["id"][[3, 10, 55]])
+
+    assert update(incidents, down, tmp_path) == 57
+    manifest = load_manifest(os.path.join(tmp_path, "manifest.json"))
+    assert manifest["count"] == 60
+    assert set(manifest["failed"]) == down
+    assert not down & set(manifest["ids"])
+
+    # Nothing new is listed, but the failed incidents are fetched again.
+    assert update(incidents, set(), tmp_path) == 3
+    manifest = load_manifest(os.path.join(tmp_path, "manifest.json"))
+    assert manifest["failed"] == []
+    assert sorted(manifest["ids"]) == sorted(incidents["id"])
+    ids = pq.read_table(os.path.join(tmp_path, "raw.parquet"), columns=["id"])["id"]
+    assert sorted(ids.to_pylist()) == sorted(incidents["id"])
+
+
+def write_batches(batches: list[list[dict]], path: str, schema: pa.Schema | None = None) -> int:
+    """Write each of `batches` as one row group of `path`."""
+
+    async def run() -> int:
+        records: asyncio.Queue = asyncio.Queue()
+        for batch in batches:
+            for record in batch:
+                records.put_nowait(record)
+        records.put_nowait(None)
+        return await write_incident_batches(records, path, len(batches[0]), schema)
+
+    return asyncio.run(run())
+
+
+def test_a_null_field_takes_the_type_of_a_later_batch(tmp_path):
+    path = os.path.join(tmp_path, "raw.parquet")
+    batches = [
+        [{"id": "a", "snowpack": {"depth": None}}, {"id": "b", "snowpack": {"depth": None}}],
+        [{"id": "c", "snowpack": {"depth": 1.5}, "group_size": 3}, {"id": "d"}],
+    ]
+    assert write_batches(batches, path) == 4
+    table = pq.read_table(path)
+    assert table.schema.field("snowpack.depth").type == pa.float64()
+    assert table["snowpack.depth"].to_pylist() == [None, None, 1.5, None]
+    assert table["group_size"].to_pylist() == [None, None, 3, None]
+    assert pq.ParquetFile(path).num_row_groups == 2
+
+    # An incremental part: null again where the file has numbers, numbers where it is null.
+    part = os.path.join(tmp_path, "raw.parquet.part")
+    write_batches([[{"id": "e", "snowpack": {"depth": None}, "notes": 2}]], part, table.schema)
+    append_parquet(path, part)
+    table = pq.read_table(path)
+    assert table["id"].to_pylist() == ["a", "b", "c", "d", "e"]
+    assert table.schema.field("snowpack.depth").type == pa.float64()
+    assert table["notes"].to_pylist() == [None] * 4 + [2]
+
+
+def test_fields_of_conflicting_types_become_strings(tmp_path):
+    path = os.path.join(tmp_path, "raw.parquet")
+    batches = [[{"id": "a", "depth": 1.5}], [{"id": "b", "depth": "deep"}]]
+    assert write_batches(batches, path) == 2
+    assert pq.read_table(path)["depth"].to_pylist() == ["1.5", "deep"]
+
+
+def test_a_run_that_writes_nothing_still_saves_its_manifest(tmp_path):
+    incidents = incident_frame(5)
+    assert update(incidents, set(incidents["id"]), tmp_path) == 0
+    assert not os.path.exists(os.path.join(tmp_path, "raw.parquet"))
+    manifest = load_manifest(os.path.join(tmp_path, "manifest.json"))
+    assert manifest["ids"] == []
+    assert sorted(manifest["failed"]) == sorted(incidents["id"])
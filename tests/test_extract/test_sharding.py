@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from extract.extract_data import merge_incident_shards
+from extract.sharding import (
+    MANIFEST_NAME,
+    Shard,
+    parse_shard,
+    read_manifests,
+    shard_of,
+    start_shard,
+    write_manifest,
+)
+
+KEYS = [f"incident-{i}" for i in range(200)]
+
+
+def write_shards(parts_dir: str, count: int, keys=KEYS) -> None:
+    """Write each of `count` shards of `keys` as one part and its manifest."""
+    for index in range(count):
+        shard = Shard(index, count)
+        shard_dir = start_shard(parts_dir, shard)
+        owned = sorted(k for k in keys if shard.owns(k))
+        table = pa.table({"id": owned, "n": [int(k.split("-")[1]) for k in owned]})
+        pq.write_table(table, os.path.join(shard_dir, "part-00000.parquet"))
+        write_manifest(
+            shard_dir, shard, "incidents", ["part-00000.parquet"], owned, listing_count=len(keys)
+        )
+
+
+def edit_manifest(parts_dir: str, of: Shard, **changes) -> None:
+    path = os.path.join(parts_dir, of.name, MANIFEST_NAME)
+    with open(path) as f:
+        manifest = json.load(f)
+    with open(path, "w") as f:
+        json.dump(manifest | changes, f)
+
+
+def test_assignment_is_stable_across_processes():
+    # SHA-1 based, so a fresh interpreter with another hash seed agrees.
+    script = (
+        f"from extract.sharding import shard_of;print([shard_of(k, 7) for k in {KEYS[:20]!r}])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "PYTHONHASHSEED": "123", "PYTHONPATH": os.getcwd()},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(out.stdout) == [shard_of(k, 7) for k in KEYS[:20]]
+    assert shard_of("incident-0", 4) == shard_of("incident-0", 4)
+
+
+@pytest.mark.parametrize("count", [1, 3, 4])
+def test_shards_are_disjoint_and_cover_every_key(count):
+    owners = [[i for i in range(count) if Shard(i, count).owns(k)] for k in KEYS]
+    assert all(len(o) == 1 for o in owners)
+    if count > 1:
+        assert len({o[0] for o in owners}) == count
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == Shard(2, 4)
+    assert Shard(2, 4).name == "shard-0002-of-0004"
+    for value in ("4/4", "-1/4", "a/b", "3"):
+        with pytest.raises(argparse.ArgumentTypeError, match="(?i)shard"):
+            parse_shard(value)
+
+
+def test_complete_shards_are_read_in_order(tmp_path):
+    write_shards(tmp_path, 3)
+    manifests = read_manifests(tmp_path, "incidents")
+    assert [m["shard"] for m in manifests] == [0, 1, 2]
+    assert sorted(k for m in manifests for k in m["keys"]) == sorted(KEYS)
+
+
+@pytest.mark.parametrize(
+    "break_shards, problem",
+    [
+        (lambda d: os.remove(os.path.join(d, Shard(1, 3).name, MANIFEST_NAME)), "Missing"),
+        (lambda d: write_shards(os.path.join(d, "host-b"), 3), "duplicated"),
+        (lambda d: edit_manifest(d, Shard(0, 3), rows=1), "its manifest says 1"),
+        (lambda d: edit_manifest(d, Shard(0, 3), kind="weather"), "Not incidents shards"),
+        (lambda d: edit_manifest(d, Shard(2, 3), count=4), "different runs"),
+        (
+            lambda d: os.remove(os.path.join(d, Shard(2, 3).name, "part-00000.parquet")),
+            "Parts of shard 2 are missing",
+        ),
+    ],
+)
+def test_mismatched_shards_are_refused(tmp_path, break_shards, problem):
+    write_shards(tmp_path, 3)
+    break_shards(tmp_path)
+    with pytest.raises(ValueError, match=problem):
+        read_manifests(tmp_path, "incidents")
+
+
+@pytest.mark.parametrize(
+    "written, expected, problem",
+    [
+        (4, 2, "a run with 4 shards, not 2"),
+        (2, 3, "Missing shards \\[2\\] of 3"),
+    ],
+)
+def test_shards_of_another_count_are_refused(tmp_path, written, expected, problem):
+    write_shards(tmp_path, written)
+    with pytest.raises(ValueError, match=problem):
+        read_manifests(tmp_path, "incidents", expected)
+
+
+def test_a_shard_index_out_of_range_is_refused(tmp_path):
+    write_shards(tmp_path, 3)
+    edit_manifest(tmp_path, Shard(2, 3), shard=5)
+    with pytest.raises(ValueError, match="Shards \\[5\\] are out of range for 3 shards"):
+        read_manifests(tmp_path, "incidents")
+
+
+def test_keys_in_the_wrong_or_two_shards_are_refused(tmp_path):
+    write_shards(tmp_path, 3)
+    other = next(k for k in KEYS if not Shard(0, 3).owns(k))
+    manifest = read_manifests(tmp_path, "incidents")[0]
+    edit_manifest(tmp_path, Shard(0, 3), keys=manifest["keys"] + [other])
+    with pytest.raises(ValueError) as e:
+        read_manifests(tmp_path, "incidents")
+    assert "keys of other shards" in str(e.value)
+    assert "in more than one shard" in str(e.value)
+
+
+def test_merge_does_not_depend_on_the_shard_count(tmp_path):
+    merged = []
+    for count in (1, 3, 4):
+        parts_dir = os.path.join(tmp_path, f"parts-{count}")
+        output = os.path.join(tmp_path, f"merged-{count}.parquet")
+        manifest = os.path.join(tmp_path, f"manifest-{count}.json")
+        write_shards(parts_dir, count)
+        assert merge_incident_shards(parts_dir, output, manifest) == len(KEYS)
+        with open(output, "rb") as f:
+            merged.append(f.read())
+    assert merged[0] == merged[1] == merged[2]
+    assert pq.read_table(output)["id"].to_pylist() == sorted(KEYS)
+
+
+def test_merge_refuses_an_expected_shard_count_not_met(tmp_path):
+    write_shards(tmp_path, 3)
+    with pytest.raises(ValueError, match="Missing shards \\[3\\] of 4"):
+        merge_incident_shards(
+            tmp_path, os.path.join(tmp_path, "out.parquet"), os.path.join(tmp_path, "m.json"), 4
+        )
+    assert not os.path.exists(os.path.join(tmp_path, "out.parquet"))
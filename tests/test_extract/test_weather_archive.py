@@ -0,0 +1,38 @@
+import os
+
+from extract.weather_archive import import_csv_dir, read_archive, read_csv_dir
+from scripts.stand_in_servers import WEATHER_HEADER, weather_csv
+
+
+def write_day(csv_dir: str, name: str, station_id: str, day: int) -> None:
+    """Write the `day`-th day of 2001 of `station_id` as a legacy per-day CSV."""
+    line = weather_csv(station_id, 2001).splitlines()[day]
+    with open(os.path.join(csv_dir, name), "w") as f:
+        f.write(f"{WEATHER_HEADER}\n{line}\n")
+
+
+def test_legacy_csvs_are_imported_once_per_station_day(tmp_path):
+    csv_dir = os.path.join(tmp_path, "daily_weather_avs")
+    os.makedirs(csv_dir)
+    write_day(csv_dir, "2001-01-01_MOUNT_FIDELITY_7.csv", "7", 1)
+    write_day(csv_dir, "2001-01-02_MOUNT_FIDELITY_7.csv", "7", 2)
+    write_day(csv_dir, "2001_1_2_MOUNT_FIDELITY_7.csv", "7", 2)
+    write_day(csv_dir, "2001-01-01_GLACIER_42.csv", "42", 1)
+    with open(os.path.join(csv_dir, "notes.txt"), "w") as f:
+        f.write("not weather")
+
+    assert read_csv_dir(csv_dir, workers=2).num_rows == 4
+    root = os.path.join(tmp_path, "archive")
+    assert import_csv_dir(root, csv_dir) == 3
+    assert import_csv_dir(root, csv_dir) == 0
+
+    df = read_archive(root).to_pandas().sort_values(["station_id", "date"])
+    assert df["station_id"].tolist() == ["42", "7", "7"]
+    assert [d.isoformat() for d in df["date"]] == ["2001-01-01", "2001-01-01", "2001-01-02"]
+    tmax = float(weather_csv("7", 2001).splitlines()[2].split('","')[9])
+    assert df["Max Temp (°C)"].iloc[2] == tmax
+
+
+def test_an_empty_directory_imports_nothing(tmp_path):
+    assert read_csv_dir(tmp_path).num_rows == 0
+    assert import_csv_dir(os.path.join(tmp_path, "archive"), tmp_path) == 0
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from scripts.check_import_time import BUDGETS_MS, CLIS, check_cli, check_module
+
+# Multiplies the budgets, e.g. for a slower CI runner.
+SCALE = float(os.environ.get("IMPORT_TIME_SCALE", "1"))
+
+
+@pytest.mark.parametrize("module", BUDGETS_MS)
+def test_module_imports_within_its_budget(module):
+    _, failures = check_module(module, repeat=3, scale=SCALE)
+    assert not failures
+
+
+@pytest.mark.parametrize("module", CLIS)
+def test_cli_help_defers_heavy_imports(module):
+    assert not check_cli(module)
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from transform.canada_index import (
+    CANADA_INDEX_CACHE,
+    classify_points,
+    load_canada_index,
+    save_canada_index,
+)
+from transform.transform_ava_coords import normalise_coordinates
+
+# Two stand-in provinces sharing the border at 120°W.
+PROVINCES = {
+    "B.C.": shapely.box(-125.0, 48.0, -120.0, 55.0),
+    "Alta.": shapely.box(-120.0, 48.0, -110.0, 55.0),
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    """Forget the indexes loaded, which are cached by path, around each test."""
+    load_canada_index.cache_clear()
+    yield
+    load_canada_index.cache_clear()
+
+
+def write_index(cache_path: str) -> None:
+    save_canada_index(
+        np.array(list(PROVINCES.values())), np.array(list(PROVINCES)), cache_path, 0.0
+    )
+
+
+def test_points_are_classified_by_province(tmp_path):
+    cache_path = os.path.join(tmp_path, "canada_index.npz")
+    write_index(cache_path)
+    in_canada, province = classify_points(
+        [50.0, 51.0, 50.0, 60.0, np.nan],
+        [-122.0, -115.0, -120.0, -115.0, -115.0],
+        shapefile=os.path.join(tmp_path, "absent.shp"),
+        cache_path=cache_path,
+    )
+    assert in_canada.tolist() == [True, True, True, False, False]
+    assert province[:2].tolist() == ["B.C.", "Alta."]
+    # A point on a shared border takes one of its provinces.
+    assert province[2] in PROVINCES
+    assert province[3:].tolist() == [None, None]
+
+
+def test_normalise_coordinates_keeps_the_incidents_in_canada(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_index(CANADA_INDEX_CACHE)
+    raw = pd.DataFrame(
+        {
+            "ob_date": ["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-04"],
+            "location_coords": ["[50.0, -122.0]", "[-115.0, 51.0]", "[35.0, -110.0]", "nan"],
+            "location_coords_type": ["Lat/lng", "LatLon", "Lat/lng", "Lat/lng"],
+        }
+    )
+    df = normalise_coordinates(raw)
+    assert df["ob_date"].tolist() == ["2020-01-01", "2020-01-02"]
+    assert df["province"].tolist() == ["B.C.", "Alta."]
+    assert df["latitude"].tolist() == [50.0, 51.0]
+    assert df["longitude"].tolist() == [-122.0, -115.0]
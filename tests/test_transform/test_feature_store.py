@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from transform.feature_store import (
+    FEATURE_COLUMNS,
+    ROLLING,
+    SOURCE_COLUMNS,
+    WINDOWS,
+    build_features,
+    load_feature_store,
+    write_feature_store,
+)
+
+
+def synthetic_daily() -> pd.DataFrame:
+    """Two stations' archived days, with missing days and missing readings."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for station_id, start, days in (("2", "2001-01-01", 40), ("10", "2001-01-20", 25)):
+        dates = pd.date_range(start, periods=days)
+        frame = pd.DataFrame({"station_id": station_id, "date": dates})
+        for column in SOURCE_COLUMNS:
+            values = rng.normal(0, 10, days).round(1)
+            values[rng.random(days) < 0.2] = np.nan
+            frame[column] = values
+        frames.append(frame.drop(index=[5, 6, 7, 12]))
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0)
+
+
+def reference(daily: pd.DataFrame) -> pd.DataFrame:
+    """The features computed a station at a time with pandas' rolling windows."""
+    frames = []
+    for station_id, rows in daily.groupby("station_id"):
+        rows = rows.set_index("date").sort_index()
+        rows = rows.reindex(pd.date_range(rows.index[0], rows.index[-1]))
+        frame = pd.DataFrame({"station_id": station_id, "date": rows.index})
+        for w in WINDOWS:
+            for column, how in ROLLING:
+                values = getattr(rows[column].rolling(w, min_periods=1), how)()
+                values.iloc[: w - 1] = np.nan
+                frame[f"{column} {w}d {how}"] = values.to_numpy()
+            frame[f"Temp Swing (°C) {w}d"] = (
+                frame[f"Max Temp (°C) {w}d max"] - frame[f"Min Temp (°C) {w}d min"]
+            )
+            depth = rows["Snow on Grnd (cm)"]
+            frame[f"Snow on Grnd (cm) {w}d change"] = (depth - depth.shift(w - 1)).to_numpy()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_windows_match_pandas_rolling():
+    daily = synthetic_daily()
+    features = build_features(daily)
+    expected = reference(daily)
+    assert list(features.columns) == ["station_id", "date"] + FEATURE_COLUMNS
+    assert features["station_id"].tolist() == expected["station_id"].tolist()
+    assert (pd.to_datetime(features["date"]) == expected["date"]).all()
+    pd.testing.assert_frame_equal(
+        features[FEATURE_COLUMNS], expected[FEATURE_COLUMNS], check_dtype=False
+    )
+
+
+def test_lookup_finds_each_day_in_the_given_order(tmp_path):
+    daily = synthetic_daily()
+    path = os.path.join(tmp_path, "features.parquet")
+    write_feature_store(build_features(daily), path)
+    store = load_feature_store(path)
+    expected = reference(daily).set_index(["station_id", "date"])
+
+    station_ids = ["10", "2", "2", "2", "10", "99"]
+    dates = ["2001-02-10", "2001-01-07", "2001-01-01", "2000-12-31", "2001-03-20", "2001-01-07"]
+    result = store.lookup(station_ids, dates)
+    assert list(result.columns) == FEATURE_COLUMNS
+    for i in range(3):
+        np.testing.assert_allclose(
+            result.iloc[i].to_numpy(float),
+            expected.loc[(station_ids[i], pd.Timestamp(dates[i]))].to_numpy(float),
+        )
+    # Before or after a station's days, or an unknown station.
+    assert result.iloc[3:].isna().all().all()
+
+    columns = ["Total Snow (cm) 7d sum"]
+    assert store.lookup(["2"], ["2001-01-10"], columns).columns.tolist() == columns
+
+
+def test_an_empty_archive_builds_no_features():
+    features = build_features(pd.DataFrame(columns=["station_id", "date"] + SOURCE_COLUMNS))
+    assert features.empty
+    assert list(features.columns) == ["station_id", "date"] + FEATURE_COLUMNS
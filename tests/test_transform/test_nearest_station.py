@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from transform.nearest_station import VIEW_COLUMNS, nearest_stations
+
+# Due north of the incidents at (50, -117), nearest first. "A OLD" is "A" under its
+# former name, so the two are tied. "C" only has daily data from 2005.
+STATIONS = pd.DataFrame(
+    {
+        "station_name": ["A", "A OLD", "B", "C", "HOURLY"],
+        "station_id": ["1", "2", "3", "4", "5"],
+        "latitude_dd": [50.1, 50.1, 50.2, 50.3, 50.05],
+        "longitude_dd": [-117.0] * 5,
+        "dly_first_year": [1990, 1990, 1990, 2005, np.nan],
+        "dly_last_year": [2010, 2010, 2010, 2010, np.nan],
+        "first_year": [1990] * 5,
+        "last_year": [2010] * 5,
+    }
+)
+INCIDENTS = pd.DataFrame(
+    {
+        "ob_date": ["2000-02-01", "2007-03-01"],
+        "latitude": [50.0, 50.0],
+        "longitude": [-117.0, -117.0],
+    },
+    index=[10, 11],
+)
+
+
+def stations_of(result: pd.DataFrame, incident: int) -> dict[str, int]:
+    rows = result[result["incident"] == incident]
+    return dict(zip(rows["station_name"], rows["rank"]))
+
+
+def test_tied_stations_are_all_kept_with_one_rank():
+    result = nearest_stations(INCIDENTS.iloc[:1], STATIONS, k=1)
+    assert list(result.columns) == VIEW_COLUMNS + ["incident", "rank"]
+    assert stations_of(result, 10) == {"A": 1, "A OLD": 1}
+    np.testing.assert_allclose(result["distance(km)"], 11.119, atol=1e-3)
+
+
+def test_k_counts_stations_and_keeps_ties_with_the_kth():
+    result = nearest_stations(INCIDENTS, STATIONS, k=3)
+    assert stations_of(result, 10) == {"A": 1, "A OLD": 1, "B": 2}
+    assert stations_of(nearest_stations(INCIDENTS, STATIONS, k=2), 10) == {"A": 1, "A OLD": 1}
+    # Farthest first, as the view orders them.
+    assert result["distance(km)"].is_monotonic_decreasing
+
+
+def test_only_stations_reporting_in_the_incident_year_are_used():
+    result = nearest_stations(INCIDENTS, STATIONS, k=4)
+    assert "C" not in stations_of(result, 10)
+    assert stations_of(result, 11) == {"A": 1, "A OLD": 1, "B": 2, "C": 3}
+
+
+def test_coverage_any_uses_stations_without_daily_data():
+    assert stations_of(nearest_stations(INCIDENTS, STATIONS, k=1), 10) == {"A": 1, "A OLD": 1}
+    any_result = nearest_stations(INCIDENTS, STATIONS, k=1, coverage="any")
+    assert stations_of(any_result, 10) == {"HOURLY": 1}
+    assert any_result.loc[any_result["incident"] == 10, "station_id"].tolist() == ["5"]
+
+
+def test_incidents_without_coordinates_or_stations_are_left_out():
+    incidents = pd.DataFrame(
+        {
+            "ob_date": ["2000-02-01", "1950-01-01"],
+            "latitude": [np.nan, 50.0],
+            "longitude": [-117.0, -117.0],
+        }
+    )
+    result = nearest_stations(incidents, STATIONS)
+    assert result.empty
+    assert list(result.columns) == VIEW_COLUMNS + ["incident", "rank"]
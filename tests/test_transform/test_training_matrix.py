@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transform.training_matrix import (
+    TrainingMatrixWriter,
+    load_training_matrix,
+    matrix_paths,
+    write_training_matrix,
+)
+
+
+def labelled(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(rows, 3)), columns=["Max Temp (°C)", "b", "c"])
+    df.loc[rng.random(rows) < 0.1, "b"] = np.nan
+    df["avalanche"] = rng.integers(0, 2, rows)
+    return df
+
+
+def test_matrix_round_trips_memory_mapped(tmp_path):
+    prefix = os.path.join(tmp_path, "load", "full_cleaned")
+    df = labelled(100)
+    write_training_matrix(df, prefix)
+
+    matrix = load_training_matrix(prefix)
+    assert isinstance(matrix.X, np.memmap) and isinstance(matrix.y, np.memmap)
+    assert not matrix.X.flags.writeable
+    assert matrix.columns == ["Max Temp (°C)", "b", "c"]
+    assert matrix.X.dtype == np.float64 and matrix.y.dtype == np.int8
+    pd.testing.assert_frame_equal(matrix.frame(), df, check_dtype=False)
+
+    in_memory = load_training_matrix(prefix, mmap=False)
+    assert not isinstance(in_memory.X, np.memmap)
+    np.testing.assert_array_equal(in_memory.X, matrix.X)
+
+
+def test_chunks_write_the_same_matrix_as_one_go(tmp_path):
+    df = labelled(100)
+    write_training_matrix(df, os.path.join(tmp_path, "whole"))
+    # Columns are written in the writer's order, whatever the chunk's.
+    with TrainingMatrixWriter(os.path.join(tmp_path, "chunks"), list(df.columns)) as writer:
+        for start in range(0, len(df), 7):
+            writer.append(df.iloc[start : start + 7][df.columns[::-1]])
+    for whole, chunks in zip(
+        matrix_paths(os.path.join(tmp_path, "whole")),
+        matrix_paths(os.path.join(tmp_path, "chunks")),
+    ):
+        with open(whole, "rb") as a, open(chunks, "rb") as b:
+            assert a.read() == b.read()
+
+
+def test_an_empty_matrix_round_trips(tmp_path):
+    prefix = os.path.join(tmp_path, "empty")
+    with TrainingMatrixWriter(prefix, ["a", "avalanche"]):
+        pass
+    matrix = load_training_matrix(prefix)
+    assert matrix.X.shape == (0, 1) and matrix.y.shape == (0,)
+
+
+def test_a_failed_write_leaves_the_previous_matrix(tmp_path):
+    prefix = os.path.join(tmp_path, "full_cleaned")
+    write_training_matrix(labelled(10), prefix)
+    with pytest.raises(RuntimeError):
+        with TrainingMatrixWriter(prefix, list(labelled(1).columns)) as writer:
+            writer.append(labelled(50))
+            raise RuntimeError("interrupted")
+    assert load_training_matrix(prefix).X.shape == (10, 3)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(p) for p in matrix_paths(prefix)
+    )
+
+
+def test_a_matrix_not_matching_its_schema_is_refused(tmp_path):
+    prefix = os.path.join(tmp_path, "full_cleaned")
+    write_training_matrix(labelled(10), prefix)
+    schema_path = matrix_paths(prefix)[2]
+    with open(schema_path) as f:
+        schema = json.load(f)
+    with open(schema_path, "w") as f:
+        json.dump(schema | {"rows": 11}, f)
+    with pytest.raises(ValueError, match="schema describes 11 rows"):
+        load_training_matrix(prefix)
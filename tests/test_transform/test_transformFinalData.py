@@ -0,0 +1,80 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transform import transformFinalData
+from transform.training_matrix import matrix_paths
+
+MEASURES = ["Max Temp (°C)", "Min Temp (°C)", "Total Snow (cm)", "Snow on Grnd (cm)"]
+FEATURES = ["Total Snow (cm) 3d sum", "Temp Swing (°C) 7d"]
+
+
+def write_weather(path: str, rows: int, features: bool, seed: int) -> None:
+    """A per-date weather CSV as transformWeather writes it, with some days missing
+    their Max Temp."""
+    rng = np.random.default_rng(seed)
+    columns = MEASURES + (FEATURES if features else [])
+    df = pd.DataFrame(rng.normal(0, 10, (rows, len(columns))).round(2), columns=columns)
+    df.loc[rng.random(rows) < 0.1, "Max Temp (°C)"] = np.nan
+    df.insert(0, "ob_date", pd.date_range("2001-01-01", periods=rows).strftime("%Y-%m-%d"))
+    df.to_csv(path, index=False)
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    paths = {
+        "av_path": os.path.join(tmp_path, "avs_weather.csv"),
+        "dull_path": os.path.join(tmp_path, "dull_weather.csv"),
+        "full_path": os.path.join(tmp_path, "load", "full_cleaned.csv"),
+        "balanced_path": os.path.join(tmp_path, "load", "balanced_cleaned.csv"),
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(transformFinalData, name, path)
+    os.makedirs(os.path.join(tmp_path, "load"))
+    write_weather(paths["av_path"], 40, features=True, seed=1)
+    write_weather(paths["dull_path"], 600, features=False, seed=2)
+    return paths
+
+
+def outputs(paths: dict) -> dict[str, bytes]:
+    files = []
+    for csv_path in (paths["full_path"], paths["balanced_path"]):
+        files += [csv_path, *matrix_paths(transformFinalData.matrix_prefix(csv_path))]
+    contents = {}
+    for path in files:
+        with open(path, "rb") as f:
+            contents[os.path.basename(path)] = f.read()
+        os.remove(path)
+    return contents
+
+
+def test_streaming_output_is_identical_to_in_memory(paths):
+    transformFinalData.in_memory(seed=3)
+    expected = outputs(paths)
+    # A budget of a few kB streams both inputs in many chunks.
+    transformFinalData.streaming(seed=3, memory_budget=20_000)
+    assert outputs(paths) == expected
+
+    full = pd.read_csv(io.BytesIO(expected["full_cleaned.csv"]))
+    balanced = pd.read_csv(io.BytesIO(expected["balanced_cleaned.csv"]))
+    assert list(full.columns) == MEASURES + FEATURES + ["avalanche"]
+    assert full["Max Temp (°C)"].notna().all()
+    n_av = (full["avalanche"] == 1).sum()
+    assert (balanced["avalanche"] == 0).sum() == n_av == (balanced["avalanche"] == 1).sum()
+    # The dull rows' features were never written, so they are missing.
+    assert full.loc[full["avalanche"] == 0, FEATURES].isna().all().all()
+
+
+def test_another_seed_samples_other_dull_rows(paths):
+    transformFinalData.in_memory(seed=3)
+    first = outputs(paths)["balanced_cleaned.csv"]
+    transformFinalData.streaming(seed=4, memory_budget=20_000)
+    assert outputs(paths)["balanced_cleaned.csv"] != first
+
+
+def test_a_budget_too_small_for_the_balanced_sample_is_refused(paths):
+    with pytest.raises(ValueError, match="cannot hold the balanced sample"):
+        transformFinalData.streaming(memory_budget=2_000)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+from transform.transform_ava_coords import parse_coordinates, utm_zones
+
+
+def parse(rows: list[tuple]) -> tuple[np.ndarray, np.ndarray]:
+    coords, types = zip(*rows)
+    return parse_coordinates(pd.Series(coords), pd.Series(types))
+
+
+def test_every_format_is_parsed_north_and_west():
+    easting, northing = Transformer.from_crs(4326, 26911, always_xy=True).transform(-117.2, 51.3)
+    latitude, longitude = parse(
+        [
+            ("[49.1, -117.2]", "Lat/lng"),
+            ("[49.1, 117.2]", "Lat/Long Decimal Degrees"),
+            ("[-117.2, 49.1]", "LatLon"),
+            (f"[{easting}, {northing}]", "UTM 11U NAD83"),
+            (f"[{easting}, {northing}]", "UTM 11U NAD83 (assumed)"),
+        ]
+    )
+    np.testing.assert_allclose(latitude, [49.1, 49.1, 49.1, 51.3, 51.3], atol=1e-6)
+    np.testing.assert_allclose(longitude, [-117.2] * 5, atol=1e-6)
+
+
+def test_a_latitude_over_90_is_swapped_with_the_longitude():
+    latitude, longitude = parse([("[-117.2, 49.1]", "Lat/lng"), ("[49.1, -117.2]", "LatLon")])
+    np.testing.assert_allclose(latitude, [49.1, 49.1])
+    np.testing.assert_allclose(longitude, [-117.2, -117.2])
+
+
+def test_unparseable_coordinates_and_types_are_nan():
+    latitude, longitude = parse(
+        [
+            ("[49.1, -117.2]", "Unknown"),
+            ("nan", "Lat/lng"),
+            ("[500000, 5540000]", "UTM 11U Unknown"),
+            ("[49.1, -117.2]", None),
+        ]
+    )
+    assert np.isnan(latitude).all() and np.isnan(longitude).all()
+    # Each value is parsed on its own; normalise_coordinates drops the partial rows.
+    latitude, longitude = parse([("[abc, -117.2]", "Lat/lng")])
+    assert np.isnan(latitude[0]) and longitude[0] == -117.2
+
+
+def test_repeated_pairs_are_broadcast_back_in_order():
+    rows = [("[49.1, -117.2]", "Lat/lng"), ("[-118.0, 50.0]", "LatLon")] * 3
+    latitude, longitude = parse(rows)
+    np.testing.assert_allclose(latitude, [49.1, 50.0] * 3)
+    np.testing.assert_allclose(longitude, [-117.2, -118.0] * 3)
+
+
+def test_utm_zones():
+    zone, datum = utm_zones(pd.Series(["UTM 11U NAD83 (assumed)", "UTM 9 NAD27", "Lat/lng"]))
+    assert list(zone[:2]) == ["11", "9"] and list(datum[:2]) == ["NAD83", "NAD27"]
+    assert pd.isna(zone[2]) and pd.isna(datum[2])
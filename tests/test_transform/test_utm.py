@@ -0,0 +1,39 @@
+import numpy as np
+from pyproj import Transformer
+
+from transform.utm import get_transformer, utm_to_latlon
+
+# (latitude, longitude, EPSG code of the zone and datum, zone, datum)
+POINTS = [
+    (51.3, -117.2, 26911, "11", "NAD83"),
+    (50.1, -122.9, 26910, "10", "NAD83"),
+    (49.5, -116.8, 26711, "11", "NAD27"),
+]
+
+
+def test_points_of_several_zones_and_datums_are_converted():
+    eastings, northings = [], []
+    for latitude, longitude, epsg, _, _ in POINTS:
+        e, n = Transformer.from_crs(4326, epsg, always_xy=True).transform(longitude, latitude)
+        eastings.append(e)
+        northings.append(n)
+    zones = [p[3] for p in POINTS]
+    datums = [p[4] for p in POINTS]
+
+    get_transformer.cache_clear()
+    lats, longs = utm_to_latlon(zones * 2, datums * 2, eastings * 2, northings * 2)
+    # NAD27 is shifted with a grid by EPSG but not by proj's datum, about 10 m apart.
+    np.testing.assert_allclose(lats, [p[0] for p in POINTS] * 2, atol=2e-4)
+    np.testing.assert_allclose(longs, [p[1] for p in POINTS] * 2, atol=2e-4)
+    # One transformer per (zone, datum), however many rows share it.
+    assert get_transformer.cache_info().currsize == 3
+
+
+def test_unknown_or_unusable_zones_are_nan():
+    lats, longs = utm_to_latlon(
+        ["11", "11", "99", None, "11"],
+        ["Unknown", "NOTADATUM", "NAD83", "NAD83", "NAD83"],
+        ["500000", "500000", "500000", "500000", "east"],
+        ["5540000", "5540000", "5540000", "5540000", "5540000"],
+    )
+    assert np.isnan(lats).all() and np.isnan(longs).all()
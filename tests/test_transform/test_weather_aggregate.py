@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+
+from extract.weather_archive import MEASURE_COLUMNS, append_station_year, read_days
+from scripts.stand_in_servers import weather_csv
+from transform.weather_aggregate import aggregate_means, load_state, refresh_aggregates
+
+
+def archive(root: str, station_id: str, year: int) -> None:
+    append_station_year(root, station_id, year, weather_csv(station_id, year).encode())
+
+
+def write_days(path: str, days: list[tuple[str, str]]) -> None:
+    pd.DataFrame(days, columns=["station_id", "date"]).to_csv(path, index=False)
+
+
+def recompute(root: str, days_path: str) -> pd.DataFrame:
+    """The per-date means of the listed days, read and averaged from scratch."""
+    days = pd.read_csv(days_path, dtype={"station_id": str})
+    rows = read_days(root, days, MEASURE_COLUMNS)
+    rows["ob_date"] = pd.to_datetime(rows["date"]).dt.strftime("%Y-%m-%d")
+    return rows.groupby("ob_date")[MEASURE_COLUMNS].mean().astype(float)
+
+
+def assert_matches_recompute(state, root: str, days_path: str) -> None:
+    pd.testing.assert_frame_equal(
+        aggregate_means(state), recompute(root, days_path), check_exact=False, rtol=1e-5
+    )
+
+
+def test_refresh_matches_a_full_recompute(tmp_path):
+    root = os.path.join(tmp_path, "archive")
+    state_dir = os.path.join(tmp_path, "state")
+    days_path = os.path.join(tmp_path, "days.csv")
+    for station_id in ("1", "2"):
+        archive(root, station_id, 2001)
+    days = [(s, f"2001-01-{d:02d}") for s in ("1", "2") for d in range(1, 11)]
+
+    write_days(days_path, days[:12])
+    state = refresh_aggregates(state_dir, root, days_path)
+    assert_matches_recompute(state, root, days_path)
+    assert len(state.folded) == 12
+
+    # Newly listed days are folded in on top.
+    write_days(days_path, days)
+    state = refresh_aggregates(state_dir, root, days_path)
+    assert_matches_recompute(state, root, days_path)
+    assert len(state.folded) == 20
+
+    # A newly archived station-year is a new part, not a changed one.
+    archive(root, "3", 2001)
+    write_days(days_path, days + [("3", "2001-01-05"), ("3", "2001-02-01")])
+    state = refresh_aggregates(state_dir, root, days_path)
+    assert_matches_recompute(state, root, days_path)
+    assert len(state.folded) == 22
+
+    # Unchanged inputs leave the state as it is.
+    generation = state.generation
+    assert refresh_aggregates(state_dir, root, days_path).generation == generation
+
+    # A day dropped from the list forces a rebuild.
+    write_days(days_path, days[1:])
+    state = refresh_aggregates(state_dir, root, days_path)
+    assert_matches_recompute(state, root, days_path)
+    assert len(state.folded) == 19
+    assert_matches_recompute(load_state(state_dir), root, days_path)
+
+
+def test_listed_days_missing_from_the_archive_are_left_pending(tmp_path):
+    root = os.path.join(tmp_path, "archive")
+    state_dir = os.path.join(tmp_path, "state")
+    days_path = os.path.join(tmp_path, "days.csv")
+    write_days(days_path, [("1", "2001-01-01")])
+    assert refresh_aggregates(state_dir, root, days_path).aggregates.empty
+
+    archive(root, "1", 2001)
+    state = refresh_aggregates(state_dir, root, days_path)
+    assert_matches_recompute(state, root, days_path)
+    assert len(state.folded) == 1
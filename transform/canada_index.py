@@ -0,0 +1,109 @@
+"""
+Offline point-in-Canada and province lookup.
+
+The provincial boundaries in `misc/canada_poly` are reprojected to WGS84 once and
+cached to disk as WKB together with the province codes. Lookups go through a shapely
+STRtree over the prepared polygons, so a whole coordinate array is classified in a
+single vectorised call with no network access.
+"""
+
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+logger = logging.getLogger(__name__)
+
+CANADA_POLY_PATH = "misc/canada_poly/lpr_000a21a_e.shp"
+CANADA_INDEX_CACHE = "data/canada_index.npz"
+
+# Column of the boundary file used as the province code, e.g. "B.C.", "Alta.".
+PROVINCE_CODE_COLUMN = "PREABBR"
+
+
+def build_canada_index(
+    shapefile: str = CANADA_POLY_PATH, cache_path: str = CANADA_INDEX_CACHE
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the provincial boundary file, reprojects it to WGS84 and writes the polygons
+    (as hex WKB) and province codes to `cache_path`.
+    Returns the geometries and codes.
+    """
+    import geopandas as gpd
+
+    logger.info(f"Building Canada index from {shapefile}.")
+    provinces = gpd.read_file(shapefile).to_crs(epsg=4326)
+    geoms = provinces.geometry.values.to_numpy()
+    codes = provinces[PROVINCE_CODE_COLUMN].to_numpy(dtype=str)
+
+    save_canada_index(geoms, codes, cache_path, os.path.getmtime(shapefile))
+    return geoms, codes
+
+
+def save_canada_index(
+    geoms: np.ndarray, codes: np.ndarray, cache_path: str, source_mtime: float
+) -> None:
+    """
+    Writes the polygons, as hex WKB, and their province codes to `cache_path`, recording
+    the modification time of the boundary file they came from.
+    """
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    np.savez(
+        cache_path,
+        wkb=shapely.to_wkb(geoms, hex=True).astype(str),
+        codes=codes,
+        source_mtime=source_mtime,
+    )
+
+
+@lru_cache(maxsize=None)
+def load_canada_index(
+    shapefile: str = CANADA_POLY_PATH, cache_path: str = CANADA_INDEX_CACHE
+) -> tuple[STRtree, np.ndarray]:
+    """
+    Loads the cached province polygons, rebuilding the cache if it is missing or older
+    than the boundary file. Returns the STRtree and the province code of each polygon.
+    """
+    cached = os.path.exists(cache_path)
+    if cached and os.path.exists(shapefile):
+        with np.load(cache_path) as npz:
+            cached = float(npz["source_mtime"]) >= os.path.getmtime(shapefile)
+
+    if cached:
+        with np.load(cache_path) as npz:
+            geoms = shapely.from_wkb(npz["wkb"])
+            codes = npz["codes"]
+    else:
+        geoms, codes = build_canada_index(shapefile, cache_path)
+
+    shapely.prepare(geoms)
+    return STRtree(geoms), codes
+
+
+def classify_points(
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    shapefile: str = CANADA_POLY_PATH,
+    cache_path: str = CANADA_INDEX_CACHE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Classifies every (latitude, longitude) pair against the provincial boundaries.
+
+    Returns a boolean in-Canada flag and the province code for each point; points
+    outside Canada, or with missing coordinates, get False and None.
+    """
+    tree, codes = load_canada_index(shapefile, cache_path)
+    points = shapely.points(np.asarray(longitude, dtype=float), np.asarray(latitude, dtype=float))
+
+    point_idx, poly_idx = tree.query(points, predicate="intersects")
+
+    in_canada = np.zeros(len(points), dtype=bool)
+    in_canada[point_idx] = True
+    province = np.full(len(points), None, dtype=object)
+    # A point on a shared border matches both provinces; keep the first match.
+    point_idx, first = np.unique(point_idx, return_index=True)
+    province[point_idx] = codes[poly_idx[first]]
+    return in_canada, province
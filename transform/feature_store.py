@@ -0,0 +1,231 @@
+"""
+Rolling-window weather features per station-day.
+
+The archived daily weather is laid out as one contiguous calendar-day array per station,
+from its first to its last archived day, with missing days as NaN. Every station is
+preceded by `max(WINDOWS) - 1` NaN rows in the working arrays, so trailing windows can
+be reduced over the whole concatenated array at once, as a few shifted whole-array
+operations, without ever reaching into the previous station. Days with less than a full
+window of station history before them get NaN for that window's features.
+
+Because each station's days are contiguous, the row of any (station_id, date) is its
+station's offset plus the number of days since the station's first day, so lookups
+need no search.
+
+Build the store from the repository root with:
+    python -m transform.feature_store
+"""
+
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from extract.weather_archive import read_archive
+from pipeline.instrumentation import span
+from pipeline.schema import to_pandas
+
+logger = logging.getLogger(__name__)
+
+WEATHER_ARCHIVE_DIR = "data/weather_archive"
+FEATURES_PATH = "data/weather_features.parquet"
+
+# Trailing windows, in days, each ending on and including the day itself.
+WINDOWS = (3, 7)
+
+# (source column, reduction) pairs computed over every window.
+ROLLING = [
+    ("Total Snow (cm)", "sum"),
+    ("Total Rain (mm)", "sum"),
+    ("Total Precip (mm)", "sum"),
+    ("Max Temp (°C)", "max"),
+    ("Min Temp (°C)", "min"),
+    ("Mean Temp (°C)", "mean"),
+]
+SOURCE_COLUMNS = [source for source, _ in ROLLING] + ["Snow on Grnd (cm)"]
+
+
+def feature_columns(windows: Iterable[int] = WINDOWS) -> list[str]:
+    columns = []
+    for w in windows:
+        columns += [f"{source} {w}d {how}" for source, how in ROLLING]
+        columns += [f"Temp Swing (°C) {w}d", f"Snow on Grnd (cm) {w}d change"]
+    return columns
+
+
+FEATURE_COLUMNS = feature_columns()
+
+
+def window_reduce(values: np.ndarray, window: int, how: str) -> np.ndarray:
+    """Reduce every trailing `window` of `values`, ignoring NaNs.
+
+    The window is folded in one shifted, whole-array pass per day it covers. The first
+    `window - 1` results have no full window and are NaN; so is any window without a
+    reading.
+    """
+    n = len(values) - window + 1
+    if how in ("max", "min"):
+        fold = np.fmax if how == "max" else np.fmin
+        reduced = values[:n].copy()
+        for k in range(1, window):
+            fold(reduced, values[k : k + n], out=reduced)
+    else:
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        reduced, count = filled[:n].copy(), present[:n].astype(np.int8)
+        for k in range(1, window):
+            reduced += filled[k : k + n]
+            count += present[k : k + n]
+        if how == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                reduced /= count
+        reduced[count == 0] = np.nan
+    return np.concatenate([np.full(window - 1, np.nan), reduced])
+
+
+def build_features(daily: pd.DataFrame, windows: Iterable[int] = WINDOWS) -> pd.DataFrame:
+    """Rolling-window features for every calendar day of every station in `daily`.
+
+    params: daily: pd.DataFrame of `station_id`, `date` and the SOURCE_COLUMNS, one row
+        per archived station-day.
+    returns: pd.DataFrame of `station_id`, `date` and the feature columns, sorted by
+        station and date with no missing days between a station's first and last.
+    """
+    windows = tuple(windows)
+    if daily.empty:
+        return pd.DataFrame(columns=["station_id", "date"] + feature_columns(windows))
+    pad = max(windows) - 1
+    daily = daily.assign(date=pd.to_datetime(daily["date"])).sort_values(["station_id", "date"])
+    codes, stations = pd.factorize(daily["station_id"].astype(str), sort=True)
+    dates = daily["date"].to_numpy("datetime64[D]")
+
+    first = np.full(len(stations), np.datetime64("NaT", "D"))
+    last = first.copy()
+    # Rows are sorted, so each station's first and last rows hold its date range.
+    boundaries = np.flatnonzero(np.diff(codes, prepend=-1))
+    first[codes[boundaries]] = dates[boundaries]
+    ends = np.append(boundaries[1:], len(codes)) - 1
+    last[codes[ends]] = dates[ends]
+    lengths = (last - first).astype(int) + 1
+
+    # Offsets of each station in the output, and in the padded working arrays.
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    padded_offsets = offsets + pad * (np.arange(len(stations)) + 1)
+    day = (dates - first[codes]).astype(int)
+    total = int(lengths.sum())
+    # Position of each output row within its station, and in the padded arrays.
+    within = np.arange(total) - np.repeat(offsets, lengths)
+    rows = np.repeat(padded_offsets, lengths) + within
+
+    size = total + pad * len(stations)
+    source = {}
+    for column in SOURCE_COLUMNS:
+        values = np.full(size, np.nan)
+        values[padded_offsets[codes] + day] = daily[column].to_numpy(float, na_value=np.nan)
+        source[column] = values
+
+    features = {
+        "station_id": np.repeat(stations.to_numpy(), lengths),
+        "date": np.repeat(first, lengths) + within,
+    }
+    for w in windows:
+        # Days without a full window of station history get no features.
+        partial = within < w - 1
+        for column, how in ROLLING:
+            values = window_reduce(source[column], w, how)[rows]
+            values[partial] = np.nan
+            features[f"{column} {w}d {how}"] = values
+        features[f"Temp Swing (°C) {w}d"] = (
+            features[f"Max Temp (°C) {w}d max"] - features[f"Min Temp (°C) {w}d min"]
+        )
+        depth = source["Snow on Grnd (cm)"]
+        features[f"Snow on Grnd (cm) {w}d change"] = depth[rows] - depth[rows - (w - 1)]
+    return pd.DataFrame(features)
+
+
+@dataclass
+class FeatureStore:
+    """Features for contiguous station-days, with the row of each station's first day.
+
+    `stations` is indexed by `station_id` with the `start` date, the `offset` of its
+    first row in `features` and its `length` in days.
+    """
+
+    features: pd.DataFrame
+    stations: pd.DataFrame
+
+    @classmethod
+    def from_features(cls, features: pd.DataFrame) -> "FeatureStore":
+        features = features.reset_index(drop=True)
+        station_ids = features["station_id"].to_numpy()
+        offsets = np.flatnonzero(np.r_[True, station_ids[1:] != station_ids[:-1]])
+        stations = pd.DataFrame(
+            {
+                "start": pd.to_datetime(features["date"].to_numpy()[offsets]),
+                "offset": offsets,
+                "length": np.diff(np.append(offsets, len(features))),
+            },
+            index=pd.Index(station_ids[offsets], name="station_id"),
+        )
+        return cls(features, stations)
+
+    def lookup(self, station_ids, dates, columns: list[str] | None = None) -> pd.DataFrame:
+        """Features for each (station_id, date) pair, NaN where the store has none.
+
+        returns: pd.DataFrame of `columns` (all features by default), one row per pair
+            in the order given.
+        """
+        columns = columns or [c for c in self.features.columns if c not in ("station_id", "date")]
+        station = self.stations.reindex(pd.Index(station_ids).astype(str))
+        day = (pd.to_datetime(pd.Series(dates)).to_numpy() - station["start"].to_numpy()) / (
+            np.timedelta64(1, "D")
+        )
+        found = (day >= 0) & (day < station["length"].to_numpy())
+        positions = (station["offset"].to_numpy() + day)[found].astype(int)
+
+        result = pd.DataFrame(np.nan, index=range(len(found)), columns=columns)
+        result.loc[found] = self.features[columns].take(positions).to_numpy()
+        return result
+
+
+def write_feature_store(features: pd.DataFrame, path: str = FEATURES_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    features.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load_feature_store(path: str = FEATURES_PATH) -> FeatureStore:
+    return FeatureStore.from_features(pd.read_parquet(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the rolling-window weather features.")
+    parser.add_argument("--archive", default=WEATHER_ARCHIVE_DIR)
+    parser.add_argument("--output", default=FEATURES_PATH)
+    args = parser.parse_args()
+
+    with span("read_archive") as step:
+        daily = to_pandas(read_archive(args.archive, SOURCE_COLUMNS))
+        step.rows = len(daily)
+    with span("build", rows=len(daily)):
+        features = build_features(daily)
+    with span("write", rows=len(features)):
+        write_feature_store(features, args.output)
+    logger.info(
+        f"Wrote {len(features)} station-days of {len(FEATURE_COLUMNS)} features to {args.output}."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    with span("feature_store"):
+        main()
+    time_taken = time.time() - start
+    print("Time to taken for feature_store.py to run: {}s.".format(round(time_taken, 3)))
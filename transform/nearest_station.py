@@ -0,0 +1,157 @@
+"""
+In-process replacement for the `nearest_weather_station` view in `sql/BuildDB.sql`.
+
+For each avalanche incident this finds the nearest weather station(s) that were
+reporting in the incident's year, using a haversine BallTree over the station
+inventory instead of a CROSS JOIN in PostGIS. Stations that changed name over time
+have multiple entries at the same location; all equidistant stations are kept, as the
+view does.
+
+The `k` nearest are written as ranked candidates: the weather stage serves each incident
+from the nearest that has daily data, see extract/weather_coverage.py.
+
+Run from the repository root:
+    python -m transform.nearest_station
+"""
+
+import argparse
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from pipeline.instrumentation import span
+from pipeline.schema import read_csv
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+INCIDENTS_PATH = "data/can_avs_lat_long_date.csv"
+STATIONS_PATH = "data/station_inv.csv"
+NEAREST_STATIONS_PATH = "data/nearest_stations.csv"
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Columns of the view, in order.
+VIEW_COLUMNS = ["ob_date", "station_name", "distance(km)", "station_id"]
+# Candidate stations per incident, the nearest and its fallbacks.
+DEFAULT_CANDIDATES = 3
+
+# Station inventory columns giving the years a station has data for.
+YEAR_COLUMNS = {
+    "daily": ("dly_first_year", "dly_last_year"),
+    "any": ("first_year", "last_year"),
+}
+
+
+def build_station_index(stations: pd.DataFrame) -> "BallTree":
+    """
+    Builds a haversine BallTree over the station inventory's decimal-degree coordinates.
+    """
+    from sklearn.neighbors import BallTree
+
+    coords = np.radians(stations[["latitude_dd", "longitude_dd"]].to_numpy(dtype=float))
+    return BallTree(coords, metric="haversine")
+
+
+def query_nearest(tree: "BallTree", latitude, longitude, k: int = 1) -> tuple[list, list]:
+    """
+    Queries the `k` nearest stations for a batch of points, keeping every station tied
+    with the k-th distance. Returns per-point arrays of station positions in the tree
+    and distances in km, sorted nearest first.
+    """
+    points = np.radians(np.column_stack([latitude, longitude]).astype(float))
+    dist, _ = tree.query(points, k=min(k, tree.data.shape[0]))
+    # Widen the radius slightly so float noise cannot drop an equidistant station.
+    radius = dist[:, -1] * (1 + 1e-9) + 1e-12
+    idx, dist = tree.query_radius(points, r=radius, return_distance=True, sort_results=True)
+    return idx, [d * EARTH_RADIUS_KM for d in dist]
+
+
+def nearest_stations(
+    incidents: pd.DataFrame, stations: pd.DataFrame, k: int = 1, coverage: str = "daily"
+) -> pd.DataFrame:
+    """
+    Finds the `k` nearest stations with data in each incident's year.
+
+    `coverage` selects the year columns used to decide if a station was reporting:
+    "daily" for `dly_first_year`/`dly_last_year`, "any" for `first_year`/`last_year`
+    as the SQL view does.
+
+    Returns the view's columns plus `incident`, the index label of the incident row,
+    and `rank`, the dense distance rank of the station for that incident.
+    """
+    first, last = YEAR_COLUMNS[coverage]
+    stations = stations.dropna(subset=["latitude_dd", "longitude_dd", first, last])
+    incidents = incidents.dropna(subset=["latitude", "longitude"])
+    years = pd.to_datetime(incidents["ob_date"]).dt.year.to_numpy()
+
+    matches = []
+    for year in np.unique(years):
+        active = stations[(stations[first] <= year) & (stations[last] >= year)]
+        if active.empty:
+            logger.warning(f"No stations with {coverage} data in {year}.")
+            continue
+        rows = np.flatnonzero(years == year)
+        idx, dist = query_nearest(
+            build_station_index(active),
+            incidents["latitude"].to_numpy()[rows],
+            incidents["longitude"].to_numpy()[rows],
+            k,
+        )
+        matches.append(
+            pd.DataFrame(
+                {
+                    "incident": np.repeat(incidents.index.to_numpy()[rows], [len(i) for i in idx]),
+                    "station": active.index.to_numpy()[np.concatenate(idx)],
+                    "distance(km)": np.concatenate(dist),
+                }
+            )
+        )
+
+    if not matches:
+        return pd.DataFrame(columns=VIEW_COLUMNS + ["incident", "rank"])
+
+    result = pd.concat(matches, ignore_index=True)
+    result["distance(km)"] = result["distance(km)"].round(3)
+    result["rank"] = result.groupby("incident")["distance(km)"].rank(method="dense").astype(int)
+    result["ob_date"] = incidents.loc[result["incident"], "ob_date"].to_numpy()
+    result["station_name"] = stations.loc[result["station"], "station_name"].to_numpy()
+    result["station_id"] = stations.loc[result["station"], "station_id"].to_numpy()
+    result = result.sort_values("distance(km)", ascending=False, kind="stable")
+    return result[VIEW_COLUMNS + ["incident", "rank"]].reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find the nearest weather station per incident.")
+    parser.add_argument("--incidents", default=INCIDENTS_PATH)
+    parser.add_argument("--stations", default=STATIONS_PATH)
+    parser.add_argument("--output", default=NEAREST_STATIONS_PATH)
+    parser.add_argument(
+        "-k",
+        type=int,
+        default=DEFAULT_CANDIDATES,
+        help="Number of nearest stations per incident.",
+    )
+    parser.add_argument("--coverage", choices=YEAR_COLUMNS, default="daily")
+    args = parser.parse_args()
+
+    incidents = read_csv(args.incidents, ["ob_date", "latitude", "longitude"])
+    stations = read_csv(args.stations)
+    with span("spatial_join", rows=len(incidents)):
+        result = nearest_stations(incidents, stations, k=args.k, coverage=args.coverage)
+    result.to_csv(args.output, index=False)
+    logger.info(f"Wrote {len(result)} rows to {args.output}.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    with span("nearest_station"):
+        main()
+    time_taken = time.time() - start
+    print("Time to taken for nearest_station.py to run: {}s.".format(round(time_taken, 3)))
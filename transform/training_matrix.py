@@ -0,0 +1,155 @@
+"""
+Memory-mappable training matrix written alongside the load-stage CSVs.
+
+For a dataset such as `load/full_cleaned` the load stage writes:
+
+- `full_cleaned.features.npy`: the feature matrix, C-ordered float64, rows by columns;
+- `full_cleaned.labels.npy`: the "avalanche" label per row, int8;
+- `full_cleaned.schema.json`: the feature column names, dtypes and row count.
+
+`load_training_matrix` memory-maps both arrays, so opening the matrix reads only the
+headers and the pages a consumer actually touches, with no parsing and no copy.
+
+Rows are appended through `TrainingMatrixWriter` in chunks of any size; they are
+spooled to raw files and given their `.npy` headers on `close`, when the row count is
+known, so streaming writers never hold the matrix in memory.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+LABEL_COLUMN = "avalanche"
+FEATURE_DTYPE = np.dtype("float64")
+LABEL_DTYPE = np.dtype("int8")
+SCHEMA_VERSION = 1
+
+# Bytes copied at a time when moving the spooled rows into the .npy files.
+COPY_BLOCK = 16 * 1024**2
+
+
+def matrix_paths(prefix: str) -> tuple[str, str, str]:
+    """The features, labels and schema paths for a dataset `prefix`."""
+    return f"{prefix}.features.npy", f"{prefix}.labels.npy", f"{prefix}.schema.json"
+
+
+@dataclass
+class TrainingMatrix:
+    """A feature matrix `X`, label vector `y` and the names of the columns of `X`."""
+
+    X: np.ndarray
+    y: np.ndarray
+    columns: list[str]
+
+    def frame(self) -> pd.DataFrame:
+        """The matrix as a DataFrame of the features and the label, as in the CSVs."""
+        df = pd.DataFrame(self.X, columns=self.columns)
+        df[LABEL_COLUMN] = self.y
+        return df
+
+
+class TrainingMatrixWriter:
+    """Append labelled rows in chunks and finish them as a memory-mappable matrix.
+
+    Args:
+        prefix: Dataset path without extension, e.g. "load/full_cleaned".
+        columns: The feature columns, in order; every chunk is written in this order.
+    """
+
+    def __init__(self, prefix: str, columns: list[str]) -> None:
+        self.prefix = prefix
+        self.columns = [c for c in columns if c != LABEL_COLUMN]
+        self.rows = 0
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        features, labels, _ = matrix_paths(prefix)
+        self._spools = {
+            features: open(f"{features}.tmp", "wb"),
+            labels: open(f"{labels}.tmp", "wb"),
+        }
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Append the rows of `df`, which has the feature columns and the label."""
+        features, labels, _ = matrix_paths(self.prefix)
+        X = np.ascontiguousarray(df[self.columns].to_numpy(FEATURE_DTYPE, na_value=np.nan))
+        self._spools[features].write(X.tobytes())
+        self._spools[labels].write(df[LABEL_COLUMN].to_numpy(LABEL_DTYPE).tobytes())
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """Write the `.npy` files and the schema sidecar, replacing any previous ones."""
+        features, labels, schema = matrix_paths(self.prefix)
+        shapes = {features: (self.rows, len(self.columns)), labels: (self.rows,)}
+        dtypes = {features: FEATURE_DTYPE, labels: LABEL_DTYPE}
+        for path, spool in self._spools.items():
+            spool.close()
+            tmp = f"{path}.part"
+            with open(tmp, "wb") as out, open(spool.name, "rb") as raw:
+                header = {"descr": dtypes[path].str, "fortran_order": False, "shape": shapes[path]}
+                np.lib.format.write_array_header_1_0(out, header)
+                while block := raw.read(COPY_BLOCK):
+                    out.write(block)
+            os.remove(spool.name)
+            os.replace(tmp, path)
+
+        tmp = f"{schema}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "version": SCHEMA_VERSION,
+                    "rows": self.rows,
+                    "columns": self.columns,
+                    "feature_dtype": FEATURE_DTYPE.str,
+                    "label": LABEL_COLUMN,
+                    "label_dtype": LABEL_DTYPE.str,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, schema)
+
+    def __enter__(self) -> "TrainingMatrixWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        for spool in self._spools.values():
+            spool.close()
+            os.remove(spool.name)
+
+
+def write_training_matrix(df: pd.DataFrame, prefix: str) -> None:
+    """Write a labelled DataFrame as a training matrix in one go."""
+    with TrainingMatrixWriter(prefix, list(df.columns)) as writer:
+        writer.append(df)
+
+
+def load_training_matrix(prefix: str, mmap: bool = True) -> TrainingMatrix:
+    """Open the training matrix written for `prefix`.
+
+    Args:
+        prefix: Dataset path without extension, e.g. "load/full_cleaned".
+        mmap: Memory-map the arrays read-only rather than reading them into memory.
+
+    Raises:
+        ValueError: If the arrays do not match their schema sidecar.
+    """
+    features, labels, schema_path = matrix_paths(prefix)
+    with open(schema_path) as f:
+        schema = json.load(f)
+    mode = "r" if mmap else None
+    X = np.load(features, mmap_mode=mode)
+    y = np.load(labels, mmap_mode=mode)
+    if X.shape != (schema["rows"], len(schema["columns"])) or y.shape != (schema["rows"],):
+        raise ValueError(
+            f"{prefix} has a {X.shape} matrix and {y.shape} labels, but its schema "
+            f"describes {schema['rows']} rows of {len(schema['columns'])} columns."
+        )
+    if X.dtype.str != schema["feature_dtype"] or y.dtype.str != schema["label_dtype"]:
+        raise ValueError(f"{prefix} arrays do not have the dtypes in its schema.")
+    return TrainingMatrix(X, y, schema["columns"])
@@ -1,55 +1,202 @@
+import argparse
+import logging
+import os
 import time
+from typing import Iterator
 
 import numpy as np
 import pandas as pd
 
-start = time.time()
+from pipeline.instrumentation import span
+from transform.feature_store import FEATURE_COLUMNS
+from transform.training_matrix import TrainingMatrixWriter, write_training_matrix
 
-av_path = "/home/david/Documents/ARU/AvalancheProject/demo/data/avs_weather.csv"
-dull_path = "/home/david/Documents/ARU/AvalancheProject/demo/data/dull_weather.csv"
+av_path = "data/avs_weather.csv"
+dull_path = "data/dull_weather.csv"
+full_path = "load/full_cleaned.csv"
+balanced_path = "load/balanced_cleaned.csv"
+
+DEFAULT_SEED = 0
+DEFAULT_MEMORY_BUDGET = 256 * 1024**2
+# Rows take several times their final size while pandas parses and formats a chunk;
+# measured at about 8x for the weather CSVs.
+CHUNK_OVERHEAD = 8
+
+columns_to_load = [
+    "Max Temp (°C)",
+    "Min Temp (°C)",
+    "Mean Temp (°C)",
+    "Heat Deg Days (°C)",
+    "Cool Deg Days (°C)",
+    "Total Rain (mm)",
+    "Total Snow (cm)",
+    "Total Precip (mm)",
+    "Snow on Grnd (cm)",
+] + FEATURE_COLUMNS
+
+
+def add_label(df: pd.DataFrame, label: int) -> pd.DataFrame:
+    """
+    Removes null Max Temp values and adds a bool value to a new "avalanche" column.
+    """
+    return df[df["Max Temp (°C)"].notnull()].assign(avalanche=label)
 
 
 def load_and_label(path: str, label: int) -> pd.DataFrame:
     """
-    Loads CSV from path, loading the appropriate columns.
+    Loads CSV from path, loading the appropriate columns, and the rolling-window
+    features if transformWeather.py added them.
     Removes null Max Temp values and adds a bool value to a new "avalanche" column.
     """
-    columns_to_load = [
-        "Max Temp (°C)",
-        "Min Temp (°C)",
-        "Mean Temp (°C)",
-        "Heat Deg Days (°C)",
-        "Cool Deg Days (°C)",
-        "Total Rain (mm)",
-        "Total Snow (cm)",
-        "Total Precip (mm)",
-        "Snow on Grnd (cm)",
-    ]
-    df = pd.read_csv(path, usecols=columns_to_load)
-    df = df[df["Max Temp (°C)"].notnull()]
-    df["avalanche"] = label
-    return df
-
-
-# Create DataFrames for both 1s and 0s.
-df_av = load_and_label(av_path, 1)
-df_dull = load_and_label(dull_path, 0)
-
-# Create full dataset
-pd.concat([df_av, df_dull]).reset_index().drop(columns="index").to_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/load/full_cleaned.csv", index=False
-)
-
-
-# Create a randomised index to have a balanced dataset
-random_idx = np.arange(len(df_dull.index))
-np.random.shuffle(random_idx)
-
-df_dull_short = df_dull.iloc[random_idx][: len(df_av)]
-pd.concat([df_av, df_dull_short]).reset_index().drop(columns="index").to_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/load/balanced_cleaned.csv",
-    index=False,
-)
-
-time_taken = time.time() - start
-print("Time to taken for transformFinalData.py to run: {}s.".format(round(time_taken, 3)))
+    df = pd.read_csv(path, usecols=lambda column: column in columns_to_load, dtype=float)
+    return add_label(df, label)
+
+
+def iter_labelled(path: str, label: int, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    As `load_and_label`, yielding at most `chunk_rows` rows at a time.
+    """
+    with pd.read_csv(
+        path,
+        usecols=lambda column: column in columns_to_load,
+        dtype=float,
+        chunksize=chunk_rows,
+    ) as reader:
+        for chunk in reader:
+            yield add_label(chunk, label)
+
+
+def output_columns(*paths: str) -> list[str]:
+    """
+    The loaded columns of the files, in the order they first appear, then "avalanche".
+    """
+    columns = []
+    for path in paths:
+        header = pd.read_csv(path, nrows=0).columns
+        columns += [c for c in header if c in columns_to_load and c not in columns]
+    return columns + ["avalanche"]
+
+
+def sample_keys(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    One uniform sort key per dull row, drawn in file order. The balanced set keeps the
+    dull rows with the smallest keys, in key order, which is a seeded shuffle of the
+    dull rows cut to length. Draws are the same whether taken at once or in chunks.
+    """
+    return rng.random(n)
+
+
+def matrix_prefix(csv_path: str) -> str:
+    """
+    Where the memory-mappable copy of a CSV is written: next to it, without the
+    extension. See transform/training_matrix.py.
+    """
+    return os.path.splitext(csv_path)[0]
+
+
+def in_memory(seed: int = DEFAULT_SEED) -> None:
+    # Create DataFrames for both 1s and 0s.
+    columns = output_columns(av_path, dull_path)
+    df_av = load_and_label(av_path, 1).reindex(columns=columns)
+    df_dull = load_and_label(dull_path, 0).reindex(columns=columns)
+
+    # Create full dataset
+    df_full = pd.concat([df_av, df_dull]).reset_index(drop=True)
+    df_full.to_csv(full_path, index=False)
+    write_training_matrix(df_full, matrix_prefix(full_path))
+
+    # Take a seeded random sample of the dull days to have a balanced dataset.
+    keys = sample_keys(np.random.default_rng(seed), len(df_dull))
+    df_dull_short = df_dull.iloc[np.argsort(keys, kind="stable")[: len(df_av)]]
+    df_balanced = pd.concat([df_av, df_dull_short]).reset_index(drop=True)
+    df_balanced.to_csv(balanced_path, index=False)
+    write_training_matrix(df_balanced, matrix_prefix(balanced_path))
+
+
+def streaming(seed: int = DEFAULT_SEED, memory_budget: int = DEFAULT_MEMORY_BUDGET) -> None:
+    """
+    Writes the same files as `in_memory`, holding at most a chunk of input rows and
+    the balanced sample of dull rows in memory at once.
+
+    The balanced sample is drawn by reservoir sampling: each dull row gets the sort key
+    `in_memory` would give it, and the reservoir keeps the rows with the smallest keys
+    seen so far.
+    """
+    columns = output_columns(av_path, dull_path)
+    row_bytes = 8 * len(columns)
+    chunk_rows = max(1, memory_budget // (CHUNK_OVERHEAD * row_bytes))
+
+    with (
+        open(full_path, "w", newline="") as full,
+        open(balanced_path, "w", newline="") as bal,
+        TrainingMatrixWriter(matrix_prefix(full_path), columns) as full_matrix,
+        TrainingMatrixWriter(matrix_prefix(balanced_path), columns) as bal_matrix,
+    ):
+        pd.DataFrame(columns=columns).to_csv(full, index=False)
+        pd.DataFrame(columns=columns).to_csv(bal, index=False)
+
+        n_av = 0
+        for chunk in iter_labelled(av_path, 1, chunk_rows):
+            chunk = chunk.reindex(columns=columns)
+            chunk.to_csv(full, index=False, header=False)
+            chunk.to_csv(bal, index=False, header=False)
+            full_matrix.append(chunk)
+            bal_matrix.append(chunk)
+            n_av += len(chunk)
+
+        # The reservoir holds up to `n_av` rows, and the chunks share what is left.
+        reservoir_bytes = 2 * n_av * row_bytes
+        if reservoir_bytes >= memory_budget:
+            raise ValueError(
+                f"A memory budget of {memory_budget} bytes cannot hold the balanced sample "
+                f"of {n_av} rows."
+            )
+        chunk_rows = max(1, (memory_budget - reservoir_bytes) // (CHUNK_OVERHEAD * row_bytes))
+
+        rng = np.random.default_rng(seed)
+        reservoir = pd.DataFrame(columns=columns)
+        reservoir_keys = np.empty(0)
+        for chunk in iter_labelled(dull_path, 0, chunk_rows):
+            chunk = chunk.reindex(columns=columns)
+            chunk.to_csv(full, index=False, header=False)
+            full_matrix.append(chunk)
+            keys = np.concatenate([reservoir_keys, sample_keys(rng, len(chunk))])
+            pool = pd.concat([reservoir, chunk]) if len(reservoir) else chunk
+            keep = np.argpartition(keys, n_av - 1)[:n_av] if len(keys) > n_av else slice(None)
+            reservoir, reservoir_keys = pool.iloc[keep], keys[keep]
+
+        reservoir = reservoir.iloc[np.argsort(reservoir_keys, kind="stable")]
+        reservoir.to_csv(bal, index=False, header=False)
+        bal_matrix.append(reservoir)
+
+
+def main(
+    stream: bool = False, seed: int = DEFAULT_SEED, memory_budget: int = DEFAULT_MEMORY_BUDGET
+):
+    if stream:
+        streaming(seed, memory_budget)
+    else:
+        in_memory(seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label and combine the weather datasets.")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Process the inputs in chunks within --memory-budget; the output is the same.",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET // 1024**2,
+        help="Memory budget for --streaming, in MiB.",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    with span("transformFinalData"):
+        main(args.streaming, args.seed, args.memory_budget * 1024**2)
+    time_taken = time.time() - start
+    print("Time to taken for transformFinalData.py to run: {}s.".format(round(time_taken, 3)))
@@ -1,49 +1,131 @@
+import argparse
+import logging
 import os
 import time
 import warnings
 
 import pandas as pd
 
-warnings.filterwarnings("ignore")
+from extract.weather_archive import MEASURE_COLUMNS, read_days
+from pipeline.instrumentation import span
+from transform.feature_store import FEATURE_COLUMNS, load_feature_store
+from transform.weather_aggregate import aggregate_means, read_day_list, refresh_aggregates
 
-start = time.time()
+weather_archive_dir = "data/weather_archive"
+weather_stations_path = "data/weather_stations.csv"
+dull_days_path = "data/dull_days.csv"
+avs_weather_path = "data/avs_weather.csv"
+dull_weather_path = "data/dull_weather.csv"
+aggregates_dir = "data/weather_aggregates"
+features_path = "data/weather_features.parquet"
 
-avalanche_weather_dir = "/home/david/Documents/ARU/AvalancheProject/demo/data/daily_weather_avs"
-dull_weather_dir = "/home/david/Documents/ARU/AvalancheProject/demo/data/daily_weather_dulls"
 
+def archived_days(days: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pass in a DataFrame of `station_id` and `date` and return the archived daily
+    weather for those days, with the date as an `ob_date` string. Only the matching
+    partitions and the measure columns are read from the archive.
+    """
+    with span("read_archive") as step:
+        df = read_days(weather_archive_dir, days, MEASURE_COLUMNS)
+        step.rows = len(df)
+    df["ob_date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    return df[["ob_date"] + MEASURE_COLUMNS]
+
+
+def feature_means(days: pd.DataFrame, store) -> pd.DataFrame:
+    """
+    Pass in a DataFrame of `station_id` and `date` and return the mean of each rolling
+    weather feature over the stations, per `ob_date`.
+    """
+    with span("feature_lookup", rows=len(days)):
+        features = store.lookup(days["station_id"], days["date"], FEATURE_COLUMNS)
+    features["ob_date"] = pd.to_datetime(days["date"]).dt.strftime("%Y-%m-%d").to_numpy()
+    return features.groupby(by="ob_date").mean()
+
+
+def load_features():
+    """The feature store, if it has been built (see transform/feature_store.py)."""
+    return load_feature_store(features_path) if os.path.exists(features_path) else None
 
-def single_dataframe(root_path: str) -> pd.DataFrame:
+
+def write_avs(group_av: pd.DataFrame, store=None) -> None:
+    """
+    Write the per-date mean weather of the avalanche days, dropping dates with a
+    missing measure. The rolling-window features are added when `store` is given;
+    they may be missing for days without a full window of history.
+    """
+    if store is not None:
+        group_av = group_av.join(
+            feature_means(read_day_list(weather_stations_path, "ob_date"), store)
+        )
+    group_av.dropna(subset=MEASURE_COLUMNS).to_csv(avs_weather_path, index=False)
+
+
+def write_dulls(group_dull: pd.DataFrame, av_dates, store=None) -> None:
     """
-    Pass in a root directory containing csv files and return a singe
-    pandas DataFrame.
+    Write the per-date mean weather of the dull days, as `write_avs` does, leaving out
+    the dates on which an avalanche happened.
     """
-    results = pd.DataFrame()
-    for file in os.listdir(root_path):
-        results = pd.concat([results, pd.read_csv(root_path + "/" + file)], ignore_index=True)
-    return results.reset_index().drop(columns="index")
+    if store is not None:
+        group_dull = group_dull.join(feature_means(read_day_list(dull_days_path), store))
+    group_dull = group_dull.reset_index().dropna(subset=MEASURE_COLUMNS)
+    group_dull = group_dull[~group_dull["ob_date"].isin(av_dates)]
+    group_dull.to_csv(dull_weather_path, index=False)
+
 
+def main(incremental: bool = False, only: str | None = None) -> None:
+    """
+    Write the avalanche and dull day weather. The two are independent; `only` writes
+    just "avs" or "dulls", so the pipeline can run them side by side.
+    """
+    # Read in the dates and stations where avalanches happened.
+    av_days = pd.read_csv(weather_stations_path, usecols=["ob_date", "station_id"])
+    av_dates = av_days[["ob_date"]]
+    store = load_features()
 
-# Read in the dates where avalanches happened.
-av_dates = pd.read_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/data/nearest_stations.csv",
-    usecols=["ob_date"],
-)
+    if only in (None, "avs"):
+        if incremental:
+            # Only days not already folded into the saved aggregates are read.
+            state_av = refresh_aggregates(
+                f"{aggregates_dir}/avs", weather_archive_dir, weather_stations_path, "ob_date"
+            )
+            group_av = aggregate_means(state_av)
+        else:
+            df_av = archived_days(av_days.rename(columns={"ob_date": "date"}))
+            df_av = pd.merge(av_dates, df_av, on="ob_date", how="inner")
+            with span("groupby", rows=len(df_av)):
+                group_av = df_av.groupby(by="ob_date").mean()
+        write_avs(group_av, store)
 
-df_av = single_dataframe(avalanche_weather_dir)
-df_av["ob_date"] = df_av["Date/Time"]
-df_av = pd.merge(av_dates, df_av, on="ob_date", how="inner")
-group_av = df_av.groupby(by="ob_date").mean().dropna()
-group_av.to_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/data/avs_weather.csv", index=False
-)
+    if only in (None, "dulls"):
+        if incremental:
+            state_dull = refresh_aggregates(
+                f"{aggregates_dir}/dulls", weather_archive_dir, dull_days_path
+            )
+            group_dull = aggregate_means(state_dull)
+        else:
+            df_dull = archived_days(pd.read_csv(dull_days_path))
+            with span("groupby", rows=len(df_dull)):
+                group_dull = df_dull.groupby(by="ob_date").mean()
+        write_dulls(group_dull, av_dates["ob_date"], store)
 
-df_dull = single_dataframe(dull_weather_dir)
-df_dull["ob_date"] = df_dull["Date/Time"]
-group_dull = df_dull.groupby(by="ob_date").mean().reset_index().dropna()
-group_dull = group_dull[~group_dull["ob_date"].isin(av_dates)]
-group_dull.to_csv(
-    "/home/david/Documents/ARU/AvalancheProject/demo/data/dull_weather.csv", index=False
-)
 
-time_taken = time.time() - start
-print("Time to taken for transformWeather.py to run: {}s.".format(round(time_taken, 3)))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Average the daily weather by date.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fold only new days into the saved per-date aggregates.",
+    )
+    parser.add_argument(
+        "--only", choices=["avs", "dulls"], help="Write only the avalanche or dull days."
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    warnings.filterwarnings("ignore")
+    start = time.time()
+    with span("transformWeather"):
+        main(args.incremental, args.only)
+    time_taken = time.time() - start
+    print("Time to taken for transformWeather.py to run: {}s.".format(round(time_taken, 3)))
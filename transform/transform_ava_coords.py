@@ -15,174 +15,153 @@ Rules to think about
     2. Lat/lng : Correct
     3. Lat/Long Decimal Degrees : Correct
     4. UTM (starts with) : Remove letters, function parse
+
+The work is done by `normalise_coordinates`, which parses every format in one pass with
+`parse_coordinates`. Importing this module has no side effects, and pyproj and shapely
+are only imported when it runs.
+
+Run from the repository root:
+    python -m transform.transform_ava_coords
 """
 
+import argparse
 import logging
 import time
 import warnings
 
-import geopandas as gpd
 import numpy as np
 import pandas as pd
-import pyproj
-from geopy.geocoders import Nominatim
-
-logging.basicConfig(level=logging.INFO)
-start = time.time()
-
-warnings.filterwarnings("ignore")
-
-
-df = pd.read_csv("data/can_avs_raw.csv")
+import pyarrow as pa
+import pyarrow.compute as pc
 
-# Create new df with reduced info
-new_df = df[["ob_date", "location_coords", "location_coords_type"]].copy()
+from pipeline.instrumentation import span
+from pipeline.schema import read_parquet
 
-new_df["location_coords"] = new_df["location_coords"].astype(str)
-new_df["location_coords_type"] = new_df["location_coords_type"].astype(str)
+logger = logging.getLogger(__name__)
 
-# Create idxs for all types of location coordinate type
-# These two are in the correct position
-lat_lng_idx = new_df["location_coords_type"] == "Lat/lng"
-lat_lng_dd_idx = new_df["location_coords_type"] == "Lat/Long Decimal Degrees"
+RAW_INCIDENTS_PATH = "data/can_avs_raw.parquet"
+INCIDENTS_PATH = "data/can_avs_lat_long_date.csv"
 
-# These rows have their latitude and longitude reversed, so that will have to be caught
-# during assignment
-lat_lon_idx = new_df["location_coords_type"] == "LatLon"
+COLUMNS = ["ob_date", "location_coords", "location_coords_type"]
 
-# The UTM format has more cleaning to go through than the others; removing letters,
-# the "assumed" word etc.
-utm_idx = new_df["location_coords_type"].str.startswith("UTM")
+# Types whose `location_coords` are already [latitude, longitude].
+IN_ORDER_TYPES = ["Lat/lng", "Lat/Long Decimal Degrees"]
+# The two values of a `location_coords` string, such as "[49.1, -117.2]".
+COORDINATES_PATTERN = r"^\s*\[?\s*(?P<first>[^,\]\s]+)\s*,\s*(?P<second>[^,\]\s]+)\s*\]?\s*$"
 
 
-# Define some processing functions
-
-
-def split_coordinates(series: pd.Series) -> tuple:
+def utm_zones(types: pd.Series) -> tuple:
     """
-    Splits the series from a point to individual latitude and longitude series.
+    Returns the zone number and datum of each UTM `location_coords_type`, such as
+    "UTM 11U NAD83 (assumed)"; NaN where the type has none.
     """
-    coordinates = series.str.strip("[]").str.split(", ", expand=True)
-    latitude, longitude = coordinates
-    return latitude, longitude
-
+    parts = types.str.extract(r"^UTM\s+(\d+)\S*\s+([^\s(]+)")
+    return parts[0].values, parts[1].values
 
-# The UTM type requires more wrangling to parse
 
+def parse_coordinates(coords: pd.Series, types: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parses `location_coords` strings of all four `location_coords_type` formats into
+    latitude and longitude arrays, NaN where they cannot be parsed.
 
-def parse_utm(df: pd.DataFrame) -> tuple:
+    Sites recur across incidents, so each unique (coords, type) pair is parsed once and
+    the results are broadcast back. Both values are extracted in a single regex pass
+    over the Arrow string buffer; the LatLon reversal, UTM conversion, >90 swap and
+    hemisphere signs are then applied to the arrays in place.
+    """
+    coord_codes, unique_coords = pd.factorize(coords, use_na_sentinel=False)
+    type_codes, unique_types = pd.factorize(types, use_na_sentinel=False)
+    codes, pairs = pd.factorize(coord_codes * len(unique_types) + type_codes)
+    coords = np.asarray(unique_coords, dtype=object)[pairs // len(unique_types)]
+    pair_types = pairs % len(unique_types)
+
+    values = pc.extract_regex(pa.array(coords, pa.string()), COORDINATES_PATTERN)
+    first = pd.to_numeric(values.field("first").to_pandas(), errors="coerce").to_numpy(float)
+    second = pd.to_numeric(values.field("second").to_pandas(), errors="coerce").to_numpy(float)
+
+    # Lat/lng and Lat/Long Decimal Degrees are in order, LatLon is reversed and UTM
+    # holds eastings and northings; any other type is left unparsed. The types are
+    # few, so they are classified once and the classes taken per pair.
+    types = pd.Series(np.asarray(unique_types, dtype=object))
+    in_order_idx = types.isin(IN_ORDER_TYPES).to_numpy()[pair_types]
+    reversed_idx = (types == "LatLon").to_numpy()[pair_types]
+    utm_idx = types.str.startswith("UTM", na=False).to_numpy(bool)[pair_types]
+
+    latitude = np.where(in_order_idx, first, np.nan)
+    longitude = np.where(in_order_idx, second, np.nan)
+    latitude[reversed_idx], longitude[reversed_idx] = second[reversed_idx], first[reversed_idx]
+    if utm_idx.any():
+        from transform.utm import utm_to_latlon
+
+        with span("utm", rows=int(utm_idx.sum())):
+            zone, datum = utm_zones(types)
+            latitude[utm_idx], longitude[utm_idx] = utm_to_latlon(
+                zone[pair_types][utm_idx],
+                datum[pair_types][utm_idx],
+                first[utm_idx],
+                second[utm_idx],
+            )
+
+    # Latitude cannot be >90; if it is, it is swapped with longitude. All latitudes are
+    # north and all longitudes west.
+    np.abs(latitude, out=latitude)
+    swap = latitude > 90
+    latitude[swap], longitude[swap] = longitude[swap], latitude[swap]
+    np.abs(latitude, out=latitude)
+    np.negative(np.abs(longitude, out=longitude), out=longitude)
+    return latitude[codes], longitude[codes]
+
+
+def normalise_coordinates(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Processing function for UTM location type.
+    Pass in the raw incidents and return their `ob_date`, `location_coords`,
+    `location_coords_type`, `latitude`, `longitude` and `province`, for the incidents
+    with coordinates inside Canada.
     """
-    coords = df["location_coords_type"].str.strip("(assumed)").str.split(expand=True)
-    _, zone, datum = coords[0], coords[1], coords[2]
-    eastings, northings = split_coordinates(df["location_coords"])
-
-    zone = zone.str.extract(r"^(\d+)", expand=False).values
-    datum = datum.values
-    eastings = eastings.values
-    northings = northings.values
-
-    lats, longs = [], []
-    for i in range(len(df)):
-        if datum[i] == "Unknown":
-            lats.append(np.nan)
-            longs.append(np.nan)
-        else:
-            utm_proj = pyproj.Proj(proj="utm", zone=zone[i], datum=datum[i])
-            wgs84_proj = pyproj.Proj(proj="latlong", datum="WGS84")
-            long, lat = pyproj.transform(utm_proj, wgs84_proj, eastings[i], northings[i])
-            lats.append(lat)
-            longs.append(long)
-
-    return lats, longs
-
-
-# Function to check if coordinates are within Canada
-def is_within_canada(latitude: float, longitude: float) -> bool:
-    geolocator = Nominatim(user_agent="my-app")
-    location = geolocator.reverse((latitude, longitude), exactly_one=True)
-    if location is None:
-        return False
-    country = location.raw["address"].get("country")
-    return country == "Canada"
-
-
-logging.info("Creating indices.")
-# These two are in the correct position
-lat_lng_idx = new_df["location_coords_type"] == "Lat/lng"
-lat_lng_dd_idx = new_df["location_coords_type"] == "Lat/Long Decimal Degrees"
-
-# These rows have their latitude and longitude reversed, so that will have to be caught
-# during assignment
-lat_lon_idx = new_df["location_coords_type"] == "LatLon"
-
-# The UTM format has more cleaning to go through than the others; removing letters,
-# the "assumed" word etc.
-utm_idx = new_df["location_coords_type"].str.startswith("UTM")
-
-new_df[["latitude", "longitude"]] = split_coordinates(new_df["location_coords"][lat_lng_idx])
-
-new_df[["latitude", "longitude"]] = split_coordinates(new_df["location_coords"][lat_lng_dd_idx])
-
-# Recall, the lats and longs in these rows are reversed, hence reverse assignment
-new_df[["longitude", "latitude"]] = split_coordinates(new_df["location_coords"][lat_lon_idx])
-
-logging.info("Starting UTM processing.")
-lats_4, longs_4 = parse_utm(new_df[utm_idx])
-new_df["latitude"].loc[utm_idx] = lats_4
-new_df["longitude"].loc[utm_idx] = longs_4
-logging.info("UTM processing complete.")
-# --------------------------------------------------------------------------------------
-# Potential optimisation but unable to implement yet. Keep getting Index error or access
-# before assignment.
-
-# Use Numpy to conditionally apply functions
-# new_df["latitude"], new_df["longitude"] = np.where(
-#    df["location_coords_type"] == utm_idx,
-#    parse_utm(new_df),
-#    split_coordinates(new_df["location_coords_type"]),
-# )
-
-## Reversing lat_lon_idx values.
-
-# new_df.loc[lat_lon_idx, ["latitude", "longitude"]] = new_df.loc[
-#    lat_lon_idx, ["longitude", "latitude"]
-# ].values
-#
-# --------------------------------------------------------------------------------------
-
-
-## Latittude cannot be >90. If it is, it is swapped with longitude
-logging.info("Sanity check latitudes.")
-new_df["latitude"] = abs(new_df["latitude"].astype(float))
-
-
-idx = new_df["latitude"] > 90
-
-new_df.loc[idx, ["latitude", "longitude"]] = new_df.loc[idx, ["longitude", "latitude"]].values
-
-
-# All longitude values should be <0 and all latitude should be >0 based on location.
-new_df["longitude"] = -1 * abs(new_df["longitude"].astype(float))
-new_df["latitude"] = abs(new_df["latitude"].astype(float))
-
-new_df = new_df.dropna()
-logging.info("Sanity check: Within Canada.")
-# new_df["IsWithinCanada"] = new_df.apply(
-# lambda row: is_within_canada(row["latitude"], row["longitude"]), axis=1
-# )
-world = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
-
-can = world[world.name == "Canada"]
-data = gpd.GeoDataFrame(new_df, geometry=gpd.points_from_xy(new_df.longitude, new_df.latitude))
-p = gpd.tools.sjoin(data, can, how="left")
-p = p.loc[p["index_right"] > 0]
-# new_df = new_df.loc[new_df["IsWithinCanada"] == True]  # noqa: E712
-logging.info("Canada check complete.")
-# new_df.drop(columns="IsWithinCanada").dropna().to_csv(
-# "./data/can_avs_lat_long_date.csv", index=False
-# )
-
-time_taken = time.time() - start
-print("Time to taken for transform_ava_coords.py to run: {}s.".format(round(time_taken, 3)))
+    from transform.canada_index import classify_points
+
+    # Create new df with reduced info
+    new_df = df[COLUMNS].copy()
+
+    new_df["location_coords"] = new_df["location_coords"].astype(str)
+
+    logger.info("Parsing coordinates.")
+    with span("parse_coordinates", rows=len(new_df)):
+        latitude, longitude = parse_coordinates(
+            new_df["location_coords"], new_df["location_coords_type"]
+        )
+    new_df["latitude"] = latitude
+    new_df["longitude"] = longitude
+
+    new_df = new_df.dropna()
+    logger.info("Sanity check: Within Canada.")
+    # Offline lookup against the provincial boundaries in misc/canada_poly.
+    with span("canada_join", rows=len(new_df)):
+        in_canada, province = classify_points(
+            new_df["latitude"].values, new_df["longitude"].values
+        )
+    new_df["province"] = province
+    new_df = new_df.loc[in_canada]
+    logger.info("Canada check complete.")
+    return new_df.dropna()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Standardise the incident coordinates.")
+    parser.add_argument("--input", default=RAW_INCIDENTS_PATH)
+    parser.add_argument("--output", default=INCIDENTS_PATH)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    result = normalise_coordinates(read_parquet(args.input, COLUMNS))
+    result.to_csv(args.output, index=False)
+    logger.info(f"Wrote {len(result)} incidents to {args.output}.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    with span("transform_ava_coords"):
+        main()
+    time_taken = time.time() - start
+    print("Time to taken for transform_ava_coords.py to run: {}s.".format(round(time_taken, 3)))
@@ -0,0 +1,57 @@
+"""
+Batched UTM to WGS84 conversion.
+
+Rows are grouped by (zone, datum) and each group is converted with a single array call
+to a cached `pyproj.Transformer`, rather than building projections per row.
+"""
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pyproj import CRS, Transformer
+from pyproj.exceptions import CRSError
+
+logger = logging.getLogger(__name__)
+
+WGS84 = CRS.from_dict({"proj": "longlat", "datum": "WGS84"})
+
+
+@lru_cache(maxsize=None)
+def get_transformer(zone: str, datum: str) -> Transformer:
+    """
+    Returns the (cached) transformer from a UTM zone/datum to WGS84 longitude, latitude.
+    """
+    utm = CRS.from_dict({"proj": "utm", "zone": zone, "datum": datum})
+    return Transformer.from_crs(utm, WGS84, always_xy=True)
+
+
+def utm_to_latlon(zone, datum, eastings, northings) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converts arrays of UTM zone, datum, easting and northing to latitude and longitude.
+
+    Rows with an "Unknown" datum, a missing zone or a zone/datum pyproj cannot build a
+    projection for are returned as NaN, as are rows without a numeric easting and
+    northing.
+    """
+    eastings = pd.to_numeric(pd.Series(eastings), errors="coerce").to_numpy(dtype=float)
+    northings = pd.to_numeric(pd.Series(northings), errors="coerce").to_numpy(dtype=float)
+    # pyproj returns inf, not NaN, for a missing easting or northing.
+    valid = np.isfinite(eastings) & np.isfinite(northings)
+    groups = pd.DataFrame({"zone": zone, "datum": datum})
+
+    lats = np.full(len(groups), np.nan)
+    longs = np.full(len(groups), np.nan)
+    for (z, d), idx in groups.groupby(["zone", "datum"], sort=False).indices.items():
+        idx = idx[valid[idx]]
+        if d == "Unknown" or not len(idx):
+            continue
+        try:
+            transformer = get_transformer(z, d)
+        except CRSError:
+            logger.warning(f"Skipping {len(idx)} rows with unusable UTM zone {z}, datum {d}.")
+            continue
+        longs[idx], lats[idx] = transformer.transform(eastings[idx], northings[idx])
+
+    return lats, longs
@@ -0,0 +1,190 @@
+"""
+Incremental per-date aggregation of archived daily weather.
+
+`transformWeather.py` averages the weather of a set of (station_id, date) days by date.
+Rather than re-reading every day on each run, the sum and non-null count of every
+measure per date are kept in a small state store, together with the days already
+folded in, a hash of the day list and the (size, mtime) of every archive part seen.
+
+A refresh reads only the days that are listed but not yet folded in, so a daily run
+costs in proportion to the new days. Archived rows never change (the archive is
+append-only and de-duplicated on (station_id, date)), so a part that changes or
+disappears, or a day dropped from the list, can only be handled by rebuilding; the
+state is then reset and everything is folded in again. The means match a full
+recompute up to floating-point rounding, as the sums are accumulated in another order.
+
+The state lives in `state_dir`: `state.json` names the current generation of
+`aggregates-<n>.parquet` and `folded-<n>.parquet`, and is replaced last, so an
+interrupted refresh leaves the previous state intact.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from extract.weather_archive import MEASURE_COLUMNS, read_days
+from pipeline.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json"
+
+SUM_COLUMNS = [f"{col} sum" for col in MEASURE_COLUMNS]
+COUNT_COLUMNS = [f"{col} count" for col in MEASURE_COLUMNS]
+
+
+@dataclass
+class AggregateState:
+    """Per-date partial aggregates and what has been folded into them.
+
+    `aggregates` is indexed by `ob_date` with a sum and a count column per measure;
+    `folded` holds the `station_id`, `date` pairs already included.
+    """
+
+    aggregates: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(
+            columns=SUM_COLUMNS + COUNT_COLUMNS, index=pd.Index([], name="ob_date"), dtype=float
+        )
+    )
+    folded: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame({"station_id": [], "date": []}, dtype=str)
+    )
+    days_hash: str | None = None
+    parts: dict = field(default_factory=dict)
+    generation: int = 0
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def archive_parts(root: str) -> dict:
+    """The `[size, mtime_ns]` of every part file in the archive, by relative path."""
+    parts = {}
+    for dirpath, _, files in os.walk(root):
+        for file in files:
+            if file.endswith(".parquet") and not file.startswith("."):
+                path = os.path.join(dirpath, file)
+                info = os.stat(path)
+                parts[os.path.relpath(path, root)] = [info.st_size, info.st_mtime_ns]
+    return parts
+
+
+def load_state(state_dir: str) -> AggregateState:
+    path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return AggregateState()
+    with open(path) as f:
+        meta = json.load(f)
+    n = meta["generation"]
+    return AggregateState(
+        aggregates=pd.read_parquet(os.path.join(state_dir, f"aggregates-{n}.parquet")),
+        folded=pd.read_parquet(os.path.join(state_dir, f"folded-{n}.parquet")),
+        days_hash=meta["days_hash"],
+        parts=meta["parts"],
+        generation=n,
+    )
+
+
+def save_state(state: AggregateState, state_dir: str) -> None:
+    """Write a new generation of the state, then switch `state.json` over to it."""
+    os.makedirs(state_dir, exist_ok=True)
+    previous, n = state.generation, state.generation + 1
+    state.aggregates.to_parquet(os.path.join(state_dir, f"aggregates-{n}.parquet"))
+    state.folded.to_parquet(os.path.join(state_dir, f"folded-{n}.parquet"), index=False)
+    tmp = os.path.join(state_dir, f"{STATE_FILE}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"generation": n, "days_hash": state.days_hash, "parts": state.parts}, f)
+    os.replace(tmp, os.path.join(state_dir, STATE_FILE))
+    state.generation = n
+    for name in (f"aggregates-{previous}.parquet", f"folded-{previous}.parquet"):
+        try:
+            os.remove(os.path.join(state_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def partial_aggregates(rows: pd.DataFrame) -> pd.DataFrame:
+    """Per-`ob_date` sum and non-null count of each measure in `rows`."""
+    grouped = rows.groupby("ob_date")[MEASURE_COLUMNS]
+    sums = grouped.sum(min_count=0).set_axis(SUM_COLUMNS, axis=1)
+    counts = grouped.count().astype(float).set_axis(COUNT_COLUMNS, axis=1)
+    return pd.concat([sums, counts], axis=1)
+
+
+def read_day_list(path: str, date_column: str = "date") -> pd.DataFrame:
+    """The unique `station_id`, `date` (as "%Y-%m-%d") pairs listed in a CSV."""
+    days = pd.read_csv(path, usecols=["station_id", date_column])
+    return pd.DataFrame(
+        {
+            "station_id": days["station_id"].astype(str),
+            "date": pd.to_datetime(days[date_column]).dt.strftime("%Y-%m-%d"),
+        }
+    ).drop_duplicates(ignore_index=True)
+
+
+def refresh_aggregates(
+    state_dir: str, archive_root: str, days_path: str, date_column: str = "date"
+) -> AggregateState:
+    """Fold any newly listed or newly archived days into the state in `state_dir`.
+
+    Args:
+        state_dir: Where the state is kept.
+        archive_root: The weather archive directory.
+        days_path: CSV of the `station_id`, `date_column` days to aggregate.
+        date_column: The name of the date column in `days_path`.
+
+    Returns:
+        The refreshed state, also saved to `state_dir`.
+    """
+    state = load_state(state_dir)
+    parts = archive_parts(archive_root)
+    days_hash = file_hash(days_path)
+    if state.days_hash == days_hash and state.parts == parts:
+        logger.info(f"No new days or archive parts for {days_path}.")
+        return state
+
+    days = read_day_list(days_path, date_column)
+    changed = [p for p, info in state.parts.items() if parts.get(p) != info]
+    dropped = state.folded.merge(days, how="left", indicator=True)["_merge"] == "left_only"
+    if changed or dropped.any():
+        logger.info(
+            f"{len(changed)} archive parts changed and {dropped.sum()} days dropped since the "
+            f"last run, rebuilding the aggregates for {days_path}."
+        )
+        state = AggregateState(generation=state.generation)
+
+    pending = days.merge(state.folded, how="left", indicator=True)
+    pending = pending[pending["_merge"] == "left_only"].drop(columns="_merge")
+    with span("read_archive") as step:
+        rows = read_days(archive_root, pending, MEASURE_COLUMNS)
+        step.rows = len(rows)
+    rows["ob_date"] = pd.to_datetime(rows["date"]).dt.strftime("%Y-%m-%d")
+    logger.info(f"Folding {len(rows)} of {len(pending)} pending days into {state_dir}.")
+
+    with span("groupby", rows=len(rows)):
+        state.aggregates = (
+            pd.concat([state.aggregates, partial_aggregates(rows)]).groupby(level="ob_date").sum()
+        )
+    folded = pd.DataFrame(
+        {"station_id": rows["station_id"].astype(str), "date": rows["ob_date"].astype(str)}
+    )
+    state.folded = pd.concat([state.folded, folded], ignore_index=True)
+    state.days_hash, state.parts = days_hash, parts
+    save_state(state, state_dir)
+    return state
+
+
+def aggregate_means(state: AggregateState) -> pd.DataFrame:
+    """The mean of each measure per `ob_date`, NaN where a date has no readings."""
+    sums = state.aggregates[SUM_COLUMNS].set_axis(MEASURE_COLUMNS, axis=1)
+    counts = state.aggregates[COUNT_COLUMNS].set_axis(MEASURE_COLUMNS, axis=1)
+    return (sums / counts.where(counts > 0)).sort_index()